@@ -3,10 +3,8 @@ from flask_session import Session
 from config import Config
 import logging
 import argparse
-from logging.handlers import RotatingFileHandler
 import os
 from app.sessions import bp as sessions_bp
-from logging.handlers import TimedRotatingFileHandler
 
 
 
@@ -19,22 +17,10 @@ def create_app(config_class=Config):
     # Initialize Flask-Session
     Session(app)
 
-    # Configure logging
-    if not app.debug:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        file_handler = TimedRotatingFileHandler(
-            'logs/lazydj.log',
-            when='midnight',
-            interval=1,
-            backupCount=10
-        )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-
-    app.logger.setLevel(logging.INFO)
+    # Configure logging (written by a background thread, see log_utils)
+    from app.log_utils import init_app as init_logging
+    init_logging(app)
+
     app.logger.info('LazyDJ startup')
 
     # Import and register blueprints
@@ -47,6 +33,68 @@ def create_app(config_class=Config):
     from app.sessions import bp as sessions_bp
     app.register_blueprint(sessions_bp)  # No url_prefix to allow /create_session at root
 
+    # Request and Spotify call metrics, served at /metrics
+    from app.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    # Fingerprinted CSS and JS bundles
+    from app.assets import init_app as init_assets
+    init_assets(app)
+
+    # Open the session store shared by worker processes
+    from app.session_store import init_app as init_session_store
+    init_session_store(app)
+
+    # Per-token Spotify call budget with priority classes
+    from app.rate_limiter import init_app as init_rate_limiter
+    init_rate_limiter(app)
+
+    # Configure the pooled Spotify clients
+    from app.spotify_utils import init_app as init_spotify_clients
+    init_spotify_clients(app)
+
+    # Concurrent fan-out of independent Spotify calls
+    from app.spotify_async import init_app as init_spotify_async
+    init_spotify_async(app)
+
+    # Periodic cleanup of expired sessions and cooldowns
+    from app.models import init_app as init_models
+    init_models(app)
+
+    # Background refresh of owner tokens
+    from app.token_manager import init_app as init_token_manager
+    init_token_manager(app)
+
+    # Track metadata cache shared by search, player state and event mode
+    from app.track_cache import init_app as init_track_cache
+    init_track_cache(app)
+
+    # Short-lived playback state per token owner, kept in step with the commands we send
+    from app.playback_cache import init_app as init_playback_cache
+    init_playback_cache(app)
+
+    # Rendered session QR codes
+    from app.qr_codes import init_app as init_qr_codes
+    init_qr_codes(app)
+
+    # Open the persistent playlist-name index
+    from app.playlist_index import init_app as init_playlist_index
+    init_playlist_index(app)
+
+    # Load the event mode configuration once
+    from app.event_config import init_app as init_event_config
+    init_event_config(app)
+
+    # Background fade engine for event mode
+    from app.transitions import init_app as init_transitions
+    init_transitions(app)
+    from app.volume_ramp import init_app as init_volume_ramp
+    init_volume_ramp(app)
+
+    # Armed event mode: pinned device and live playback state
+    from app.event_arm import init_app as init_event_arm
+    init_event_arm(app)
+
     # Initialize error handlers
     from app.error_handlers import init_app as init_error_handlers
     init_error_handlers(app)
@@ -66,10 +114,10 @@ if __name__ == '__main__':
     if args.debug:
         app.debug = True
         app.logger.setLevel(logging.DEBUG)
+        logging.getLogger('app').setLevel(logging.DEBUG)
         app.logger.debug("Debug mode is enabled")
     else:
         app.debug = False
-        app.logger.setLevel(logging.INFO)
         app.logger.info("Running in production mode")
 
     app.run(host='0.0.0.0', port=app.config['PORT'])
\ No newline at end of file
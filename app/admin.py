@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, session, current_app
 import logging
+from app.event_config import get_event_config_loader
+from app.metrics import get_metrics
 
 bp = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
@@ -66,14 +68,15 @@ def admin_dashboard():
     if not check_if_admin():
         return jsonify({"status": "error", "message": "Unauthorized"}), 403
 
-    # Implement admin dashboard functionality
-    # This is a placeholder - you'll need to implement the actual functionality
     logger.info("Admin accessed dashboard")
     return jsonify({
         "status": "success",
-        "data": {
-            "total_tracks_played": 100,  # placeholder value
-            "most_requested_track": "Song Name by Artist",  # placeholder value
-            "active_users": 10  # placeholder value
-        }
-    })
\ No newline at end of file
+        "data": get_metrics().summary()  # the full series are at /metrics
+    })
+
+@bp.route('/api/event-config', methods=['GET'])
+def event_config_status():
+    """Which event config version is active, where it came from and whether it reloads"""
+    if not check_if_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 403
+    return jsonify(get_event_config_loader().status())
@@ -0,0 +1,311 @@
+# asset_pipeline.py
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import logging
+
+try:
+    import brotli
+except ImportError:  # optional: without brotli only .gz files are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Entry points, relative to the static folder; every page uses one CSS and at most one JS bundle
+BUNDLES = [
+    'styles/main.css',
+    'js/app.js',
+]
+OUTPUT_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+MIN_COMPRESS_SIZE = 256  # bytes; smaller files aren't worth a precompressed copy
+
+class AssetError(ValueError):
+    pass
+
+# --- CSS ---------------------------------------------------------------------
+
+CSS_IMPORT = re.compile(r'''@import\s+(?:url\()?\s*['"]([^'"]+)['"]\s*\)?\s*;''')
+CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.S)
+
+def bundle_css(path, seen=None):
+    """Inline @import rules recursively, in place, each file at most once"""
+    seen = set() if seen is None else seen
+    path = os.path.normpath(path)
+    if path in seen:
+        return ''
+    seen.add(path)
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+
+    def inline(match):
+        target = match.group(1)
+        if '://' in target:
+            raise AssetError(f"{path}: remote @import {target} can't be bundled")
+        return bundle_css(os.path.join(os.path.dirname(path), target), seen)
+
+    # Comments first, so commented-out imports stay out
+    source = ''.join(part for part in CSS_TOKENS.split(source) if not part.startswith('/*'))
+    return CSS_IMPORT.sub(inline, source)
+
+def minify_css(source):
+    """Drop comments and whitespace that can't matter; strings are left alone"""
+    out = []
+    for part in CSS_TOKENS.split(source):
+        if part.startswith('/*'):
+            continue
+        if part.startswith(('"', "'")):
+            out.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)  # never removes the space before ':', which matters in selectors
+        out.append(part)
+    return re.sub(r';}', '}', ''.join(out)).strip() + '\n'
+
+# --- JavaScript --------------------------------------------------------------
+
+JS_IMPORT = re.compile(r'''^import\s+(?:\*\s+as\s+(\w+)|\{([^}]*)\})\s+from\s+['"](\.{1,2}/[^'"]+)['"];?[ \t]*$''', re.M)
+JS_EXPORT = re.compile(r'^export\s+((?:async\s+)?function\*?|const|let|var|class)\s+([\w$]+)', re.M)
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {''}
+JS_WORD = re.compile(r'[\w$]+')
+REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else'}
+
+def _module_name(path, root):
+    relative = os.path.splitext(os.path.relpath(path, root))[0]
+    return '__lazydj_' + re.sub(r'\W', '_', relative)
+
+def bundle_js(entry):
+    """Concatenate an ES module graph into one module script.
+
+    Each module becomes an IIFE that returns its exports, evaluated in the
+    same order the browser would evaluate the modules. Only what LazyDJ's
+    modules use is supported: relative named or namespace imports and
+    exported declarations; anything else fails the build.
+    """
+    root = os.path.dirname(os.path.abspath(entry))
+    order, visiting, sources = [], set(), {}
+
+    def visit(path):
+        path = os.path.normpath(os.path.abspath(path))
+        if path in sources:
+            return
+        if path in visiting:
+            raise AssetError(f"{path}: circular imports are not supported")
+        visiting.add(path)
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+        if re.search(r'^export\s+(default|\{|\*)', source, re.M) or re.search(r'\bimport\s*\(', source):
+            raise AssetError(f"{path}: only exported declarations and static imports are supported")
+        for match in JS_IMPORT.finditer(source):
+            visit(os.path.join(os.path.dirname(path), match.group(3)))
+        visiting.discard(path)
+        sources[path] = source
+        order.append(path)
+
+    visit(entry)
+
+    parts = []
+    for path in order:
+        source = sources[path]
+
+        def rewrite_import(match):
+            namespace, names, target = match.groups()
+            dependency = _module_name(os.path.normpath(os.path.join(os.path.dirname(path), target)), root)
+            if namespace:
+                return f'const {namespace} = {dependency};'
+            bindings = [re.sub(r'\s+as\s+', ': ', name.strip()) for name in names.split(',') if name.strip()]
+            return f"const {{ {', '.join(bindings)} }} = {dependency};"
+
+        source = JS_IMPORT.sub(rewrite_import, source)
+        exports = [match.group(2) for match in JS_EXPORT.finditer(source)]
+        source = JS_EXPORT.sub(lambda match: f'{match.group(1)} {match.group(2)}', source)
+        if re.search(r'^\s*(import|export)\b', source, re.M):
+            raise AssetError(f"{path}: unsupported import or export statement")
+        parts.append(f"// {os.path.relpath(path, root)}\n"
+                     f"const {_module_name(path, root)} = (() => {{\n{source}\n"
+                     f"return {{ {', '.join(exports)} }};\n}})();\n")
+    return '\n'.join(parts)
+
+def _scan_string(source, i):
+    quote = source[i]
+    i += 1
+    while source[i] != quote:
+        if source[i] == '\\':
+            i += 1
+        elif source[i] == '\n':
+            raise AssetError("unterminated string literal")
+        i += 1
+    return i + 1
+
+def _scan_regex(source, i):
+    i += 1
+    in_class = False
+    while in_class or source[i] != '/':
+        if source[i] == '\\':
+            i += 1
+        elif source[i] == '[':
+            in_class = True
+        elif source[i] == ']':
+            in_class = False
+        elif source[i] == '\n':
+            raise AssetError("unterminated regular expression")
+        i += 1
+    i += 1
+    while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+        i += 1
+    return i
+
+def _js_segments(source):
+    """Split source into ('code' | 'literal', text) pieces, dropping comments.
+
+    Strings, regular expressions and template text are literals; the code
+    inside template ${...} expressions is code again, so nesting works.
+    """
+    i, n = 0, len(source)
+    start = 0
+    braces = []  # one entry per open '{': True if it opened a template expression
+    last = ''  # last significant code character or word, for telling '/' apart
+
+    def scan_template(i):
+        # i is just past a '`' or the '}' closing an expression
+        while i < n:
+            if source[i] == '\\':
+                i += 2
+            elif source[i] == '`':
+                return i + 1, False
+            elif source.startswith('${', i):
+                return i + 2, True
+            else:
+                i += 1
+        raise AssetError("unterminated template literal")
+
+    while i < n:
+        char = source[i]
+        if source.startswith('//', i) or source.startswith('/*', i):
+            yield 'code', source[start:i]
+            if source[i + 1] == '/':
+                end = source.find('\n', i)
+                i = n if end == -1 else end
+            else:
+                end = source.find('*/', i + 2)
+                if end == -1:
+                    raise AssetError("unterminated comment")
+                yield 'code', '\n' if '\n' in source[i:end] else ' '
+                i = end + 2
+            start = i
+        elif char in '"\'' or (char == '/' and (last in REGEX_PRECEDERS or last in REGEX_KEYWORDS)):
+            yield 'code', source[start:i]
+            end = _scan_string(source, i) if char != '/' else _scan_regex(source, i)
+            yield 'literal', source[i:end]
+            i = start = end
+            last = '"'
+        elif char == '`' or (char == '}' and braces and braces[-1]):
+            if char == '}':
+                braces.pop()
+            yield 'code', source[start:i]
+            end, expression = scan_template(i + 1)
+            yield 'literal', source[i:end]
+            if expression:
+                braces.append(True)
+            i = start = end
+            last = '{' if expression else '"'
+        else:
+            if char == '{':
+                braces.append(False)
+            elif char == '}' and braces:
+                braces.pop()
+            if char.isalnum() or char in '_$':
+                match = JS_WORD.match(source, i)
+                last = match.group()
+                i = match.end()
+                continue
+            if not char.isspace():
+                last = char
+            i += 1
+    yield 'code', source[start:]
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines.
+
+    Line breaks are kept so automatic semicolon insertion behaves exactly as
+    before; gzip and brotli take care of most of the rest.
+    """
+    out, code = [], []
+
+    def flush():
+        text = re.sub(r'[ \t]+', ' ', ''.join(code))
+        out.append(re.sub(r' ?\n\s*', '\n', text))
+        code.clear()
+
+    for kind, text in _js_segments(source):
+        if kind == 'literal':
+            flush()
+            out.append(text)
+        else:
+            code.append(text)
+    flush()
+    return ''.join(out).strip() + '\n'
+
+# --- Build -------------------------------------------------------------------
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def build_assets(static_folder, bundles=BUNDLES, minify=True):
+    """Bundle, minify, fingerprint and precompress every entry; returns the manifest.
+
+    Writes <static>/dist/<name>.<hash>.<ext> (plus .gz and, if brotli is
+    installed, .br) and dist/manifest.json mapping entry names to them.
+    Files from earlier builds are removed.
+    """
+    output_dir = os.path.join(static_folder, OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    written = {MANIFEST_NAME}
+
+    for entry in bundles:
+        path = os.path.join(static_folder, entry)
+        if entry.endswith('.css'):
+            text = bundle_css(path)
+            text = minify_css(text) if minify else text
+        elif entry.endswith('.js'):
+            text = bundle_js(path)
+            text = minify_js(text) if minify else text
+        else:
+            raise AssetError(f"Don't know how to bundle {entry}")
+
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(os.path.basename(entry))
+        filename = f'{stem}.{digest}{ext}'
+        _write(os.path.join(output_dir, filename), data)
+        written.add(filename)
+        sizes = {'raw': len(data)}
+
+        if len(data) >= MIN_COMPRESS_SIZE:
+            # mtime=0 keeps the .gz byte-for-byte reproducible
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            _write(os.path.join(output_dir, filename + '.gz'), compressed)
+            written.add(filename + '.gz')
+            sizes['gzip'] = len(compressed)
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                _write(os.path.join(output_dir, filename + '.br'), compressed)
+                written.add(filename + '.br')
+                sizes['br'] = len(compressed)
+
+        manifest[entry] = filename
+        logger.info(f"Built {entry} -> {OUTPUT_DIR}/{filename} {sizes}")
+
+    for name in os.listdir(output_dir):
+        if name not in written:
+            os.remove(os.path.join(output_dir, name))
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
@@ -0,0 +1,70 @@
+# assets.py
+
+import json
+import mimetypes
+import os
+import logging
+from flask import Blueprint, current_app, request, send_from_directory, url_for, abort
+from app.asset_pipeline import OUTPUT_DIR, MANIFEST_NAME
+
+bp = Blueprint('assets', __name__)
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60  # fingerprinted files never change
+
+# Precompressed variants, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_manifest = {}
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def asset_url(name):
+    """URL for a static entry point such as 'js/app.js': its fingerprinted bundle
+    when one was built, otherwise the source file itself"""
+    filename = _manifest.get(name)
+    if filename:
+        return url_for('assets.bundle', filename=filename)
+    return url_for('static', filename=name)
+
+@bp.route('/assets/<path:filename>')
+def bundle(filename):
+    if filename not in _manifest.values():
+        abort(404)
+    directory = os.path.join(current_app.static_folder, OUTPUT_DIR)
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    sent, encoding = filename, None
+    for candidate, suffix in ENCODINGS:
+        if request.accept_encodings[candidate] and os.path.exists(os.path.join(directory, filename + suffix)):
+            sent, encoding = filename + suffix, candidate
+            break
+
+    response = send_from_directory(directory, sent, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+def init_app(app):
+    """Serve the bundles from scripts/build_assets.py unless ASSETS_DEV is set"""
+    global _manifest
+    app.register_blueprint(bp)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    if app.config['ASSETS_DEV']:
+        _manifest = {}
+        logger.info("Asset bundling disabled, serving source files")
+        return
+
+    manifest = load_manifest(os.path.join(app.static_folder, OUTPUT_DIR, MANIFEST_NAME))
+    if manifest is None:
+        logger.warning("No asset manifest found, serving source files (run scripts/build_assets.py)")
+        manifest = {}
+    _manifest = manifest
@@ -0,0 +1,90 @@
+# cooldowns.py
+
+import heapq
+import threading
+import time
+
+class ExpiringSet:
+    """Set of keys that drop out ttl seconds after they were added.
+
+    Membership is a dict lookup. Expiry times are also kept in a min-heap, so
+    expired keys are evicted in amortized O(1) whenever the set is written,
+    and memory stays bounded by the keys added within one ttl. Each key can carry a value,
+    for example the time it was added or the track it stands for.
+    """
+
+    def __init__(self, ttl=None, clock=time.time):
+        # Without a default ttl, every add() must pass one
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}  # key -> (expires_at, value)
+        self._heap = []  # (expires_at, key); stale once a key is re-added or discarded
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Caller holds self._lock
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self._entries[key]
+        # Re-adds leave stale heap entries behind; rebuild before they dominate
+        if len(heap) > 2 * len(self._entries) + 64:
+            self._heap = [(expires_at, key) for key, (expires_at, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, key, value=None, ttl=None, now=None):
+        now = self._clock() if now is None else now
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._evict(now)
+            self._entries[key] = (expires_at, value)
+            heapq.heappush(self._heap, (expires_at, key))
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get(self, key, default=None):
+        """The value stored with key, or default if it isn't in the set (any more)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def expires_at(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return entry[0]
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def __len__(self):
+        with self._lock:
+            self._evict(self._clock())
+            return len(self._entries)
+
+    def evict(self):
+        """Drop expired keys now; returns how many were dropped"""
+        with self._lock:
+            before = len(self._entries)
+            self._evict(self._clock())
+            return before - len(self._entries)
+
+    def items(self):
+        """Live (key, value, expires_at) triples, for serialization"""
+        with self._lock:
+            self._evict(self._clock())
+            return [(key, value, expires_at) for key, (expires_at, value) in self._entries.items()]
+
+    def load(self, items):
+        """Replace the contents with (key, value, expires_at) triples from items()"""
+        now = self._clock()
+        with self._lock:
+            self._entries = {key: (expires_at, value) for key, value, expires_at in items if expires_at > now}
+            self._heap = [(expires_at, key) for key, (expires_at, _) in self._entries.items()]
+            heapq.heapify(self._heap)
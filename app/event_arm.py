@@ -0,0 +1,204 @@
+# event_arm.py
+
+from collections import deque
+import statistics
+import threading
+import time
+import logging
+from app.spotify_utils import get_client, token_key
+from app.track_cache import get_track_cache
+from app.rate_limiter import spotify_priority, RateLimited, REFRESH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 2  # seconds between playback-state refreshes while armed
+DEFAULT_ARM_TTL = 12 * 60 * 60  # an armed event stops refreshing after this long
+TAP_SAMPLES = 100  # recent preset taps kept for the latency figures
+
+class NoDeviceError(Exception):
+    pass
+
+class ArmedEvent:
+    """An event owner's Spotify device, resolved once and pinned, plus a live view of its playback.
+
+    While armed, event-mode commands go straight to the pinned device and
+    read playback state from here instead of asking Spotify first; a
+    background thread keeps that state fresh.
+    """
+
+    def __init__(self, key, token_info, device, playback=None, interval=DEFAULT_REFRESH_INTERVAL,
+                 ttl=DEFAULT_ARM_TTL):
+        self.key = key
+        self.token_info = token_info
+        self.device_id = device['id']
+        self.device_name = device.get('name')
+        self.playback = playback
+        self.fetched_at = time.time() if playback is not None else None
+        self.error = None
+        self.interval = interval
+        self.armed_at = time.time()
+        self.expires_at = self.armed_at + ttl
+        self._taps = deque(maxlen=TAP_SAMPLES)  # seconds from tap to Spotify accepting start_playback
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"event-arm-{key}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Event armed on device {self.device_name} ({self.device_id}) for {self.key}")
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def is_running(self):
+        return self._thread.is_alive() and not self._stopped.is_set()
+
+    def refresh_now(self):
+        self._wake.set()
+
+    @property
+    def is_playing(self):
+        playback = self.playback
+        return bool(playback and playback.get('is_playing'))
+
+    @property
+    def volume(self):
+        device = (self.playback or {}).get('device') or {}
+        return device.get('volume_percent')
+
+    def update(self, is_playing=None, volume=None):
+        """Apply what a command we just sent will have changed, ahead of the next refresh"""
+        with self._lock:
+            playback = dict(self.playback or {})
+            if is_playing is not None:
+                playback['is_playing'] = is_playing
+            if volume is not None:
+                playback['device'] = dict(playback.get('device') or {'id': self.device_id}, volume_percent=volume)
+            self.playback = playback
+
+    def record_tap(self, seconds):
+        self._taps.append(seconds)
+
+    def tap_latency(self):
+        """Preset tap latency figures in milliseconds, over the recent taps"""
+        taps = sorted(self._taps)
+        if not taps:
+            return {'taps': 0, 'last_ms': None, 'p50_ms': None, 'max_ms': None}
+        return {
+            'taps': len(taps),
+            'last_ms': round(self._taps[-1] * 1000, 1),
+            'p50_ms': round(statistics.median(taps) * 1000, 1),
+            'max_ms': round(taps[-1] * 1000, 1)
+        }
+
+    def to_dict(self):
+        return {
+            'armed': True,
+            'device': {'id': self.device_id, 'name': self.device_name},
+            'is_playing': self.is_playing,
+            'volume': self.volume,
+            'fetched_at': self.fetched_at,
+            'error': self.error,
+            'armed_at': self.armed_at,
+            'expires_at': self.expires_at,
+            'tap_latency': self.tap_latency()
+        }
+
+    @spotify_priority(REFRESH)
+    def _run(self):
+        while not self._stopped.is_set():
+            if time.time() > self.expires_at:
+                logger.info(f"Armed event for {self.key} expired")
+                _disarm(self)
+                break
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                playback = get_client(self.token_info).current_playback()
+                with self._lock:
+                    self.playback = playback
+                self.fetched_at = time.time()
+                self.error = None
+                device = (playback or {}).get('device') or {}
+                if device.get('id') and device['id'] != self.device_id:
+                    logger.warning(f"Playback for {self.key} moved to {device.get('name')}, "
+                                   f"event commands stay pinned to {self.device_name}")
+            except RateLimited as e:
+                # Commands keep working from the last known state
+                logger.info(f"Armed event refresh for {self.key} skipped: {str(e)}")
+            except Exception as e:
+                logger.error(f"Error refreshing armed event state for {self.key}: {str(e)}")
+                self.error = str(e)
+
+def _pick_device(sp, playback, device_id=None):
+    if device_id is None and playback and playback.get('device', {}).get('id'):
+        return playback['device']
+    devices = [device for device in sp.devices()['devices'] if device.get('id') and not device.get('is_restricted')]
+    if device_id is not None:
+        for device in devices:
+            if device['id'] == device_id:
+                return device
+        raise NoDeviceError(f"Device {device_id} is not available")
+    for device in devices:
+        if device.get('is_active'):
+            return device
+    if devices:
+        return devices[0]
+    raise NoDeviceError("No Spotify device found. Open Spotify on the device that will play the music.")
+
+# One armed event per token owner, in this process
+_armed = {}
+_armed_lock = threading.Lock()
+_options = {'interval': DEFAULT_REFRESH_INTERVAL, 'ttl': DEFAULT_ARM_TTL}
+
+def arm_event(token_info, preset_uris, device_id=None):
+    """Resolve and pin the playback device, fetch preset metadata and start the live state refresher"""
+    sp = get_client(token_info)
+    playback = sp.current_playback()
+    device = _pick_device(sp, playback, device_id)
+    if playback and (playback.get('device') or {}).get('id') != device['id']:
+        playback = None  # describes another device
+    if preset_uris:
+        get_track_cache().get_many(sp, preset_uris)
+
+    key = token_key(token_info)
+    armed = ArmedEvent(key, token_info, device, playback, interval=_options['interval'], ttl=_options['ttl'])
+    with _armed_lock:
+        previous = _armed.get(key)
+        _armed[key] = armed
+    if previous:
+        previous.stop()
+    armed.start()
+    return armed
+
+def get_armed_event(token_info):
+    armed = _armed.get(token_key(token_info))
+    if armed is None or not armed.is_running():
+        return None
+    # Pick up refreshed tokens for the refresher
+    armed.token_info = token_info
+    return armed
+
+def _disarm(armed):
+    with _armed_lock:
+        if _armed.get(armed.key) is armed:
+            del _armed[armed.key]
+    armed.stop()
+
+def disarm_event(token_info):
+    armed = _armed.get(token_key(token_info))
+    if armed is None:
+        return False
+    _disarm(armed)
+    logger.info(f"Event disarmed for {armed.key}")
+    return True
+
+def init_app(app):
+    _options.update({
+        'interval': app.config['EVENT_REFRESH_INTERVAL'],
+        'ttl': app.config['EVENT_ARM_TTL'],
+    })
@@ -0,0 +1,219 @@
+# event_config.py
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import logging
+from flask import current_app
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: without watchdog the watcher polls the file's mtime
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILENAME = 'event_preset_songs.json'
+DEFAULT_CHECK_INTERVAL = 2  # seconds between mtime checks when nothing watches the file
+
+TRACK_URI = re.compile(r'^spotify:track:[A-Za-z0-9]{22}$')
+PLAYLIST_URI = re.compile(r'^spotify:playlist:[A-Za-z0-9]{22}$')
+
+PresetSong = namedtuple('PresetSong', ['name', 'uri'])
+
+# Immutable snapshot of the event configuration; version identifies the file contents
+EventConfig = namedtuple('EventConfig', ['preset_songs', 'wedding_playlist_uri', 'version',
+                                         'source', 'mtime', 'loaded_at'])
+
+class EventConfigError(ValueError):
+    pass
+
+# Used when no config file exists
+DEFAULT_CONFIG = {
+    'preset_songs': [
+        {'name': 'First Dance Song', 'uri': 'spotify:track:4uLU6hMCjMI75M1A2tKUQC'},
+        {'name': 'Wedding Party Entrance', 'uri': 'spotify:track:2takcwOaAZWiXQijPHIx7B'},
+        {'name': 'Cake Cutting Music', 'uri': 'spotify:track:1CS7Sd1u5tWkstBhpssyjP'},
+        {'name': 'Grand Entrance', 'uri': 'spotify:track:6fxVffaTuwjgEk5h9XvInH'},
+        {'name': 'Slow Dance', 'uri': 'spotify:track:3CeCwYWvdfXbZLXFhBrbnf'}
+    ],
+    'wedding_playlist_uri': 'spotify:playlist:2Td5DabJz8POOhcEYmCmEA'
+}
+
+def parse_event_config(data, version, source=None, mtime=None):
+    """Validate decoded JSON and build an EventConfig, listing every problem found"""
+    if not isinstance(data, dict):
+        raise EventConfigError("config must be a JSON object")
+    errors = []
+
+    preset_songs = []
+    songs = data.get('preset_songs', [])
+    if not isinstance(songs, list):
+        errors.append("preset_songs must be a list")
+        songs = []
+    for i, song in enumerate(songs):
+        if not isinstance(song, dict):
+            errors.append(f"preset_songs[{i}] must be an object")
+            continue
+        name, uri = song.get('name'), song.get('uri')
+        if not isinstance(name, str) or not name.strip():
+            errors.append(f"preset_songs[{i}].name must be a non-empty string")
+        if not isinstance(uri, str) or not TRACK_URI.match(uri):
+            errors.append(f"preset_songs[{i}].uri must be a spotify:track: URI")
+        preset_songs.append(PresetSong(name, uri))
+
+    playlist_uri = data.get('wedding_playlist_uri')
+    if playlist_uri is not None and (not isinstance(playlist_uri, str) or not PLAYLIST_URI.match(playlist_uri)):
+        errors.append("wedding_playlist_uri must be a spotify:playlist: URI")
+
+    unknown = sorted(set(data) - {'preset_songs', 'wedding_playlist_uri'})
+    if unknown:
+        logger.warning(f"Ignoring unknown event config key(s): {', '.join(unknown)}")
+
+    if errors:
+        raise EventConfigError('; '.join(errors))
+    return EventConfig(tuple(preset_songs), playlist_uri, version, source, mtime, time.time())
+
+class EventConfigLoader:
+    """Holds the active EventConfig and swaps in a new one when the file changes.
+
+    Readers get the current object without touching the disk once a watcher
+    is running; otherwise the file's mtime is checked at most every
+    check_interval seconds. A file that fails to parse or validate is
+    logged and the last good config stays active.
+    """
+
+    def __init__(self, candidate_paths, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.candidate_paths = [os.path.abspath(path) for path in candidate_paths]
+        self.check_interval = check_interval
+        self.path = None
+        self.last_error = None
+        self.watcher = None  # 'watchdog', 'polling' or None
+        self._config = None
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _find_path(self):
+        for path in self.candidate_paths:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self):
+        # Caller holds self._lock
+        path = self._find_path()
+        if path is None:
+            if self._config is None or self._config.source is not None:
+                logger.error(f"Event config not found (looked in {', '.join(self.candidate_paths)}), using defaults")
+                self._config = parse_event_config(DEFAULT_CONFIG, 'default')
+                self.path = self._mtime = None
+            return
+
+        mtime = os.stat(path).st_mtime
+        if path == self.path and mtime == self._mtime:
+            return
+        self.path, self._mtime = path, mtime
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            version = hashlib.sha256(raw).hexdigest()[:12]
+            if self._config is not None and self._config.version == version:
+                return
+            self._config = parse_event_config(json.loads(raw), version, path, mtime)
+            self.last_error = None
+            logger.info(f"Loaded event config {version} from {path} with {len(self._config.preset_songs)} preset songs")
+        except (OSError, ValueError) as e:
+            self.last_error = f"{path}: {str(e)}"
+            logger.error(f"Invalid event config, keeping the previous one: {self.last_error}")
+            if self._config is None:
+                self._config = parse_event_config(DEFAULT_CONFIG, 'default')
+
+    def reload(self):
+        with self._lock:
+            self._load()
+            self._checked_at = time.monotonic()
+            return self._config
+
+    def get(self):
+        config = self._config
+        if config is not None and (self.watcher or time.monotonic() - self._checked_at < self.check_interval):
+            return config
+        return self.reload()
+
+    def start_watching(self):
+        """Reload in the background whenever the file changes, so get() never touches the disk"""
+        self.reload()
+        if Observer is not None:
+            loader = self
+            filenames = {os.path.basename(path) for path in self.candidate_paths}
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    if os.path.basename(event.src_path) in filenames:
+                        loader.reload()
+
+            observer = Observer()
+            for directory in {os.path.dirname(path) for path in self.candidate_paths if os.path.isdir(os.path.dirname(path))}:
+                observer.schedule(Handler(), directory)
+            observer.daemon = True
+            observer.start()
+            self.watcher = 'watchdog'
+        else:
+            threading.Thread(target=self._poll, name='event-config-watcher', daemon=True).start()
+            self.watcher = 'polling'
+        logger.info(f"Watching event config for changes ({self.watcher})")
+
+    def _poll(self):
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Error checking event config: {str(e)}")
+
+    def status(self):
+        config = self.get()
+        return {
+            'version': config.version,
+            'source': config.source,
+            'mtime': config.mtime,
+            'loaded_at': config.loaded_at,
+            'preset_count': len(config.preset_songs),
+            'wedding_playlist_uri': config.wedding_playlist_uri,
+            'watcher': self.watcher,
+            'last_error': self.last_error
+        }
+
+_loader = None
+
+def init_app(app):
+    """Find and load the event config once at startup"""
+    global _loader
+    configured = app.config.get('EVENT_CONFIG_PATH')
+    if configured:
+        candidates = [configured]
+    else:
+        candidates = [
+            os.path.join(os.getcwd(), CONFIG_FILENAME),
+            os.path.join(os.path.dirname(app.root_path), CONFIG_FILENAME),
+            os.path.join(app.root_path, CONFIG_FILENAME),
+        ]
+    _loader = EventConfigLoader(candidates, check_interval=app.config['EVENT_CONFIG_CHECK_INTERVAL'])
+    if app.config['EVENT_CONFIG_WATCH']:
+        _loader.start_watching()
+    else:
+        _loader.reload()
+
+def get_event_config_loader():
+    if _loader is None:
+        init_app(current_app)
+    return _loader
+
+def get_event_config():
+    return get_event_config_loader().get()
@@ -0,0 +1,99 @@
+# events.py
+
+from collections import deque
+import threading
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKLOG = 50  # events kept per session for Last-Event-ID resume
+
+class EventChannel:
+    """Per-session event buffer that Server-Sent Events streams wait on"""
+
+    def __init__(self, backlog=DEFAULT_BACKLOG):
+        self._events = deque(maxlen=backlog)  # (event_id, event_type, data)
+        self._last_id = 0
+        self._last_payload = None  # last serialized data, to drop no-op updates
+        self.last_data = None
+        self._cond = threading.Condition()
+        self.closed = False
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data, only_if_changed=False):
+        payload = json.dumps(data, sort_keys=True)
+        with self._cond:
+            if only_if_changed and self._last_payload == payload:
+                return None
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, payload))
+            self._last_payload = payload
+            self.last_data = data
+            self._cond.notify_all()
+            return self._last_id
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def events_since(self, last_id):
+        """Return (events, resumed); resumed is False if the backlog no longer reaches last_id"""
+        with self._cond:
+            if not self._events:
+                return [], last_id == self._last_id
+            oldest_id = self._events[0][0]
+            resumed = last_id >= oldest_id - 1
+            return [event for event in self._events if event[0] > last_id], resumed
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than last_id is published, the channel closes, or timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._last_id > last_id or self.closed, timeout)
+
+def format_sse(data, event_type=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type:
+        lines.append(f"event: {event_type}")
+    for line in data.splitlines() or ['']:
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+# One channel per session
+_channels = {}
+_channels_lock = threading.Lock()
+
+def get_channel(session_id):
+    with _channels_lock:
+        channel = _channels.get(session_id)
+        if channel is None:
+            channel = EventChannel()
+            _channels[session_id] = channel
+        return channel
+
+def publish(session_id, event_type, data, only_if_changed=False):
+    return get_channel(session_id).publish(event_type, data, only_if_changed)
+
+def close_channel(session_id):
+    with _channels_lock:
+        channel = _channels.pop(session_id, None)
+    if channel:
+        channel.publish('end', {'session_id': session_id})
+        channel.close()
+        logger.info(f"Closed event channel for session {session_id}")
+
+def close_all_channels():
+    """End every open stream without an 'end' event, so clients reconnect (used on shutdown)"""
+    with _channels_lock:
+        channels = list(_channels.values())
+        _channels.clear()
+    for channel in channels:
+        channel.close()
+    if channels:
+        logger.info(f"Closed {len(channels)} event channel(s) for shutdown")
@@ -0,0 +1,74 @@
+# indexed_queue.py
+
+import threading
+
+class IndexedQueue:
+    """Insertion-ordered list of track dicts, indexed by URI.
+
+    The same URI may be queued more than once. Membership and counts are O(1),
+    removing a URI is O(entries with that URI), and filtering the whole queue
+    is a single O(n) pass.
+    """
+
+    def __init__(self, tracks=()):
+        self._entries = {}  # sequence number -> track, in insertion order
+        self._by_uri = {}  # uri -> {sequence number: None}, in insertion order
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        for track in tracks:
+            self.append(track)
+
+    def append(self, track):
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._entries[seq] = track
+            self._by_uri.setdefault(track['uri'], {})[seq] = None
+
+    def remove(self, track_uri):
+        """Remove every entry for track_uri; returns how many were removed"""
+        with self._lock:
+            seqs = self._by_uri.pop(track_uri, None)
+            if not seqs:
+                return 0
+            for seq in seqs:
+                del self._entries[seq]
+            return len(seqs)
+
+    def retain(self, keep):
+        """Keep only the tracks for which keep(track) is true, in one pass; returns how many were dropped"""
+        with self._lock:
+            dropped = [(seq, track['uri']) for seq, track in self._entries.items() if not keep(track)]
+            for seq, uri in dropped:
+                del self._entries[seq]
+                seqs = self._by_uri[uri]
+                del seqs[seq]
+                if not seqs:
+                    del self._by_uri[uri]
+            return len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_uri.clear()
+
+    def first(self, track_uri):
+        """The earliest queued entry for track_uri, or None"""
+        seqs = self._by_uri.get(track_uri)
+        return self._entries.get(next(iter(seqs))) if seqs else None
+
+    def count(self, track_uri):
+        return len(self._by_uri.get(track_uri, ()))
+
+    def __contains__(self, track_uri):
+        return track_uri in self._by_uri
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def to_list(self):
+        with self._lock:
+            return list(self._entries.values())
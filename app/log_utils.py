@@ -1,6 +1,19 @@
+import atexit
+import copy
 import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 from termcolor import colored
 
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'lazydj.log')
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
 def format_track_info(track):
     if not track:
         return "No track playing"
@@ -27,4 +40,109 @@ def format_debug_output(data):
         for track in format_queue(data['radio_queue'][:5]):  # Limit to 5 tracks
             output.append(f"  - {track}")
     
-    return "\n".join(output)
\ No newline at end of file
+    return "\n".join(output)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra= become keys"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+class LogQueueHandler(QueueHandler):
+    """Hands records to the listener thread without ever blocking the caller.
+
+    Arguments are merged into the message here, so the listener never sees
+    objects that might change after the call; the file write happens on the
+    listener thread. If the listener falls behind and the queue is full,
+    records are dropped and counted instead of stalling the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_queue_handler = None
+_loggers = []
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains whatever is still queued
+        _listener = None
+    for logger in _loggers:
+        logger.removeHandler(_queue_handler)
+    _loggers.clear()
+
+def init_app(app):
+    """Send the app's logs through a queue to a background writer thread.
+
+    The package logger ('app') and the Flask app logger enqueue records;
+    a QueueListener writes them to logs/lazydj.log (or stderr in debug
+    mode) as text or, with LOG_FORMAT=json, JSON lines.
+    """
+    global _listener, _queue_handler
+    _stop_listener()
+
+    if app.debug:
+        handler = logging.StreamHandler()
+    else:
+        if not os.path.exists(LOG_DIR):
+            os.mkdir(LOG_DIR)
+        handler = TimedRotatingFileHandler(LOG_FILE, when='midnight', interval=1, backupCount=10)
+    if app.config['LOG_FORMAT'] == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    _queue_handler = LogQueueHandler(queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE']))
+    _listener = QueueListener(_queue_handler.queue, handler)
+    _listener.start()
+
+    # LOG_LEVEL applies to the package logger and the Flask app logger alike
+    level = logging.DEBUG if app.debug else app.config['LOG_LEVEL'].upper()
+    package_logger = logging.getLogger('app')
+    package_logger.setLevel(level)
+    app.logger.setLevel(level)
+    _loggers.append(package_logger)
+    if app.logger.name.split('.')[0] != 'app':  # otherwise its records already reach the package logger
+        _loggers.append(app.logger)
+    for logger in _loggers:
+        logger.addHandler(_queue_handler)
+
+def log_stats():
+    if _queue_handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _queue_handler.queue.qsize(), 'dropped': _queue_handler.dropped}
+
+atexit.register(_stop_listener)
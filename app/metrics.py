@@ -0,0 +1,316 @@
+# metrics.py
+
+import bisect
+import hmac
+import re
+import threading
+import time
+import logging
+import spotipy
+from spotipy.exceptions import SpotifyException
+from flask import Blueprint, Response, current_app, request, abort
+
+bp = Blueprint('metrics', __name__)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+SPOTIFY_ID = re.compile(r'^[A-Za-z0-9]{22}$')
+
+class Histogram:
+    """Latency histogram with fixed buckets (upper bounds in LATENCY_BUCKETS, then +Inf)"""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, in seconds"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+def spotify_endpoint(url):
+    """'https://api.spotify.com/v1/playlists/<id>/tracks?x=1' -> 'playlists/{id}/tracks'"""
+    path = url.split('?', 1)[0]
+    if '/v1/' in path:
+        path = path.split('/v1/', 1)[1]
+    segments = path.strip('/').split('/')
+    for i, segment in enumerate(segments):
+        if i and segments[i - 1] == 'users':
+            segments[i] = '{user_id}'
+        elif SPOTIFY_ID.match(segment):
+            segments[i] = '{id}'
+    return '/'.join(segments)
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+class Metrics:
+    """In-process counters, latency histograms and gauges, rendered in the Prometheus text format.
+
+    Recording is a dict update under one lock, so it costs a few
+    microseconds. Gauges come from collectors that run only when scraped.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._requests = {}  # (route, method, status) -> count
+        self._request_latency = {}  # (route, method) -> Histogram
+        self._spotify_calls = {}  # (endpoint, method, status) -> count; status is 'ok', an HTTP code or 'error'
+        self._spotify_latency = {}  # (endpoint, method) -> Histogram
+        self._collectors = []  # callables returning [(name, help, number or {label value: number}, label name)]
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._request_latency.get((route, method))
+            if histogram is None:
+                histogram = self._request_latency[(route, method)] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_spotify_call(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self._spotify_calls[key] = self._spotify_calls.get(key, 0) + 1
+            histogram = self._spotify_latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self._spotify_latency[(endpoint, method)] = Histogram()
+            histogram.observe(seconds)
+
+    def collector(self, callback):
+        self._collectors.append(callback)
+
+    def _snapshot(self):
+        with self._lock:
+            return (dict(self._requests),
+                    {key: (list(h.counts), h.sum, h.count) for key, h in self._request_latency.items()},
+                    dict(self._spotify_calls),
+                    {key: (list(h.counts), h.sum, h.count) for key, h in self._spotify_latency.items()})
+
+    def _gauge_values(self):
+        for collect in self._collectors:
+            try:
+                yield from collect()
+            except Exception as e:
+                logger.warning(f"Error collecting metrics from {collect.__name__}: {str(e)}")
+
+    def render(self):
+        requests, request_latency, spotify_calls, spotify_latency = self._snapshot()
+        lines = []
+
+        def counter(name, help_text, values, label_names):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{_labels(**dict(zip(label_names, key)))} {value}')
+
+        def histogram(name, help_text, values, label_names):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, (counts, total, count) in sorted(values.items()):
+                labels = dict(zip(label_names, key))
+                cumulative = 0
+                for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(**labels)} {total:.6f}')
+                lines.append(f'{name}_count{_labels(**labels)} {count}')
+
+        counter('lazydj_http_requests_total', 'HTTP requests by route, method and status.',
+                requests, ('route', 'method', 'status'))
+        histogram('lazydj_http_request_duration_seconds', 'HTTP request latency by route and method.',
+                  request_latency, ('route', 'method'))
+        counter('lazydj_spotify_calls_total', 'Spotify Web API calls by endpoint, method and outcome.',
+                spotify_calls, ('endpoint', 'method', 'status'))
+        histogram('lazydj_spotify_call_duration_seconds', 'Spotify Web API call latency, retries included.',
+                  spotify_latency, ('endpoint', 'method'))
+
+        for name, help_text, value, label in self._gauge_values():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            if isinstance(value, dict):
+                for key, item in sorted(value.items()):
+                    lines.append(f'{name}{_labels(**{label: key})} {item}')
+            else:
+                lines.append(f'{name} {value}')
+        lines.append('# HELP lazydj_uptime_seconds Seconds since this process started.')
+        lines.append('# TYPE lazydj_uptime_seconds gauge')
+        lines.append(f'lazydj_uptime_seconds {time.time() - self.started_at:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, top=10):
+        """The headline numbers for the admin dashboard"""
+        requests, request_latency, spotify_calls, spotify_latency = self._snapshot()
+
+        def quantiles(counts, total, count):
+            histogram = Histogram()
+            histogram.counts, histogram.sum, histogram.count = counts, total, count
+            return {
+                'p50_ms': _ms(histogram.quantile(0.5)),
+                'p95_ms': _ms(histogram.quantile(0.95)),
+                'mean_ms': round(total / count * 1000, 1) if count else None
+            }
+
+        routes = {}
+        for (route, method, status), count in requests.items():
+            entry = routes.setdefault((route, method), {'route': route, 'method': method, 'count': 0, 'errors': 0})
+            entry['count'] += count
+            if status >= 500:
+                entry['errors'] += count
+        for key, entry in routes.items():
+            entry.update(quantiles(*request_latency[key]))
+
+        endpoints = {}
+        for (endpoint, method, status), count in spotify_calls.items():
+            entry = endpoints.setdefault((endpoint, method), {'endpoint': endpoint, 'method': method, 'count': 0,
+                                                              'errors': 0, 'rate_limited': 0})
+            entry['count'] += count
+            if status != 'ok':
+                entry['errors'] += count
+            if status == '429':
+                entry['rate_limited'] += count
+        for key, entry in endpoints.items():
+            entry.update(quantiles(*spotify_latency[key]))
+
+        total_requests = sum(entry['count'] for entry in routes.values())
+        server_errors = sum(entry['errors'] for entry in routes.values())
+        by_count = lambda entry: entry['count']
+        return {
+            'uptime_seconds': round(time.time() - self.started_at),
+            'requests': {
+                'total': total_requests,
+                'server_errors': server_errors,
+                'error_rate': server_errors / total_requests if total_requests else 0.0,
+                'top_routes': sorted(routes.values(), key=by_count, reverse=True)[:top]
+            },
+            'spotify': {
+                'calls': sum(entry['count'] for entry in endpoints.values()),
+                'errors': sum(entry['errors'] for entry in endpoints.values()),
+                'rate_limited': sum(entry['rate_limited'] for entry in endpoints.values()),
+                'top_endpoints': sorted(endpoints.values(), key=by_count, reverse=True)[:top]
+            },
+            'gauges': {name.replace('lazydj_', '', 1): value for name, _, value, _ in self._gauge_values()}
+        }
+
+def _ms(seconds):
+    # None when there is no data or the quantile is past the last bucket
+    if seconds is None or seconds == float('inf'):
+        return None
+    return round(seconds * 1000, 1)
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+class InstrumentedSpotify(spotipy.Spotify):
+    """spotipy client that records every Web API call's endpoint, latency and outcome"""
+
+    def _internal_call(self, method, url, payload, params):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            result = super()._internal_call(method, url, payload, params)
+            status = 'ok'
+            return result
+        except SpotifyException as e:
+            status = str(e.http_status)
+            raise
+        finally:
+            _metrics.observe_spotify_call(spotify_endpoint(url), method, status, time.perf_counter() - start)
+
+# Each context-local proxy lookup costs about a microsecond, so the hooks make as few as possible
+def _before_request():
+    request.environ['lazydj.started'] = time.perf_counter()
+
+def _after_request(response):
+    current = request._get_current_object()
+    started = current.environ.pop('lazydj.started', None)
+    if started is not None:
+        rule = current.url_rule
+        _metrics.observe_request(rule.rule if rule else 'unmatched', current.method, response.status_code,
+                                 time.perf_counter() - started)
+    return response
+
+@bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def _session_metrics():
+    # Imported lazily: models imports spotify_utils, which imports this module
+    from app.session_store import get_store
+    store = get_store()
+    sessions = [session for session in map(store.get, store.session_ids()) if session is not None]
+    return [
+        ('lazydj_sessions', 'Active sessions.', len(sessions), None),
+        ('lazydj_participants', 'Participants across active sessions.',
+         sum(len(session.participants) for session in sessions), None),
+        ('lazydj_queued_tracks', 'Tracks in session queues.', sum(len(session.queue) for session in sessions), None),
+        ('lazydj_longest_queue', 'Length of the longest session queue.',
+         max((len(session.queue) for session in sessions), default=0), None),
+        ('lazydj_cooldown_entries', 'Tracks on cooldown across session cooldown indexes.',
+         sum(len(session.queue_cooldowns) for session in sessions), None),
+        ('lazydj_recent_tracks', 'Entries in the shared recently-queued track index.', store.recent_track_count(), None),
+    ]
+
+def _cache_metrics():
+    from app.spotify_utils import get_search_cache
+    from app.track_cache import get_track_cache
+    from app.qr_codes import get_qr_cache
+    from app.playback_cache import get_playback_cache
+    hit_rates = {
+        'search': get_search_cache().stats()['hit_rate'],
+        'track_metadata': get_track_cache().stats()['hit_rate'],
+        'qr_code': get_qr_cache().stats()['hit_rate'],
+        'playback_state': get_playback_cache().stats()['hit_rate']
+    }
+    return [('lazydj_cache_hit_ratio', 'Hit ratio of in-process caches.', hit_rates, 'cache')]
+
+def _log_metrics():
+    from app.log_utils import log_stats
+    return [('lazydj_log_records_dropped', 'Log records dropped because the log writer fell behind.',
+             log_stats()['dropped'], None)]
+
+def _governor_metrics():
+    from app.rate_limiter import get_governor, PRIORITY_NAMES
+    stats = get_governor().stats
+    return [
+        ('lazydj_spotify_calls_granted', 'Spotify calls let through by the rate governor, by priority class.',
+         {name: stats[name]['granted'] for name in PRIORITY_NAMES.values()}, 'priority'),
+        ('lazydj_spotify_calls_delayed', 'Spotify calls that waited for capacity before going out, by priority class.',
+         {name: stats[name]['waited'] for name in PRIORITY_NAMES.values()}, 'priority'),
+        ('lazydj_spotify_calls_shed', 'Spotify calls refused by the rate governor, by priority class.',
+         {name: stats[name]['shed'] for name in PRIORITY_NAMES.values()}, 'priority'),
+        ('lazydj_spotify_rate_limited_responses', '429 responses received from Spotify.',
+         stats['rate_limited_responses'], None),
+    ]
+
+def init_app(app):
+    """Time every request and expose /metrics"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(bp)
+
+    if not _metrics._collectors:
+        for collect in (_session_metrics, _cache_metrics, _log_metrics, _governor_metrics):
+            _metrics.collector(collect)
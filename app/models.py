@@ -5,6 +5,14 @@ from datetime import datetime
 import json
 import spotipy
 import logging
+from app.player_state import stop_player_state, peek_player_state
+from app.events import publish, close_channel
+from app.playlist_writer import PlaylistMirror, enqueue_playlist_add, stop_playlist_writer
+from app.session_store import get_store
+from app.token_manager import get_token_manager
+from app.cooldowns import ExpiringSet
+from app.indexed_queue import IndexedQueue
+import threading
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -35,47 +43,131 @@ class Track:
 class Session:
     def __init__(self, owner_token, session_id=None):
         self.session_id = session_id or str(uuid.uuid4())[:8]
-        self.owner_token = owner_token
+        self.owner_token = owner_token  # JSON, as saved in the session store
+        self._token_info = None  # owner_token parsed, kept current by the token manager
         self.created_at = datetime.now()
-        self.queue = []  # List to maintain order
-        self.queue_cooldowns = {}  # Dictionary to track cooldowns
+        self.queue = IndexedQueue()  # queued tracks in order, indexed by URI
+        self.queue_cooldowns = ExpiringSet()  # URI -> time added, dropped when the cooldown ends
         self.playlist_id = None
         self.playlist_name = None
+        self.playlist_mirror = None  # local URI set of the playlist, for duplicate checks
         self.participants = {}  # Dict: participant_id -> {name, icon, added_at}
         self.participant_counter = 0  # Counter for generating participant IDs
+        self.store_version = None  # version last read from or written to the session store
         logger.info(f"Created new session: {self.session_id}")
 
+    def to_dict(self):
+        """Serializable session state, as saved in the session store"""
+        return {
+            'session_id': self.session_id,
+            'owner_token': self.owner_token,
+            'created_at': self.created_at.isoformat(),
+            'queue': self.queue.to_list(),
+            'queue_cooldowns': self.queue_cooldowns.items(),
+            'playlist_id': self.playlist_id,
+            'playlist_name': self.playlist_name,
+            'participants': self.participants,
+            'participant_counter': self.participant_counter
+        }
+
+    def load_state(self, data):
+        """Replace this session's state with data saved by to_dict()"""
+        if data['owner_token'] != self.owner_token:
+            self._token_info = None
+        self.owner_token = data['owner_token']
+        self.created_at = datetime.fromisoformat(data['created_at'])
+        self.queue = IndexedQueue(data['queue'])
+        self.queue_cooldowns = ExpiringSet()
+        self.queue_cooldowns.load(data['queue_cooldowns'])
+        self.participants = data['participants']
+        self.participant_counter = data['participant_counter']
+        if data['playlist_id'] != self.playlist_id:
+            # The mirror is process-local and rebuilt on demand
+            self.playlist_mirror = None
+        self.playlist_id = data['playlist_id']
+        self.playlist_name = data['playlist_name']
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls.__new__(cls)
+        session.session_id = data['session_id']
+        session.owner_token = None
+        session._token_info = None
+        session.playlist_id = None
+        session.playlist_mirror = None
+        session.store_version = None
+        session.load_state(data)
+        return session
+
     def get_token_info(self):
-        return json.loads(self.owner_token)
+        """The owner's current token; refreshed tokens are written back to the session"""
+        if self._token_info is None:
+            self._token_info = json.loads(self.owner_token)
+        token_info = get_token_manager().get_token(self._token_info)
+        if token_info is None:
+            # Refresh failed; Spotify will reject the stale token and the caller reports it
+            return self._token_info
+        if token_info['access_token'] != self._token_info['access_token']:
+            with get_store().updating(self):
+                self.owner_token = json.dumps(token_info)
+            logger.info(f"Updated owner token for session {self.session_id}")
+        self._token_info = token_info
+        return token_info
+
+    def get_owner_token(self):
+        """owner_token as JSON, brought up to date first"""
+        self.get_token_info()
+        return self.owner_token
+
+    def set_playlist(self, playlist_id, playlist_name):
+        """Associate the session with a playlist and start a fresh local mirror of it"""
+        with get_store().updating(self):
+            self.playlist_id = playlist_id
+            self.playlist_name = playlist_name
+            self.playlist_mirror = PlaylistMirror(playlist_id)
 
     def add_participant(self, participant_id=None):
         """Add a new participant to the session and return their info"""
         if participant_id and participant_id in self.participants:
             return self.participants[participant_id]
         
-        # Generate a new participant
-        if not participant_id:
-            self.participant_counter += 1
-            participant_id = f"user_{self.participant_counter}"
-        
-        # Generate initials or pick an icon (using predefined colors/icons)
-        colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
-                 '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
-        icons = ['♪', '♫', '♬', '♩', '♭', '♯', '◆', '●', '▲', '■']
-        
-        participant_info = {
-            'id': participant_id,
-            'name': f"Guest {self.participant_counter}",
-            'color': colors[self.participant_counter % len(colors)],
-            'icon': icons[self.participant_counter % len(icons)],
-            'added_at': datetime.now().isoformat(),
-            'song_count': 0
-        }
-        
-        self.participants[participant_id] = participant_info
+        with get_store().updating(self):
+            if participant_id and participant_id in self.participants:
+                # Added by another worker meanwhile
+                return self.participants[participant_id]
+
+            # Generate a new participant
+            if not participant_id:
+                self.participant_counter += 1
+                participant_id = f"user_{self.participant_counter}"
+
+            # Generate initials or pick an icon (using predefined colors/icons)
+            colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', 
+                     '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9']
+            icons = ['♪', '♫', '♬', '♩', '♭', '♯', '◆', '●', '▲', '■']
+
+            participant_info = {
+                'id': participant_id,
+                'name': f"Guest {self.participant_counter}",
+                'color': colors[self.participant_counter % len(colors)],
+                'icon': icons[self.participant_counter % len(icons)],
+                'added_at': datetime.now().isoformat(),
+                'song_count': 0
+            }
+
+            self.participants[participant_id] = participant_info
         logger.info(f"Added participant {participant_id} to session {self.session_id}")
+        self.publish_update('participants')
         return participant_info
 
+    def rename_participant(self, participant_id, name):
+        """Rename a participant and return their updated info"""
+        with get_store().updating(self):
+            participant = self.participants[participant_id]
+            participant['name'] = name
+        self.publish_update('participants')
+        return participant
+
     def get_or_create_participant(self, participant_id=None):
         """Get existing participant or create new one"""
         if participant_id and participant_id in self.participants:
@@ -87,119 +179,185 @@ class Session:
         return len(self.participants)
 
     def add_to_queue(self, track, participant_id=None):
-        logger.debug(f"add_to_queue called with participant_id: '{participant_id}' (type: {type(participant_id)})")
-        logger.debug(f"Current session participants: {list(self.participants.keys())}")
+        logger.debug("add_to_queue called with participant_id: '%s' (type: %s)", participant_id, type(participant_id))
+        logger.debug("Current session participants: %s", list(self.participants.keys()))
         
-        # Ensure we have participant info
-        if participant_id:
-            logger.debug(f"Looking for participant_id '{participant_id}' in session participants")
-            if participant_id in self.participants:
-                participant = self.participants[participant_id]
-                logger.debug(f"Found existing participant: {participant}")
-            else:
-                logger.debug(f"Creating new participant for ID: {participant_id}")
-                participant = self.get_or_create_participant(participant_id)
+        with get_store().updating(self):
+            # Ensure we have participant info
+            if participant_id:
+                logger.debug("Looking for participant_id '%s' in session participants", participant_id)
+                if participant_id in self.participants:
+                    participant = self.participants[participant_id]
+                    logger.debug("Found existing participant: %s", participant)
+                else:
+                    logger.debug("Creating new participant for ID: %s", participant_id)
+                    participant = self.get_or_create_participant(participant_id)
                 
-            participant['song_count'] += 1
-            track['added_by'] = participant_id
-            track['added_by_info'] = {
-                'name': participant['name'],
-                'color': participant['color'],
-                'icon': participant['icon']
-            }
-            logger.debug(f"Added participant info to track: {track['added_by_info']}")
-        else:
-            logger.debug("No participant_id provided, using session owner info")
-            # Default for session owner or when no participant ID provided
-            track['added_by'] = 'owner'
-            track['added_by_info'] = {
-                'name': 'Session Host',
-                'color': '#333333',
-                'icon': '♔'
-            }
+                participant['song_count'] += 1
+                track['added_by'] = participant_id
+                track['added_by_info'] = {
+                    'name': participant['name'],
+                    'color': participant['color'],
+                    'icon': participant['icon']
+                }
+                logger.debug("Added participant info to track: %s", track['added_by_info'])
+            else:
+                logger.debug("No participant_id provided, using session owner info")
+                # Default for session owner or when no participant ID provided
+                track['added_by'] = 'owner'
+                track['added_by_info'] = {
+                    'name': 'Session Host',
+                    'color': '#333333',
+                    'icon': '♔'
+                }
         
-        self.queue.append(track)
-        self.queue_cooldowns[track['uri']] = time.time()
-        logger.info(f"Added track to queue: {track['name']} (URI: {track['uri']}) by {track['added_by_info']['name']}")
+            track['added_at'] = time.time()
+            self.queue.append(track)
+            self.queue_cooldowns.add(track['uri'], track['added_at'],
+                                     ttl=current_app.config['TRACK_COOLDOWN_PERIOD'], now=track['added_at'])
+        logger.info("Added track to queue: %s (URI: %s) by %s", track['name'], track['uri'], track['added_by_info']['name'])
+        self.publish_update('queue')
         if self.playlist_id:
-            logger.debug(f"Attempting to add track {track['uri']} to playlist {self.playlist_id}")
-            self.add_track_to_playlist(track['uri'])
-        else:
-            logger.warning(f"No playlist_id set for session {self.session_id}. Track not added to playlist.")
+            logger.debug("Attempting to add track %s to playlist %s", track['uri'], self.playlist_id)
+            return self.add_track_to_playlist(track['uri'])
+        logger.warning("No playlist_id set for session %s. Track not added to playlist.", self.session_id)
+        return None
 
     def is_track_on_cooldown(self, track_uri, cooldown_period):
-        last_played = self.queue_cooldowns.get(track_uri, 0)
-        return (time.time() - last_played) < cooldown_period
+        last_played = self.queue_cooldowns.get(track_uri)
+        return last_played is not None and (time.time() - last_played) < cooldown_period
+
+    def reserve_track(self, track_uri, cooldown_period):
+        """Check the cooldown and claim track_uri in one step; False if it's on cooldown.
+
+        Of two guests adding the same track at once, only one gets True. The
+        claim starts the cooldown, so call release_track() if the add fails.
+        """
+        with get_store().updating(self):
+            if self.is_track_on_cooldown(track_uri, cooldown_period):
+                return False
+            now = time.time()
+            self.queue_cooldowns.add(track_uri, now, ttl=cooldown_period, now=now)
+            return True
+
+    def release_track(self, track_uri):
+        """Drop a claim from reserve_track() whose add didn't go through"""
+        with get_store().updating(self):
+            self.queue_cooldowns.discard(track_uri)
 
     def add_track_to_playlist(self, track_uri):
-        logger.debug(f"Entering add_track_to_playlist method for track {track_uri}")
+        """Queue a track for the background playlist writer and return its delivery status"""
         if not self.playlist_id:
             logger.warning(f"No playlist associated with session {self.session_id}, skipping playlist addition")
+            return None
+        if self.playlist_mirror is None or self.playlist_mirror.playlist_id != self.playlist_id:
+            self.playlist_mirror = PlaylistMirror(self.playlist_id)
+        status = enqueue_playlist_add(self.session_id, self.playlist_id, self.get_token_info(),
+                                      track_uri, self.playlist_mirror)
+        logger.debug(f"Track {track_uri} queued for playlist {self.playlist_id}: {status}")
+        return status
+
+    def queue_payload(self, snapshot):
+        """Reconcile the session queue against a player-state snapshot and build the queue view"""
+        queue_info = snapshot['queue_info']
+        current_track = snapshot['current_track']
+
+        # Get current Spotify queue URIs for comparison
+        current_spotify_uris = {track['uri'] for track in queue_info['queue']} if queue_info else set()
+
+        # Drop played tracks from the session queue, keeping those still in the Spotify queue.
+        # Tracks added after the snapshot was taken can't be in it yet, so keep them.
+        fetched_at = snapshot['fetched_at']
+        with get_store().updating(self):
+            self.queue.retain(lambda track: track['uri'] in current_spotify_uris
+                              or track.get('added_at', 0) >= fetched_at)
+            still_queued_tracks = self.queue.to_list()
+            participants = dict(self.participants)
+
+        # User queue contains tracks added by session participants (have added_by info)
+        user_queue = [track for track in still_queued_tracks if track.get('added_by')]
+        participant_uris = {track['uri'] for track in user_queue}
+
+        # Radio queue contains Spotify's algorithm tracks (no added_by info) plus remaining Spotify queue
+        radio_queue = []
+        if queue_info:
+            for track in queue_info['queue']:
+                # If not added by participant, it's a radio track
+                if track['uri'] not in participant_uris:
+                    formatted_track = {
+                        'name': track['name'],
+                        'artists': ', '.join([artist['name'] for artist in track['artists']]),
+                        'uri': track['uri']
+                    }
+                    radio_queue.append(formatted_track)
+
+        return {
+            'current_track': {
+                'name': current_track['item']['name'],
+                'artists': ', '.join([artist['name'] for artist in current_track['item']['artists']])
+            } if current_track and current_track['is_playing'] else None,
+            'user_queue': user_queue,
+            'radio_queue': radio_queue[:5],  # Limit to first 5 tracks
+            'participants': participants,
+            'participant_count': len(participants)
+        }
+
+    def publish_update(self, event_type):
+        """Push the current queue view to anyone streaming this session's events"""
+        snapshot = peek_player_state(self.session_id)
+        if not snapshot or snapshot['queue_info'] is None:
+            # Nobody is streaming yet; the first stream sends the full state on connect
             return
         try:
-            token_info = self.get_token_info()
-            logger.debug(f"Token info retrieved for session {self.session_id}")
-            sp = spotipy.Spotify(auth=token_info['access_token'])
-            
-            logger.info(f"Checking if track {track_uri} is already in playlist {self.playlist_id}")
-            playlist_tracks = sp.playlist_tracks(self.playlist_id)
-            track_uris = [item['track']['uri'] for item in playlist_tracks['items']]
-            
-            if track_uri not in track_uris:
-                logger.info(f"Track {track_uri} not found in playlist. Attempting to add.")
-                result = sp.user_playlist_add_tracks(sp.me()['id'], self.playlist_id, [track_uri])
-                logger.info(f"Add track result: {result}")
-                if result:
-                    logger.info(f"Successfully added track {track_uri} to playlist {self.playlist_id}")
-                else:
-                    logger.warning(f"Failed to add track {track_uri} to playlist {self.playlist_id}. No error raised, but result was falsy.")
-            else:
-                logger.info(f"Track {track_uri} already in playlist {self.playlist_id}, skipping addition")
-        except SpotifyException as e:
-            logger.error(f"Spotify API error adding track to playlist: {str(e)}", exc_info=True)
+            publish(self.session_id, event_type, self.queue_payload(snapshot))
         except Exception as e:
-            logger.error(f"Unexpected error adding track to playlist: {str(e)}", exc_info=True)
-        logger.debug(f"Exiting add_track_to_playlist method for track {track_uri}")
+            logger.error(f"Error publishing {event_type} event for session {self.session_id}: {str(e)}", exc_info=True)
 
     def remove_from_queue(self, track_uri):
-        self.queue = [t for t in self.queue if t['uri'] != track_uri]
+        with get_store().updating(self):
+            self.queue.remove(track_uri)
 
     def get_queue(self):
-        return self.queue
+        return self.queue.to_list()
 
     def clear_queue(self):
-        self.queue = []
+        with get_store().updating(self):
+            self.queue.clear()
 
-# In-memory stores
-active_sessions = {}
-recent_tracks = {}
-event_owner_token = None  # Global event owner token for wedding/event mode
+# Sessions, recent tracks and the event owner token live in the session store
+# (see session_store.py), so every worker process sees the same state.
+EVENT_OWNER_TOKEN_KEY = 'event_owner_token'  # Global event owner token for wedding/event mode
 
 def create_session(owner_token):
     session = Session(owner_token)
-    active_sessions[session.session_id] = session
+    get_store().add(session)
     logger.info(f"Created new session: {session.session_id}")
     return session
 
 def get_session(session_id):
-    return active_sessions.get(session_id)
+    return get_store().get(session_id)
+
+def _stop_session_runtime(session_id):
+    # Pollers, event channels and playlist writers are per process
+    stop_player_state(session_id)
+    close_channel(session_id)
+    stop_playlist_writer(session_id)
 
 def delete_session(session_id):
-    if session_id in active_sessions:
-        del active_sessions[session_id]
+    if get_store().delete(session_id):
+        _stop_session_runtime(session_id)
         logger.info(f"Deleted session: {session_id}")
     else:
         logger.warning(f"Attempted to delete non-existent session: {session_id}")
 
 def set_event_owner_token(token_info):
     """Set the global event owner token for wedding/event mode"""
-    global event_owner_token
-    event_owner_token = token_info
+    get_store().set_value(EVENT_OWNER_TOKEN_KEY, token_info)
     logger.info("Event owner token set for event mode")
 
 def get_event_owner_token():
     """Get the global event owner token for wedding/event mode"""
-    return event_owner_token
+    return get_store().get_value(EVENT_OWNER_TOKEN_KEY)
 
 def add_track_to_session(session, track_uri, track_name, artist_name, participant_id=None):
     logger.info(f"Attempting to add track to session {session.session_id}: {track_name} by {artist_name} (URI: {track_uri})")
@@ -208,40 +366,59 @@ def add_track_to_session(session, track_uri, track_name, artist_name, participan
         'name': track_name,
         'artists': artist_name
     }
-    session.add_to_queue(track, participant_id)
-    added_to_playlist = session.playlist_id is not None
-    logger.info(f"Track {track_name} added to session {session.session_id} queue. Added to playlist: {added_to_playlist}")
+    playlist_status = session.add_to_queue(track, participant_id)
+    added_to_playlist = playlist_status is not None
+    logger.info(f"Track {track_name} added to session {session.session_id} queue. Playlist status: {playlist_status}")
     return {
         'track': track,
-        'added_to_playlist': added_to_playlist
+        'added_to_playlist': added_to_playlist,
+        'playlist_status': playlist_status
     }
 
 def add_recent_track(track):
-    recent_tracks[track.uri] = track
+    data = track.to_dict()
+    data['added_at'] = track.added_at
+    get_store().put_recent_track(track.uri, data, current_app.config['TRACK_COOLDOWN_PERIOD'])
     logger.debug(f"Added recent track: {track.name}")
 
 def get_recent_track(track_uri):
-    return recent_tracks.get(track_uri)
+    data = get_store().get_recent_track(track_uri)
+    if data is None:
+        return None
+    track = Track(data['uri'], data['name'], data['artists'], data.get('album_art'))
+    track.added_at = data['added_at']
+    return track
 
 def is_track_on_cooldown(track_uri):
     track = get_recent_track(track_uri)
     return track and track.is_on_cooldown()
 
 def clear_expired_tracks():
-    current_time = time.time()
-    cooldown_period = current_app.config['TRACK_COOLDOWN_PERIOD']
-    expired_tracks = [uri for uri, track in recent_tracks.items() 
-                      if current_time - track.added_at > cooldown_period]
-    for uri in expired_tracks:
-        del recent_tracks[uri]
-    logger.info(f"Cleared {len(expired_tracks)} expired tracks")
+    cleared = get_store().delete_expired_recent_tracks()
+    logger.info(f"Cleared {cleared} expired tracks")
 
 def cleanup_expired_sessions():
     current_time = time.time()
     expiration_time = current_app.config.get('SESSION_EXPIRATION_TIME', 24 * 60 * 60)  # Default to 24 hours
-    expired_sessions = [sid for sid, session in active_sessions.items() 
-                        if (current_time - session.created_at.timestamp()) > expiration_time]
+    expired_sessions = get_store().expired_session_ids(current_time - expiration_time)
     for sid in expired_sessions:
-        del active_sessions[sid]
+        get_store().delete(sid)
+        _stop_session_runtime(sid)
         logger.info(f"Removed expired session: {sid}")
-    logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
\ No newline at end of file
+    logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
+
+def _janitor(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                cleanup_expired_sessions()
+                clear_expired_tracks()
+        except Exception as e:
+            logger.error(f"Error in cleanup janitor: {str(e)}", exc_info=True)
+
+def init_app(app):
+    """Start the janitor that drops expired sessions and recent tracks"""
+    interval = app.config['CLEANUP_INTERVAL']
+    threading.Thread(target=_janitor, args=(app, interval), name='janitor', daemon=True).start()
+    logger.info(f"Expired session cleanup every {interval}s")
@@ -0,0 +1,144 @@
+# playback_cache.py
+
+from app.cache import TTLCache
+from app.rate_limiter import GovernedSpotify
+
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TTL = 1.0  # seconds; long enough to share a read, short enough to follow the music
+
+PLAYBACK = 'current_playback'
+CURRENTLY_PLAYING = 'currently_playing'
+
+_MISSING = object()
+
+class PlaybackStateCache:
+    """current_playback() and currently_playing() results per token owner, for a short TTL.
+
+    Misses for the same owner collapse into one Spotify call. Commands sent
+    through a pooled client update the cached state or drop it (see
+    PlaybackCachingSpotify), so reads after a command see its effect; only a
+    read already in flight when the command went out can still store the
+    state from before it, for one TTL at most.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get_or_load(self, owner, kind, loader):
+        if self.ttl <= 0:
+            return loader()
+        return self._cache.get_or_load((owner, kind), loader)
+
+    def invalidate(self, owner):
+        for kind in (PLAYBACK, CURRENTLY_PLAYING):
+            self._cache.delete((owner, kind))
+
+    def update(self, owner, device_id=None, is_playing=None, volume=None):
+        """Apply a command's effect to the cached state; drops it if the command was for another device"""
+        # Only fresh entries are updated; anything else is dropped and left to the next read.
+        # peek() so commands don't count as lookups in the hit rate
+        playback = self._cache.peek((owner, PLAYBACK), _MISSING)
+        if playback is _MISSING or not playback:
+            self._cache.delete((owner, PLAYBACK))
+        else:
+            device = playback.get('device') or {}
+            if device_id is not None and device.get('id') != device_id:
+                self.invalidate(owner)
+                return
+            playback = dict(playback)
+            if is_playing is not None:
+                playback['is_playing'] = is_playing
+            if volume is not None:
+                playback['device'] = dict(device, volume_percent=volume)
+            self._cache.set((owner, PLAYBACK), playback)
+
+        if is_playing is not None:
+            currently_playing = self._cache.peek((owner, CURRENTLY_PLAYING), _MISSING)
+            if currently_playing is _MISSING or not currently_playing:
+                self._cache.delete((owner, CURRENTLY_PLAYING))
+            else:
+                self._cache.set((owner, CURRENTLY_PLAYING), dict(currently_playing, is_playing=is_playing))
+
+    def stats(self):
+        return self._cache.stats()
+
+class PlaybackCachingSpotify(GovernedSpotify):
+    """Governed client whose playback reads go through its owner's PlaybackStateCache.
+
+    Player commands sent through it update that cache, or drop it when the
+    result can't be predicted (a new track, a skip, a device change).
+    """
+
+    owner_key = None  # set by spotify_utils.get_client
+
+    def current_playback(self, market=None, additional_types=None):
+        load = super().current_playback
+        if self.owner_key is None or market or additional_types:
+            return load(market, additional_types)
+        return get_playback_cache().get_or_load(self.owner_key, PLAYBACK, load)
+
+    def currently_playing(self, market=None, additional_types=None):
+        load = super().currently_playing
+        if self.owner_key is None or market or additional_types:
+            return load(market, additional_types)
+        return get_playback_cache().get_or_load(self.owner_key, CURRENTLY_PLAYING, load)
+
+    def volume(self, volume_percent, device_id=None):
+        result = super().volume(volume_percent, device_id)
+        self._update(device_id=device_id, volume=volume_percent)
+        return result
+
+    def pause_playback(self, device_id=None):
+        result = super().pause_playback(device_id)
+        self._update(device_id=device_id, is_playing=False)
+        return result
+
+    def start_playback(self, device_id=None, context_uri=None, uris=None, offset=None, position_ms=None):
+        result = super().start_playback(device_id, context_uri, uris, offset, position_ms)
+        if context_uri is None and uris is None and offset is None and position_ms is None:
+            self._update(device_id=device_id, is_playing=True)  # resumed where it was
+        else:
+            self._invalidate()
+        return result
+
+    def next_track(self, device_id=None):
+        result = super().next_track(device_id)
+        self._invalidate()
+        return result
+
+    def previous_track(self, device_id=None):
+        result = super().previous_track(device_id)
+        self._invalidate()
+        return result
+
+    def shuffle(self, state, device_id=None):
+        result = super().shuffle(state, device_id)
+        self._invalidate()
+        return result
+
+    def transfer_playback(self, device_id, force_play=True):
+        result = super().transfer_playback(device_id, force_play)
+        self._invalidate()
+        return result
+
+    def _update(self, **changes):
+        if self.owner_key is not None:
+            get_playback_cache().update(self.owner_key, **changes)
+
+    def _invalidate(self):
+        if self.owner_key is not None:
+            get_playback_cache().invalidate(self.owner_key)
+
+_playback_cache = None
+
+def init_app(app):
+    global _playback_cache
+    _playback_cache = PlaybackStateCache(maxsize=app.config['PLAYBACK_STATE_CACHE_SIZE'],
+                                         ttl=app.config['PLAYBACK_STATE_TTL'])
+
+def get_playback_cache():
+    global _playback_cache
+    if _playback_cache is None:
+        _playback_cache = PlaybackStateCache()
+    return _playback_cache
@@ -0,0 +1,163 @@
+# player_state.py
+
+import threading
+import time
+import logging
+from app.spotify_utils import get_client
+from app.spotify_async import fan_out, call
+from app.track_cache import get_track_cache
+from app.playback_cache import get_playback_cache, CURRENTLY_PLAYING
+from app.rate_limiter import spotify_priority, RateLimited, REFRESH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 3  # seconds between Spotify refreshes
+DEFAULT_IDLE_TIMEOUT = 60  # stop polling once nobody has read the snapshot for this long
+
+class PlayerStatePoller:
+    """Keeps one in-memory snapshot of an owner's player state fresh in the background.
+
+    However many guests are polling, Spotify only sees one queue request and one
+    currently-playing request per refresh interval.
+    """
+
+    def __init__(self, key, token_info, interval=DEFAULT_REFRESH_INTERVAL,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, on_update=None):
+        self.key = key
+        self.token_info = token_info
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.on_update = on_update
+        self.snapshot = None
+        self.last_read = time.time()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"player-state-{key}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Started player state poller for {self.key}")
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def is_running(self):
+        return self._thread.is_alive() and not self._stopped.is_set()
+
+    def refresh_now(self):
+        """Ask the poller to refresh immediately instead of waiting for the next tick"""
+        self._wake.set()
+
+    def get_snapshot(self, timeout=5):
+        """Return the latest snapshot, waiting for the first fetch if there is none yet"""
+        self.last_read = time.time()
+        if not self._ready.is_set():
+            self._ready.wait(timeout)
+        return self.snapshot
+
+    def _fetch(self):
+        sp = get_client(self.token_info)
+        fetched = {}
+
+        def load():
+            # Independent calls, so one round trip instead of two
+            fetched['queue'], current_track = fan_out(sp, call('queue'), call('currently_playing'))
+            return current_track
+
+        # Shared with other pollers and routes for the same owner, which may have just read it
+        current_track = get_playback_cache().get_or_load(sp.owner_key, CURRENTLY_PLAYING, load)
+        queue_info = fetched['queue'] if 'queue' in fetched else fan_out(sp, call('queue'))[0]
+        # The snapshot already has full track objects; keep their metadata around
+        get_track_cache().remember((queue_info or {}).get('queue', []) +
+                                   [(current_track or {}).get('item')])
+        return {
+            'queue_info': queue_info,
+            'current_track': current_track,
+            'fetched_at': time.time(),
+            'error': None
+        }
+
+    @spotify_priority(REFRESH)
+    def _run(self):
+        while not self._stopped.is_set():
+            if time.time() - self.last_read > self.idle_timeout and _retire(self):
+                logger.info(f"Player state poller for {self.key} idle for {self.idle_timeout}s, stopping")
+                break
+
+            try:
+                snapshot = self._fetch()
+            except RateLimited as e:
+                # Polling is shed first under pressure; guests keep seeing the last snapshot
+                logger.info(f"Player state refresh for {self.key} skipped: {str(e)}")
+                snapshot = dict(self.snapshot or {'queue_info': None, 'current_track': None,
+                                                  'fetched_at': time.time(), 'error': str(e)})
+            except Exception as e:
+                logger.error(f"Error refreshing player state for {self.key}: {str(e)}")
+                # Keep serving the last good data, but surface the error
+                snapshot = dict(self.snapshot or {'queue_info': None, 'current_track': None, 'fetched_at': time.time()})
+                snapshot['error'] = str(e)
+
+            self.snapshot = snapshot
+            self._ready.set()
+
+            if self.on_update:
+                try:
+                    self.on_update(snapshot)
+                except Exception as e:
+                    logger.error(f"Error in player state update callback for {self.key}: {str(e)}", exc_info=True)
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+# One poller per key (a session ID or an owner token key)
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+def _retire(poller):
+    """Remove an idle poller from the registry unless it was read in the meantime"""
+    with _pollers_lock:
+        if time.time() - poller.last_read <= poller.idle_timeout:
+            return False
+        poller._stopped.set()
+        if _pollers.get(poller.key) is poller:
+            del _pollers[poller.key]
+        return True
+
+def get_poller(key, token_info, interval=DEFAULT_REFRESH_INTERVAL,
+               idle_timeout=DEFAULT_IDLE_TIMEOUT, on_update=None):
+    """Return the running poller for key, starting one if needed"""
+    with _pollers_lock:
+        poller = _pollers.get(key)
+        if poller is None or not poller.is_running():
+            poller = PlayerStatePoller(key, token_info, interval, idle_timeout, on_update)
+            _pollers[key] = poller
+            poller.start()
+        else:
+            # Pick up refreshed tokens without restarting the poller
+            poller.token_info = token_info
+        poller.last_read = time.time()
+    return poller
+
+def get_player_state(key, token_info, **kwargs):
+    """Return the shared player-state snapshot for key"""
+    return get_poller(key, token_info, **kwargs).get_snapshot()
+
+def peek_player_state(key):
+    """Return the latest snapshot for key without starting a poller or waiting"""
+    poller = _pollers.get(key)
+    return poller.snapshot if poller else None
+
+def refresh_player_state(key):
+    """Trigger an immediate refresh of a running poller, if there is one"""
+    poller = _pollers.get(key)
+    if poller:
+        poller.refresh_now()
+
+def stop_player_state(key):
+    with _pollers_lock:
+        poller = _pollers.pop(key, None)
+    if poller:
+        poller.stop()
+        logger.info(f"Stopped player state poller for {key}")
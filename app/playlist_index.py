@@ -0,0 +1,65 @@
+# playlist_index.py
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PlaylistIndex:
+    """Persistent (user id, playlist name) -> playlist id lookup backed by SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS playlist_index (
+                    user_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    playlist_id TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, name)
+                )
+            """)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id, name):
+        row = self._connect().execute(
+            "SELECT playlist_id FROM playlist_index WHERE user_id = ? AND name = ?",
+            (user_id, name)).fetchone()
+        return row[0] if row else None
+
+    def put(self, user_id, name, playlist_id):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlist_index (user_id, name, playlist_id, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, name, playlist_id, time.time()))
+
+    def delete(self, user_id, name):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM playlist_index WHERE user_id = ? AND name = ?", (user_id, name))
+
+_index = None
+
+def init_app(app):
+    """Open the playlist index in the app's instance folder"""
+    global _index
+    path = app.config.get('PLAYLIST_INDEX_PATH') or os.path.join(app.instance_path, 'playlist_index.sqlite3')
+    _index = PlaylistIndex(path)
+    logger.info(f"Playlist index at {path}")
+
+def get_playlist_index():
+    return _index
@@ -0,0 +1,255 @@
+# playlist_writer.py
+
+from collections import OrderedDict
+from spotipy.exceptions import SpotifyException
+import threading
+import time
+import logging
+from app.spotify_utils import get_client
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100  # Spotify's limit for one playlist add
+DEFAULT_FLUSH_DELAY = 1.0  # seconds to wait for more adds before writing a batch
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 1.0  # first retry delay in seconds, doubled on every attempt
+MAX_BACKOFF = 30.0
+MAX_TRACKED_STATUSES = 500  # delivery statuses kept per session
+
+PENDING = 'pending'
+DELIVERED = 'delivered'
+DUPLICATE = 'duplicate'  # already in the playlist, nothing written
+FAILED = 'failed'
+
+PLAYLIST_PAGE_SIZE = 100  # Spotify's maximum for playlist items
+MIRROR_REVALIDATE_INTERVAL = 60  # seconds between snapshot_id checks
+
+def _is_retryable(error):
+    if isinstance(error, SpotifyException):
+        return error.http_status == 429 or error.http_status >= 500
+    # Network errors, timeouts and the like
+    return True
+
+class PlaylistMirror:
+    """Local set of the track URIs in a playlist, for in-memory duplicate checks.
+
+    Loaded once by paging through the whole playlist, kept current from our
+    own appends, and revalidated against the playlist's snapshot_id so edits
+    made outside LazyDJ are picked up.
+    """
+
+    def __init__(self, playlist_id, uris=None, snapshot_id=None):
+        self.playlist_id = playlist_id
+        self.uris = set(uris) if uris is not None else None
+        self.snapshot_id = snapshot_id
+        self.validated_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.uris is not None
+
+    def __contains__(self, track_uri):
+        uris = self.uris
+        return uris is not None and track_uri in uris
+
+    def load(self, sp):
+        snapshot_id = sp.playlist(self.playlist_id, fields='snapshot_id')['snapshot_id']
+        uris = set()
+        offset = 0
+        while True:
+            page = sp.playlist_items(self.playlist_id, fields='items(track(uri)),next',
+                                     limit=PLAYLIST_PAGE_SIZE, offset=offset, additional_types=('track',))
+            uris.update(item['track']['uri'] for item in page['items'] if item.get('track'))
+            if not page.get('next'):
+                break
+            offset += PLAYLIST_PAGE_SIZE
+        with self._lock:
+            self.uris = uris
+            self.snapshot_id = snapshot_id
+            self.validated_at = time.monotonic()
+        logger.info(f"Loaded {len(uris)} track(s) from playlist {self.playlist_id} (snapshot {snapshot_id})")
+
+    def ensure_current(self, sp, max_age=MIRROR_REVALIDATE_INTERVAL):
+        """Load the mirror, or reload it if the playlist changed since it was last checked"""
+        if not self.loaded:
+            self.load(sp)
+            return
+        if time.monotonic() - self.validated_at < max_age:
+            return
+        snapshot_id = sp.playlist(self.playlist_id, fields='snapshot_id')['snapshot_id']
+        if snapshot_id != self.snapshot_id:
+            logger.info(f"Playlist {self.playlist_id} changed outside LazyDJ, reloading mirror")
+            self.load(sp)
+        else:
+            self.validated_at = time.monotonic()
+
+    def record_add(self, track_uris, snapshot_id=None):
+        """Account for tracks we appended ourselves, without refetching the playlist"""
+        with self._lock:
+            if self.uris is None:
+                return
+            self.uris.update(track_uris)
+            if snapshot_id:
+                self.snapshot_id = snapshot_id
+
+class PlaylistWriter:
+    """Write-behind queue that appends a session's tracks to its playlist in batches.
+
+    Guests only wait for the Spotify queue add; playlist writes are coalesced
+    here and delivered in the background, with retries and per-track status.
+    """
+
+    def __init__(self, session_id, playlist_id, token_info, mirror=None, flush_delay=DEFAULT_FLUSH_DELAY,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+        self.session_id = session_id
+        self.playlist_id = playlist_id
+        self.mirror = mirror or PlaylistMirror(playlist_id)
+        self.token_info = token_info
+        self.flush_delay = flush_delay
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._pending = []
+        self._statuses = OrderedDict()  # uri -> status dict, oldest first
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"playlist-writer-{session_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop accepting work, giving pending tracks a last chance to be written"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def enqueue(self, track_uri, token_info=None):
+        with self._cond:
+            if token_info:
+                self.token_info = token_info
+            if track_uri in self.mirror:
+                self._set_status(track_uri, DUPLICATE)
+                return DUPLICATE
+            status = self._statuses.get(track_uri)
+            if status and status['status'] in (PENDING, DELIVERED, DUPLICATE):
+                logger.debug(f"Track {track_uri} already {status['status']} for playlist {self.playlist_id}, skipping")
+                return status['status']
+            self._pending.append(track_uri)
+            self._set_status(track_uri, PENDING)
+            self._cond.notify_all()
+            return PENDING
+
+    def status(self, track_uri=None):
+        with self._cond:
+            if track_uri:
+                return dict(self._statuses[track_uri]) if track_uri in self._statuses else None
+            counts = {PENDING: 0, DELIVERED: 0, DUPLICATE: 0, FAILED: 0}
+            for status in self._statuses.values():
+                counts[status['status']] += 1
+            return {
+                'playlist_id': self.playlist_id,
+                'counts': counts,
+                'tracks': {uri: dict(status) for uri, status in self._statuses.items()}
+            }
+
+    def _set_status(self, track_uri, state, attempts=0, error=None):
+        # Caller holds self._cond
+        self._statuses[track_uri] = {
+            'status': state,
+            'attempts': attempts,
+            'error': error,
+            'updated_at': time.time()
+        }
+        self._statuses.move_to_end(track_uri)
+        while len(self._statuses) > MAX_TRACKED_STATUSES:
+            self._statuses.popitem(last=False)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            # Give concurrent adds a moment to join this batch
+            deadline = time.monotonic() + self.flush_delay
+            while (not self._stopped and len(self._pending) < MAX_BATCH_SIZE
+                   and time.monotonic() < deadline):
+                self._cond.wait(deadline - time.monotonic())
+            batch = self._pending[:MAX_BATCH_SIZE]
+            del self._pending[:MAX_BATCH_SIZE]
+            return batch
+
+    def _write(self, batch):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                sp = get_client(self.token_info)
+                self.mirror.ensure_current(sp)
+                duplicates = [uri for uri in batch if uri in self.mirror]
+                batch = [uri for uri in batch if uri not in self.mirror]
+                with self._cond:
+                    for uri in duplicates:
+                        self._set_status(uri, DUPLICATE, attempt)
+                if not batch:
+                    return
+
+                result = sp.playlist_add_items(self.playlist_id, batch)
+                self.mirror.record_add(batch, result.get('snapshot_id') if result else None)
+                logger.info(f"Added {len(batch)} track(s) to playlist {self.playlist_id} for session {self.session_id}")
+                with self._cond:
+                    for uri in batch:
+                        self._set_status(uri, DELIVERED, attempt)
+                return
+            except Exception as e:
+                retry = _is_retryable(e) and attempt < self.max_attempts and not self._stopped
+                logger.warning(f"Playlist add of {len(batch)} track(s) to {self.playlist_id} failed "
+                               f"(attempt {attempt}/{self.max_attempts}, retrying: {retry}): {str(e)}")
+                if not retry:
+                    with self._cond:
+                        for uri in batch:
+                            self._set_status(uri, FAILED, attempt, str(e))
+                    return
+                with self._cond:
+                    for uri in batch:
+                        self._set_status(uri, PENDING, attempt, str(e))
+                    deadline = time.monotonic() + min(self.backoff * 2 ** (attempt - 1), MAX_BACKOFF)
+                    while not self._stopped and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            # Drop duplicates within the batch, keeping the first occurrence
+            self._write(list(dict.fromkeys(batch)))
+        logger.debug(f"Playlist writer for session {self.session_id} stopped")
+
+# One writer per session
+_writers = {}
+_writers_lock = threading.Lock()
+
+def enqueue_playlist_add(session_id, playlist_id, token_info, track_uri, mirror=None):
+    """Queue track_uri for writing to the session playlist; returns its delivery status"""
+    with _writers_lock:
+        writer = _writers.get(session_id)
+        if writer is None or writer.playlist_id != playlist_id:
+            if writer:
+                writer.stop(timeout=0)
+            writer = PlaylistWriter(session_id, playlist_id, token_info, mirror)
+            _writers[session_id] = writer
+            writer.start()
+    return writer.enqueue(track_uri, token_info)
+
+def get_playlist_status(session_id, track_uri=None):
+    writer = _writers.get(session_id)
+    return writer.status(track_uri) if writer else None
+
+def stop_playlist_writer(session_id):
+    with _writers_lock:
+        writer = _writers.pop(session_id, None)
+    if writer:
+        writer.stop()
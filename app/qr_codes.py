@@ -0,0 +1,75 @@
+# qr_codes.py
+
+import hashlib
+from io import BytesIO
+from collections import namedtuple
+import qrcode
+import qrcode.image.svg
+from app.cache import TTLCache
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_SIZE = 300  # pixels
+MIN_SIZE = 100
+MAX_SIZE = 1000
+BORDER = 4  # modules of quiet zone, the minimum the QR spec allows
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# A rendered image and the strong ETag of its bytes
+QRImage = namedtuple('QRImage', ['body', 'mimetype', 'etag'])
+
+def clamp_size(size):
+    if size is None:
+        return DEFAULT_SIZE
+    return max(MIN_SIZE, min(MAX_SIZE, size))
+
+def render_qr(data, fmt='png', size=DEFAULT_SIZE):
+    """Render data as a QR code roughly size pixels wide"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=BORDER)
+    qr.add_data(data)
+    qr.make(fit=True)
+    # Whole pixels per module keep the edges sharp, so the width is only roughly size
+    qr.box_size = max(1, round(size / (qr.modules_count + 2 * BORDER)))
+
+    buffered = BytesIO()
+    if fmt == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathFillImage).save(buffered)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffered, format='PNG')
+    body = buffered.getvalue()
+    return QRImage(body, FORMATS[fmt], hashlib.sha256(body).hexdigest()[:32])
+
+class QRCodeCache:
+    """Rendered QR images by (data, format, size), bounded by LRU.
+
+    A QR code is a pure function of its inputs, so entries never expire; they
+    are only evicted when the cache is full. Concurrent misses for the same
+    image render it once.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=0)
+
+    def get(self, data, fmt='png', size=DEFAULT_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported QR format: {fmt}")
+        size = clamp_size(size)
+        return self._cache.get_or_load((data, fmt, size), lambda: render_qr(data, fmt, size))
+
+    def stats(self):
+        return self._cache.stats()
+
+_qr_cache = None
+
+def init_app(app):
+    global _qr_cache
+    _qr_cache = QRCodeCache(maxsize=app.config['QR_CACHE_SIZE'])
+
+def get_qr_cache():
+    global _qr_cache
+    if _qr_cache is None:
+        _qr_cache = QRCodeCache()
+    return _qr_cache
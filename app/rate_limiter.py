@@ -0,0 +1,194 @@
+# rate_limiter.py
+
+from collections import OrderedDict
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+import threading
+import time
+import logging
+from spotipy.exceptions import SpotifyException
+from app.metrics import InstrumentedSpotify
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most important first
+HOST = 0  # host and event-mode playback controls
+QUEUE = 1  # guests adding tracks (and anything not marked otherwise)
+REFRESH = 2  # now-playing and queue polling
+AUTOCOMPLETE = 3  # search-as-you-type suggestions
+PRIORITY_NAMES = {HOST: 'host', QUEUE: 'queue', REFRESH: 'refresh', AUTOCOMPLETE: 'autocomplete'}
+
+# Share of the bucket each class must leave untouched, so lower classes run dry first
+DEFAULT_RESERVES = {HOST: 0.0, QUEUE: 0.2, REFRESH: 0.5, AUTOCOMPLETE: 0.7}
+# Seconds each class may wait for capacity; zero means shed right away. Polling runs in the
+# background, so it can afford to wait a little rather than lose its second call
+DEFAULT_MAX_WAITS = {HOST: 5.0, QUEUE: 3.0, REFRESH: 1.0, AUTOCOMPLETE: 0.0}
+DEFAULT_RETRY_AFTER = 1.0  # seconds, when a 429 has no usable Retry-After header
+MAX_BUCKETS = 256
+
+_priority = ContextVar('spotify_priority', default=QUEUE)
+
+class spotify_priority(ContextDecorator):
+    """Run Spotify calls in the block (or decorated view) at the given priority class"""
+
+    def __init__(self, priority):
+        self.priority = priority
+        self._token = None
+
+    def _recreate_cm(self):
+        # A decorated view can run on many threads at once; each call gets its own instance
+        return spotify_priority(self.priority)
+
+    def __enter__(self):
+        self._token = _priority.set(self.priority)
+        return self
+
+    def __exit__(self, *exc):
+        _priority.reset(self._token)
+        return False
+
+def current_priority():
+    return _priority.get()
+
+class RateLimited(SpotifyException):
+    """A call the governor refused to send, or gave up on after a 429"""
+
+    def __init__(self, priority, retry_after, reason):
+        super().__init__(429, -1, f"Rate limited ({PRIORITY_NAMES[priority]}): {reason}",
+                         headers={'Retry-After': str(max(1, round(retry_after)))})
+        self.priority = priority
+        self.retry_after = retry_after
+
+def retry_after_seconds(error):
+    """The Retry-After of a 429 SpotifyException, in seconds"""
+    try:
+        return max(0.0, float((error.headers or {}).get('Retry-After')))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+class TokenBucket:
+    """rate tokens per second up to burst, plus a hard stop until a Retry-After has passed"""
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, reserve, now):
+        """Seconds until one token can be taken while leaving reserve tokens behind"""
+        self._refill(now)
+        blocked = max(0.0, self.blocked_until - now)
+        shortfall = reserve + 1 - self.tokens
+        return max(blocked, shortfall / self.rate if shortfall > 0 else 0.0)
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+
+class SpotifyGovernor:
+    """Paces Spotify calls per access token and decides who goes first under pressure.
+
+    Each token gets a bucket refilled at rate calls per second. Lower
+    priority classes must leave a larger share of the bucket behind, so
+    when calls pile up the autocomplete and polling traffic is refused
+    first while host controls and queue adds still get through. After a
+    429 the token is blocked until Retry-After has passed; classes with a
+    max wait longer than that wait it out, the rest fail fast.
+    """
+
+    def __init__(self, rate=10.0, burst=30, reserves=None, max_waits=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.reserves = dict(DEFAULT_RESERVES, **(reserves or {}))
+        self.max_waits = dict(DEFAULT_MAX_WAITS, **(max_waits or {}))
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets = OrderedDict()  # access token -> TokenBucket, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {name: {'granted': 0, 'waited': 0, 'shed': 0} for name in PRIORITY_NAMES.values()}
+        self.stats['rate_limited_responses'] = 0
+
+    def _bucket(self, key, now):
+        # Caller holds self._lock
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def acquire(self, key, priority):
+        """Wait for capacity to send one call, or raise RateLimited"""
+        name = PRIORITY_NAMES[priority]
+        reserve = self.reserves[priority] * self.burst
+        deadline = self._clock() + self.max_waits[priority]
+        waited = False
+        while True:
+            with self._lock:
+                now = self._clock()
+                bucket = self._bucket(key, now)
+                wait = bucket.wait_time(reserve, now)
+                if wait == 0:
+                    bucket.take()
+                    self.stats[name]['granted'] += 1
+                    if waited:
+                        self.stats[name]['waited'] += 1
+                    return
+                if now + wait > deadline:
+                    self.stats[name]['shed'] += 1
+                    blocked = bucket.blocked_until > now
+                    raise RateLimited(priority, wait, "Spotify asked us to back off" if blocked
+                                      else "too many Spotify calls for this account")
+            waited = True
+            self._sleep(wait)
+
+    def rate_limited(self, key, retry_after):
+        """Record a 429 from Spotify: nothing goes out on this token until retry_after has passed"""
+        with self._lock:
+            now = self._clock()
+            self._bucket(key, now).block(retry_after, now)
+            self.stats['rate_limited_responses'] += 1
+        logger.warning(f"Spotify returned 429, holding calls for {retry_after:.1f}s")
+
+class GovernedSpotify(InstrumentedSpotify):
+    """Instrumented spotipy client whose every call goes through the governor first"""
+
+    def _internal_call(self, method, url, payload, params):
+        governor = get_governor()
+        priority = current_priority()
+        for attempt in (1, 2):
+            governor.acquire(self._auth, priority)
+            try:
+                return super()._internal_call(method, url, payload, params)
+            except SpotifyException as e:
+                if e.http_status != 429:
+                    raise
+                retry_after = retry_after_seconds(e)
+                governor.rate_limited(self._auth, retry_after)
+                if attempt == 2 or governor.max_waits[priority] < retry_after:
+                    raise RateLimited(priority, retry_after, "Spotify returned 429") from e
+                # One more try once the Retry-After has passed, since this class may wait that long
+
+_governor = None
+
+def init_app(app):
+    global _governor
+    _governor = SpotifyGovernor(rate=app.config['SPOTIFY_RATE_LIMIT'], burst=app.config['SPOTIFY_RATE_BURST'])
+
+def get_governor():
+    global _governor
+    if _governor is None:
+        _governor = SpotifyGovernor()
+    return _governor
@@ -1,29 +1,31 @@
 # routes.py
 
 from flask import Blueprint, render_template, redirect, url_for, request, jsonify, session as flask_session, current_app
-from app.spotify_utils import get_token, get_spotify_oauth, format_track_info, get_spotify_client
-from app.models import add_recent_track, Track, add_track_to_session, get_session, delete_session
+from app.spotify_utils import get_token, get_spotify_oauth, format_track_info, get_spotify_client, token_key, search_tracks, get_client
+from app.models import add_recent_track, get_recent_track, Track, add_track_to_session, get_session, delete_session
 from app.admin import check_if_admin
 from app.sessions import create_new_session
 from app.sessions import bp as sessions_bp
 from .log_utils import format_debug_output
+from .player_state import get_player_state, refresh_player_state
+from .transitions import get_engine as get_transition_engine
+from .track_cache import get_track_cache
+from .event_config import get_event_config
+from .rate_limiter import spotify_priority, RateLimited, HOST, AUTOCOMPLETE
+from .event_arm import arm_event, get_armed_event, disarm_event, NoDeviceError
+from .volume_ramp import ramp_volume, CURVES
 
 import spotipy
 from spotipy.exceptions import SpotifyException
 import time
 import logging
 import os
-from threading import Lock
 import traceback
 import json
 
 bp = Blueprint('routes', __name__)
 logger = logging.getLogger(__name__)
 
-# Store recently added tracks
-recent_tracks = {}
-queue_lock = Lock()
-
 def qr_code_exists():
     """Check if the QR code file exists in the static folder."""
     static_folder = os.path.join(current_app.root_path, 'static')
@@ -139,20 +141,8 @@ def search():
         return render_template('search.html', tracks=[], query=query, qr_code_available=qr_code_available, wedding_mode=wedding_mode)
 
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        results = sp.search(q=query, type='track', limit=10)
-        tracks = results['tracks']['items']
-
-        track_info = []
-        for track in tracks:
-            track_data = {
-                'name': track['name'],
-                'artists': ', '.join([artist['name'] for artist in track['artists']]),
-                'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                'uri': track['uri'],
-                'id': track['id']
-            }
-            track_info.append(track_data)
+        sp = get_client(token_info)
+        track_info = search_tracks(sp, query)
 
         return jsonify({"tracks": track_info})
     except SpotifyException as e:
@@ -177,71 +167,78 @@ def queue():
     artist_name = request.form.get('artist_name')
     is_admin = request.form.get('is_admin') == 'true'
 
-    logger.debug(f"Attempting to queue: {track_name} by {artist_name}")
+    logger.debug("Attempting to queue: %s by %s", track_name, artist_name)
 
     if not track_uri:
         logger.error("No track_uri provided in request")
         return jsonify({"status": "error", "type": "error", "message": "No track URI provided"}), 400
 
-    cooldown_period = 1200  # 20 minutes in seconds
+    cooldown_period = current_app.config['TRACK_COOLDOWN_PERIOD']
 
-    with queue_lock:
-        # Get the current session if it exists
-        current_session_id = flask_session.get('current_session_id')
-        logger.debug(f"Current session ID: {current_session_id}")
-        
-        if current_session_id:
-            current_session = get_session(current_session_id)
-            if not current_session:
-                logger.error(f"No session found for ID: {current_session_id}")
-                return jsonify({"status": "error", "type": "error", "message": "Session not found"}), 404
+    # Get the current session if it exists
+    current_session_id = flask_session.get('current_session_id')
+    logger.debug("Current session ID: %s", current_session_id)
+
+    if current_session_id:
+        current_session = get_session(current_session_id)
+        if not current_session:
+            logger.error("No session found for ID: %s", current_session_id)
+            return jsonify({"status": "error", "type": "error", "message": "Session not found"}), 404
+    else:
+        # If no session, we'll just add to the Spotify queue without session functionality
+        logger.info("No active session, proceeding without session functionality")
+        current_session = None
+
+    # Claimed before the Spotify call so a concurrent add of the same track is turned away
+    reserved = current_session is not None and not is_admin
+    if reserved and not current_session.reserve_track(track_uri, cooldown_period):
+        logger.debug("Track on cooldown: %s by %s", track_name, artist_name)
+        return jsonify({"status": "error", "message": "This track was recently played. Please try again later."}), 200
+
+    sp = get_client(token_info)
+
+    try:
+        sp.add_to_queue(track_uri)
+    except SpotifyException as e:
+        if reserved:
+            current_session.release_track(track_uri)
+        logger.error("Spotify API error: %s", e)
+        if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
+            return jsonify({"status": "error", "type": "error", "message": "No active device found. Please open Spotify on a device and try again."})
         else:
-            # If no session, we'll just add to the Spotify queue without session functionality
-            logger.info("No active session, proceeding without session functionality")
-            current_session = None
+            return jsonify({"status": "error", "type": "error", "message": f"An error occurred: {str(e)}"})
+    except Exception:
+        # Never queued (e.g. a network error spotipy doesn't wrap), so don't hold the cooldown
+        if reserved:
+            current_session.release_track(track_uri)
+        raise
 
-        if current_session and not is_admin and current_session.is_track_on_cooldown(track_uri, cooldown_period):
-            logger.debug(f"Track on cooldown: {track_name} by {artist_name}")
-            return jsonify({"status": "error", "message": "This track was recently played. Please try again later."}), 200
+    logger.debug("Successfully added to Spotify queue: %s by %s", track_name, artist_name)
+    refresh_player_state(f"user:{token_key(token_info)}")
 
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        
-        try:
-            sp.add_to_queue(track_uri)
-            logger.debug(f"Successfully added to Spotify queue: {track_name} by {artist_name}")
-            
-            # Add track to recent_tracks
-            recent_tracks[track_uri] = {
-                'name': track_name,
-                'artists': artist_name,
-                'added_at': time.time()
-            }
-            
-            if current_session:
-                # Get participant ID from session
-                participant_id = flask_session.get(f'participant_id_{current_session_id}')
-                
-                # Add track to session
-                result = add_track_to_session(current_session, track_uri, track_name, artist_name, participant_id)
-                logger.debug(f"Result of add_track_to_session: {result}")
-                
-                if result['added_to_playlist']:
-                    logger.info(f"Track added to playlist: {track_name} by {artist_name}")
-                else:
-                    logger.warning(f"Track not added to playlist: {track_name} by {artist_name}")
-                
-                return jsonify({"status": "success", "type": "success", "message": "Track added to queue and session!"})
-            else:
-                return jsonify({"status": "success", "type": "success", "message": "Track added to queue!"})
-        except SpotifyException as e:
-            logger.error(f"Spotify API error: {str(e)}")
-            if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
-                return jsonify({"status": "error", "type": "error", "message": "No active device found. Please open Spotify on a device and try again."})
-            else:
-                return jsonify({"status": "error", "type": "error", "message": f"An error occurred: {str(e)}"})
+    # Add track to recent tracks
+    add_recent_track(Track(uri=track_uri, name=track_name, artists=artist_name))
+
+    if current_session:
+        # Get participant ID from session
+        participant_id = flask_session.get(f'participant_id_{current_session_id}')
+
+        # Add track to session
+        result = add_track_to_session(current_session, track_uri, track_name, artist_name, participant_id)
+        logger.debug("Result of add_track_to_session: %s", result)
+
+        if result['added_to_playlist']:
+            logger.info("Track added to playlist: %s by %s", track_name, artist_name)
+        else:
+            logger.warning("Track not added to playlist: %s by %s", track_name, artist_name)
+
+        return jsonify({"status": "success", "type": "success", "message": "Track added to queue and session!"})
+    else:
+        return jsonify({"status": "success", "type": "success", "message": "Track added to queue!"})
 
 
 @bp.route('/play_now', methods=['POST'])
+@spotify_priority(HOST)
 def play_now():
     token_info = get_token()
     if not token_info:
@@ -251,17 +248,19 @@ def play_now():
     if not track_uri:
         return jsonify({"status": "error", "message": "No track URI provided"}), 400
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
     
     try:
         sp.start_playback(uris=[track_uri])
-        track_info = sp.track(track_uri)
-        add_recent_track(Track(
-            uri=track_uri,
-            name=track_info['name'],
-            artists=', '.join([artist['name'] for artist in track_info['artists']]),
-            album_art=track_info['album']['images'][0]['url'] if track_info['album']['images'] else None
-        ))
+        refresh_player_state(f"user:{token_key(token_info)}")
+        track_info = get_track_cache().get_one(sp, track_uri)
+        if track_info:
+            add_recent_track(Track(
+                uri=track_uri,
+                name=track_info['name'],
+                artists=track_info['artists'],
+                album_art=track_info['album_art']
+            ))
         return jsonify({"status": "success", "message": "Track started playing"})
     except SpotifyException as e:
         logger.error(f"Spotify API error: {str(e)}")
@@ -278,9 +277,20 @@ def current_queue():
         return jsonify({"error": "Not authenticated"}), 401
 
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        queue_info = sp._get('me/player/queue')
-        current_track = sp.currently_playing()
+        # Answered from the shared snapshot so guest polling doesn't multiply Spotify calls
+        snapshot = get_player_state(
+            f"user:{token_key(token_info)}",
+            token_info,
+            interval=current_app.config['PLAYER_STATE_REFRESH_INTERVAL'],
+            idle_timeout=current_app.config['PLAYER_STATE_IDLE_TIMEOUT']
+        )
+        if not snapshot or (snapshot['error'] and snapshot['queue_info'] is None):
+            error = snapshot['error'] if snapshot else "Timed out waiting for player state"
+            logger.error("Error fetching queue: %s", error)
+            return jsonify({"error": "An unexpected error occurred"}), 500
+
+        queue_info = snapshot['queue_info']
+        current_track = snapshot['current_track']
 
         user_queue = []
         radio_queue = []
@@ -292,19 +302,19 @@ def current_queue():
                     'artists': ', '.join([artist['name'] for artist in track['artists']]),
                     'uri': track['uri']
                 }
-                # Check if the track is in recent_tracks
-                if track['uri'] in recent_tracks:
+                # Check if the track is in recent tracks
+                if get_recent_track(track['uri']):
                     user_queue.append(track_info)
                 else:
                     radio_queue.append(track_info)
 
-        debug_data = {
-            'current_track': current_track,
-            'user_queue': user_queue,
-            'radio_queue': radio_queue
-        }
-        formatted_output = format_debug_output(debug_data)
-        logger.debug(f"Queue Information:\n{formatted_output}")
+        if logger.isEnabledFor(logging.DEBUG):
+            debug_data = {
+                'current_track': current_track,
+                'user_queue': user_queue,
+                'radio_queue': radio_queue
+            }
+            logger.debug("Queue Information:\n%s", format_debug_output(debug_data))
 
         return jsonify({
             'current_track': {
@@ -315,11 +325,12 @@ def current_queue():
             'radio_queue': radio_queue[:5]  # Limit to first 5 tracks
         })
     except Exception as e:
-        logger.error(f"Error fetching queue: {str(e)}")
+        logger.error("Error fetching queue: %s", e)
         logger.error(traceback.format_exc())
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 @bp.route('/recommendations', methods=['GET'])
+@spotify_priority(AUTOCOMPLETE)
 def recommendations():
     token_info = get_token()
     if not token_info:
@@ -329,19 +340,12 @@ def recommendations():
     if not query:
         return jsonify([])
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
-    results = sp.search(q=query, type='track', limit=10)
-    tracks = results['tracks']['items']
-
-    track_info = []
-    for track in tracks:
-        track_data = {
-            'name': track['name'],
-            'artists': ', '.join([artist['name'] for artist in track['artists']]),
-            'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
-            'uri': track['uri']
-        }
-        track_info.append(track_data)
+    sp = get_client(token_info)
+    try:
+        track_info = search_tracks(sp, query)
+    except RateLimited:
+        # Suggestions are the first thing to go when Spotify calls are scarce
+        return jsonify([])
 
     return jsonify(track_info)
 
@@ -372,66 +376,18 @@ def end_session():
 
 # Event Mode Routes - for single-user event control (weddings, parties, etc.)
 def load_event_config():
-    """Load event configuration including preset songs and playlist URI"""
-    # Debug current paths
-    logger.info(f"App root path: {current_app.root_path}")
-    logger.info(f"Current working directory: {os.getcwd()}")
-    
-    # Try multiple possible locations for the config file
-    possible_paths = [
-        # Direct path in project root
-        os.path.join(os.getcwd(), 'event_preset_songs.json'),
-        # Relative to app directory
-        os.path.join(current_app.root_path, '..', 'event_preset_songs.json'),
-        # Using dirname approach
-        os.path.join(os.path.dirname(current_app.root_path), 'event_preset_songs.json'),
-        # Absolute path we know works
-        '/mnt/c/Users/pierc/git/LazyDJ/event_preset_songs.json'
-    ]
-    
-    config_path = None
-    for path in possible_paths:
-        abs_path = os.path.abspath(path)
-        logger.debug(f"Checking path: {abs_path} - exists: {os.path.exists(path)}")
-        if os.path.exists(path):
-            config_path = path
-            logger.info(f"Found config file at: {abs_path}")
-            break
-    
-    if not config_path:
-        logger.error("Config file not found in any expected location")
-        config_path = possible_paths[0]  # Use first path for error message
-    
-    try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-            logger.info(f"Successfully loaded event config with {len(config.get('preset_songs', []))} preset songs")
-            for song in config.get('preset_songs', []):
-                logger.debug(f"Loaded preset song: {song.get('name')}")
-            return config
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logger.error(f"Error loading event config from {config_path}: {str(e)}")
-        logger.warning("Using fallback default config")
-        # Fallback to default config if file is missing or invalid
-        return {
-            'preset_songs': [
-                {'name': 'First Dance Song', 'uri': 'spotify:track:4uLU6hMCjMI75M1A2tKUQC'},
-                {'name': 'Wedding Party Entrance', 'uri': 'spotify:track:2takcwOaAZWiXQijPHIx7B'},
-                {'name': 'Cake Cutting Music', 'uri': 'spotify:track:1CS7Sd1u5tWkstBhpssyjP'},
-                {'name': 'Grand Entrance', 'uri': 'spotify:track:6fxVffaTuwjgEk5h9XvInH'},
-                {'name': 'Slow Dance', 'uri': 'spotify:track:3CeCwYWvdfXbZLXFhBrbnf'}
-            ],
-            'wedding_playlist_uri': 'spotify:playlist:2Td5DabJz8POOhcEYmCmEA'
-        }
+    """The active event configuration (preset songs and playlist URI), held in memory"""
+    return get_event_config()
 
 @bp.route('/event-mode')
+@spotify_priority(HOST)
 def event_mode():
     """Event Mode interface for controlling music during live events"""
     from app.models import get_event_owner_token, set_event_owner_token
     
     # Load event configuration including preset songs
     config = load_event_config()
-    preset_songs = config.get('preset_songs', [])
+    preset_songs = config.preset_songs
     
     # Check if we have an event owner token set
     event_token = get_event_owner_token()
@@ -443,6 +399,11 @@ def event_mode():
         event_token = current_user_token
         logger.info("User set as event owner")
     
+    # Fetch preset metadata now so a preset tap doesn't wait on it
+    if current_user_token and preset_songs:
+        get_track_cache().prewarm(get_client(current_user_token),
+                                  [song.uri for song in preset_songs])
+
     # Store event token in user's session for API calls
     if event_token:
         if isinstance(event_token, str):
@@ -450,20 +411,122 @@ def event_mode():
         else:
             flask_session['token_info'] = json.dumps(event_token)
     
+    armed = get_armed_event(current_user_token) if current_user_token else None
     logger.info(f"Event Mode accessed - event owner token available: {event_token is not None}")
-    return render_template('event_mode.html', preset_songs=preset_songs, has_event_owner=event_token is not None)
+    return render_template('event_mode.html', preset_songs=preset_songs, has_event_owner=event_token is not None,
+                           armed_device=armed.device_name if armed else None)
 
 @bp.route('/api/clear-event-owner', methods=['POST'])
 def clear_event_owner():
     """Clear the event owner token (for when event ends)"""
-    from app.models import set_event_owner_token
+    from app.models import get_event_owner_token, set_event_owner_token
+    event_token = get_event_owner_token()
+    if event_token:
+        disarm_event(json.loads(event_token) if isinstance(event_token, str) else event_token)
     set_event_owner_token(None)
     logger.info("Event owner token cleared")
     return jsonify({"status": "success", "message": "Event owner cleared"})
 
+@bp.route('/api/arm-event', methods=['POST'])
+@spotify_priority(HOST)
+def arm_event_route():
+    """Pin event mode to a device and keep its playback state warm, so controls skip the lookups"""
+    token_info = get_token()
+    if not token_info:
+        return jsonify({"status": "error", "message": "Not authenticated"}), 401
+
+    data = request.get_json(silent=True) or request.form
+    device_id = data.get('device_id') or None
+    preset_uris = [song.uri for song in load_event_config().preset_songs]
+
+    try:
+        armed = arm_event(token_info, preset_uris, device_id)
+    except NoDeviceError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except SpotifyException as e:
+        return _spotify_error_response(e, "arming event")
+    except Exception as e:
+        logger.error(f"Event Mode - Unexpected error arming event: {str(e)}")
+        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+
+    return jsonify({"status": "success", "message": f"Event armed on {armed.device_name}", **armed.to_dict()})
+
+@bp.route('/api/arm-event')
+def armed_event_status():
+    """The armed device, its cached playback state and preset tap latency"""
+    token_info = get_token()
+    if not token_info:
+        return jsonify({"status": "error", "message": "Not authenticated"}), 401
+    armed = get_armed_event(token_info)
+    return jsonify(armed.to_dict() if armed else {'armed': False})
+
+@bp.route('/api/disarm-event', methods=['POST'])
+def disarm_event_route():
+    token_info = get_token()
+    if not token_info:
+        return jsonify({"status": "error", "message": "Not authenticated"}), 401
+    disarm_event(token_info)
+    return jsonify({"status": "success", "message": "Event disarmed"})
+
+def _device_id(current_playback):
+    device = current_playback.get('device') if current_playback else None
+    return device.get('id') if device else None
+
+def _volume(current_playback, default=100):
+    device = current_playback.get('device') if current_playback else None
+    volume = device.get('volume_percent') if device else None
+    return default if volume is None else volume
+
+def _fade_curve():
+    """The fade curve a request asked for (None for the configured default); ValueError if unknown"""
+    data = request.get_json(silent=True) or request.form
+    curve = data.get('curve') or None
+    if curve is not None and curve not in CURVES:
+        raise ValueError(f"Unknown fade curve. Choose one of: {', '.join(CURVES)}")
+    return curve
+
+def _playback_context(sp, token_info):
+    """(armed event or None, device id, playback) for an event-mode command.
+
+    An armed event answers from its pinned device and cached state, without a
+    round trip; otherwise this asks Spotify for the current playback.
+    """
+    armed = get_armed_event(token_info)
+    if armed:
+        return armed, armed.device_id, armed.playback
+    current_playback = sp.current_playback()
+    return None, _device_id(current_playback), current_playback
+
+def _start_transition(kind, token_info, device_id, fn, message):
+    """Hand a volume transition to the fade engine and answer 202 with its job id"""
+    job = get_transition_engine().submit(kind, f"{token_key(token_info)}:{device_id}", fn)
+    logger.info(f"Event Mode: {kind} scheduled as job {job.job_id}")
+    status_url = url_for('routes.transition_status', job_id=job.job_id)
+    response = jsonify({
+        "status": "accepted",
+        "job_id": job.job_id,
+        "message": message,
+        "status_url": status_url
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+def _spotify_error_response(e, context):
+    logger.error(f"Event Mode - Spotify API error {context}: {str(e)}")
+    if isinstance(e, RateLimited):
+        response = jsonify({"status": "error", "message": "Spotify is busy, please try again in a moment."})
+        response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+        return response, 429
+    if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
+        return jsonify({"status": "error", "message": "No active device found. Please open Spotify on a device and try again."}), 404
+    return jsonify({"status": "error", "message": f"An error occurred: {str(e)}"}), 500
+
 @bp.route('/api/play-preset/<path:uri>')
+@spotify_priority(HOST)
 def play_preset(uri):
     """Play a preset song with seamless transition (quick fade-out of current, immediate start of new)"""
+    tapped_at = time.perf_counter()
     token_info = get_token()
     if not token_info:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
@@ -472,196 +535,238 @@ def play_preset(uri):
     if not uri.startswith('spotify:track:'):
         return jsonify({"status": "error", "message": "Invalid Spotify URI"}), 400
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
+    armed = get_armed_event(token_info)
+    if armed:
+        return _play_preset_armed(sp, token_info, armed, uri, tapped_at)
     
     try:
         # Check if something is currently playing
         current_playback = sp.current_playback()
-        
-        if current_playback and current_playback.get('is_playing', False):
+    except SpotifyException as e:
+        return _spotify_error_response(e, "checking playback")
+    except Exception as e:
+        logger.error(f"Event Mode - Unexpected error: {str(e)}")
+        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+
+    device_id = _device_id(current_playback)
+    is_playing = bool(current_playback and current_playback.get('is_playing', False))
+    start_volume = _volume(current_playback)
+
+    def transition(job):
+        if is_playing:
             logger.info("Event Mode: Current song playing, performing quick fade-out for seamless transition")
             
-            # Quick fade-out over 0.5 seconds for seamless transition (smooth with more steps)
-            fade_steps = 12
-            fade_interval = 0.5 / fade_steps  # 0.5 seconds total / 12 steps = ~0.042 seconds per step
-            volume_step = 100 // fade_steps  # 100% / 12 steps = ~8% per step
-            
-            for step in range(fade_steps + 1):  # +1 to ensure we reach 0
-                volume = max(0, 100 - (step * volume_step))
-                try:
-                    sp.volume(volume)
-                    if volume > 0:  # Don't sleep after setting volume to 0
-                        time.sleep(fade_interval)
-                except SpotifyException as e:
-                    logger.warning(f"Error during quick fade at volume {volume}: {str(e)}")
+            # Quick fade-out over 0.5 seconds for seamless transition
+            if not ramp_volume(job, lambda volume: sp.volume(volume, device_id=device_id), start_volume, 0, 0.5):
+                return "Preset transition cancelled"
         
         # Immediately start the new preset song (no fade-in needed since songs have natural intros)
-        sp.start_playback(uris=[uri])
+        sp.start_playback(device_id=device_id, uris=[uri])
         
         # Restore volume to 100% for the new song
         try:
-            sp.volume(100)
+            sp.volume(100, device_id=device_id)
         except SpotifyException as e:
             logger.warning(f"Error restoring volume: {str(e)}")
         
-        # Get track info for logging and response
-        track_info = sp.track(uri)
+        # Get track info for logging and response (pre-warmed when event mode loads)
+        track_info = get_track_cache().get_one(sp, uri) or {'name': uri, 'artists': 'unknown artist'}
         track_name = track_info['name']
-        artist_names = ', '.join([artist['name'] for artist in track_info['artists']])
+        artist_names = track_info['artists']
         
         logger.info(f"Event Mode: Seamless transition to preset song - {track_name} by {artist_names}")
-        
-        return jsonify({
-            "status": "success", 
-            "message": f"Now playing: {track_name} by {artist_names}"
-        })
-        
+        return f"Now playing: {track_name} by {artist_names}"
+
+    return _start_transition('play_preset', token_info, device_id, transition, "Switching to preset song...")
+
+def _play_preset_armed(sp, token_info, armed, uri, tapped_at):
+    """Switch straight to the preset on the pinned device: one start_playback, no lookups first"""
+    device_key = f"{token_key(token_info)}:{armed.device_id}"
+    # A fade still running there would keep turning the new song down
+    interrupted = get_transition_engine().cancel_device(device_key)
+
+    try:
+        sp.start_playback(device_id=armed.device_id, uris=[uri])
     except SpotifyException as e:
-        logger.error(f"Event Mode - Spotify API error: {str(e)}")
-        if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
-            return jsonify({"status": "error", "message": "No active device found. Please open Spotify on a device and try again."}), 404
-        else:
-            return jsonify({"status": "error", "message": f"An error occurred: {str(e)}"}), 500
+        return _spotify_error_response(e, "starting preset")
     except Exception as e:
         logger.error(f"Event Mode - Unexpected error: {str(e)}")
         return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+    latency = time.perf_counter() - tapped_at
+    armed.record_tap(latency)
+    armed.update(is_playing=True)
+
+    if interrupted or armed.volume != 100:
+        # Once the interrupted fade has stopped, bring the volume back up
+        def restore_volume(job):
+            sp.volume(100, device_id=armed.device_id)
+            armed.update(volume=100)
+            return "Volume restored"
+        get_transition_engine().submit('restore_volume', device_key, restore_volume)
+
+    # Pre-fetched when the event was armed
+    track_info = get_track_cache().get(uri) or {'name': uri, 'artists': 'unknown artist'}
+    logger.info(f"Event Mode: Preset started on armed device in {latency * 1000:.0f} ms - "
+                f"{track_info['name']} by {track_info['artists']}")
+    return jsonify({
+        "status": "success",
+        "message": f"Now playing: {track_info['name']} by {track_info['artists']}",
+        "latency_ms": round(latency * 1000, 1)
+    })
 
 @bp.route('/api/fade-out', methods=['POST'])
+@spotify_priority(HOST)
 def fade_out():
     """Gradually fade out the current track volume over 4 seconds, then pause and restore volume"""
     token_info = get_token()
     if not token_info:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    try:
+        curve = _fade_curve()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    sp = get_client(token_info)
     
     try:
         # Get current playback info to check if something is playing
-        current_playback = sp.current_playback()
-        if not current_playback or not current_playback.get('is_playing', False):
-            return jsonify({"status": "error", "message": "No track is currently playing"}), 400
-        
+        armed, device_id, current_playback = _playback_context(sp, token_info)
+    except SpotifyException as e:
+        return _spotify_error_response(e, "during fade")
+    except Exception as e:
+        logger.error(f"Event Mode - Unexpected error during fade: {str(e)}")
+        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+
+    if not current_playback or not current_playback.get('is_playing', False):
+        return jsonify({"status": "error", "message": "No track is currently playing"}), 400
+
+    start_volume = _volume(current_playback)
+
+    def transition(job):
         logger.info("Event Mode: Starting 4-second fade out")
         
-        # Fade out over 4 seconds: reduce volume from 100% to 0% in steps
-        fade_steps = 20
-        fade_interval = 0.2  # 4 seconds total / 20 steps = 0.2 seconds per step
-        volume_step = 5  # 100% / 20 steps = 5% per step
-        
-        for step in range(fade_steps + 1):  # +1 to ensure we reach 0
-            volume = max(0, 100 - (step * volume_step))
-            try:
-                sp.volume(volume)
-                if volume > 0:  # Don't sleep after setting volume to 0
-                    time.sleep(fade_interval)
-            except SpotifyException as e:
-                logger.warning(f"Error during fade at volume {volume}: {str(e)}")
+        # Fade out over 4 seconds, from the current volume to 0%
+        if not ramp_volume(job, lambda volume: sp.volume(volume, device_id=device_id), start_volume, 0, 4.0, curve):
+            return "Fade out cancelled"
         
         logger.info("Event Mode: Fade completed, pausing playback")
         
         # Pause playback after fade completes
         try:
-            sp.pause_playback()
+            sp.pause_playback(device_id=device_id)
+            if armed:
+                armed.update(is_playing=False)
             logger.info("Event Mode: Playback paused")
         except SpotifyException as e:
             logger.warning(f"Error pausing playback: {str(e)}")
         
         # Restore volume to maximum after pausing
         try:
-            sp.volume(100)
+            sp.volume(100, device_id=device_id)
+            if armed:
+                armed.update(volume=100)
             logger.info("Event Mode: Volume restored to 100%")
         except SpotifyException as e:
             logger.warning(f"Error restoring volume: {str(e)}")
         
         logger.info("Event Mode: Fade out, pause, and volume restore completed")
-        return jsonify({"status": "success", "message": "Track faded out, paused, and volume restored"})
-        
-    except SpotifyException as e:
-        logger.error(f"Event Mode - Spotify API error during fade: {str(e)}")
-        if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
-            return jsonify({"status": "error", "message": "No active device found. Please open Spotify on a device and try again."}), 404
-        else:
-            return jsonify({"status": "error", "message": f"An error occurred: {str(e)}"}), 500
-    except Exception as e:
-        logger.error(f"Event Mode - Unexpected error during fade: {str(e)}")
-        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+        return "Track faded out, paused, and volume restored"
+
+    return _start_transition('fade_out', token_info, device_id, transition, "Fading out...")
 
 @bp.route('/api/fade-in', methods=['POST'])
+@spotify_priority(HOST)
 def fade_in():
     """Resume playback and gradually fade in the volume over 2 seconds"""
     token_info = get_token()
     if not token_info:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    try:
+        curve = _fade_curve()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    sp = get_client(token_info)
     
     try:
         # Get current playback info
-        current_playback = sp.current_playback()
-        if not current_playback:
-            return jsonify({"status": "error", "message": "No active device found"}), 400
-        
+        armed, device_id, current_playback = _playback_context(sp, token_info)
+    except SpotifyException as e:
+        return _spotify_error_response(e, "during fade in")
+    except Exception as e:
+        logger.error(f"Event Mode - Unexpected error during fade in: {str(e)}")
+        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+
+    # An armed event has its device pinned even when nothing is playing there
+    if not current_playback and not armed:
+        return jsonify({"status": "error", "message": "No active device found"}), 400
+
+    def transition(job):
         logger.info("Event Mode: Starting fade in")
         
         # Start at 0% volume and resume playback
-        sp.volume(0)
-        sp.start_playback()
+        sp.volume(0, device_id=device_id)
+        sp.start_playback(device_id=device_id)
+        if armed:
+            armed.update(is_playing=True, volume=0)
         
-        # Fade in over 2 seconds: increase volume from 0% to 100%
-        fade_steps = 6
-        fade_interval = 2.0 / fade_steps  # 2 seconds total / 6 steps = 0.33 seconds per step
-        volume_step = 100 // fade_steps  # 100% / 6 steps = ~16% per step
-
-        for step in range(1, fade_steps + 1):
-            volume = min(100, step * volume_step)  # Cap at 100%
-            try:
-                sp.volume(volume)
-                if step < fade_steps:  # Don't sleep after the final volume setting
-                    time.sleep(fade_interval)
-            except SpotifyException as e:
-                logger.warning(f"Error during fade in at volume {volume}: {str(e)}")
-        
-        # Ensure we end at exactly 100%
-        try:
-            sp.volume(100)
-        except SpotifyException as e:
-            logger.warning(f"Error setting final volume: {str(e)}")
+        # Fade in over 2 seconds: increase volume from 0% to 100% (the ramp ends exactly on 100%)
+        if not ramp_volume(job, lambda volume: sp.volume(volume, device_id=device_id), 0, 100, 2.0, curve):
+            return "Fade in cancelled"
+        if armed:
+            armed.update(volume=100)
         
         logger.info("Event Mode: Fade in completed")
-        return jsonify({"status": "success", "message": "Playback resumed and faded in"})
-        
-    except SpotifyException as e:
-        logger.error(f"Event Mode - Spotify API error during fade in: {str(e)}")
-        if e.http_status == 404 and 'NO_ACTIVE_DEVICE' in str(e):
-            return jsonify({"status": "error", "message": "No active device found. Please open Spotify on a device and try again."}), 404
-        else:
-            return jsonify({"status": "error", "message": f"An error occurred: {str(e)}"}), 500
-    except Exception as e:
-        logger.error(f"Event Mode - Unexpected error during fade in: {str(e)}")
-        return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
+        return "Playback resumed and faded in"
+
+    return _start_transition('fade_in', token_info, device_id, transition, "Fading in...")
+
+@bp.route('/api/transitions/<job_id>')
+def transition_status(job_id):
+    """Status of a fade or preset transition started from event mode"""
+    job = get_transition_engine().get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Unknown transition job"}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/api/transitions/<job_id>/cancel', methods=['POST'])
+def cancel_transition(job_id):
+    """Stop a running fade where it is"""
+    job = get_transition_engine().cancel(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Unknown transition job"}), 404
+    return jsonify(job.to_dict())
 
 @bp.route('/api/resume-playlist', methods=['POST'])
+@spotify_priority(HOST)
 def resume_playlist():
     """Start playing the wedding playlist on shuffle"""
     token_info = get_token()
     if not token_info:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
     
     try:
         # Load the wedding playlist URI from config
         config = load_event_config()
-        playlist_uri = config.get('wedding_playlist_uri')
+        playlist_uri = config.wedding_playlist_uri
         
         if not playlist_uri:
             return jsonify({"status": "error", "message": "Wedding playlist not configured"}), 400
         
         logger.info(f"Event Mode: Starting wedding playlist: {playlist_uri}")
         
-        # Start playback with the playlist and enable shuffle
-        sp.start_playback(context_uri=playlist_uri)
-        sp.shuffle(True)
+        # Start playback with the playlist and enable shuffle (on the pinned device when armed)
+        armed = get_armed_event(token_info)
+        device_id = armed.device_id if armed else None
+        sp.start_playback(device_id=device_id, context_uri=playlist_uri)
+        sp.shuffle(True, device_id=device_id)
+        if armed:
+            armed.update(is_playing=True)
         
         logger.info("Event Mode: Wedding playlist started with shuffle enabled")
         return jsonify({"status": "success", "message": "Wedding playlist started on shuffle"})
@@ -677,24 +782,27 @@ def resume_playlist():
         return jsonify({"status": "error", "message": "An unexpected error occurred"}), 500
 
 @bp.route('/api/skip-song', methods=['POST'])
+@spotify_priority(HOST)
 def skip_song():
     """Skip to the next song in the current playback"""
     token_info = get_token()
     if not token_info:
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
     
     try:
         # Get current playback info to check if something is playing
-        current_playback = sp.current_playback()
+        armed, device_id, current_playback = _playback_context(sp, token_info)
         if not current_playback or not current_playback.get('is_playing', False):
             return jsonify({"status": "error", "message": "No track is currently playing"}), 400
         
         logger.info("Event Mode: Skipping to next song")
         
-        # Skip to next track
-        sp.next_track()
+        # Skip to next track (on the pinned device when armed)
+        sp.next_track(device_id=device_id if armed else None)
+        if armed:
+            armed.refresh_now()
         
         logger.info("Event Mode: Successfully skipped to next song")
         return jsonify({"status": "success", "message": "Skipped to next song"})
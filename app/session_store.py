@@ -0,0 +1,278 @@
+# session_store.py
+
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from app.cooldowns import ExpiringSet
+
+logger = logging.getLogger(__name__)
+
+MEMORY = 'memory'
+SQLITE = 'sqlite'
+
+def _session_class():
+    # Imported lazily: models imports this module
+    from app.models import Session
+    return Session
+
+class InMemorySessionStore:
+    """Sessions, recent tracks and shared values kept in this process only"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._session_locks = {}  # session_id -> RLock guarding that session's state
+        self._recent_tracks = ExpiringSet()  # uri -> track data, dropped when its cooldown ends
+        self._values = {}
+        self._lock = threading.Lock()  # guards the dicts above, never a session's contents
+
+    def add(self, session):
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._session_locks.setdefault(session.session_id, threading.RLock())
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._session_locks.pop(session_id, None)
+            return self._sessions.pop(session_id, None) is not None
+
+    @contextmanager
+    def updating(self, session):
+        """Serialize a read-modify-write of session; the session is the live object.
+
+        Each session has its own lock, so updates to different sessions never
+        wait for each other. Keep Spotify calls and other I/O outside the block.
+        """
+        with self._lock:
+            lock = self._session_locks.setdefault(session.session_id, threading.RLock())
+        with lock:
+            yield session
+
+    def expired_session_ids(self, created_before):
+        with self._lock:
+            return [sid for sid, session in self._sessions.items()
+                    if session.created_at.timestamp() < created_before]
+
+    def session_ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def put_recent_track(self, track_uri, data, ttl):
+        self._recent_tracks.add(track_uri, data, ttl=ttl, now=data['added_at'])
+
+    def get_recent_track(self, track_uri):
+        return self._recent_tracks.get(track_uri)
+
+    def delete_expired_recent_tracks(self):
+        return self._recent_tracks.evict()
+
+    def recent_track_count(self):
+        return len(self._recent_tracks)
+
+    def get_value(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set_value(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+class SqliteSessionStore:
+    """Sessions shared by every worker process through one SQLite database in WAL mode.
+
+    Each process keeps the Session objects it has loaded in a local cache. A read
+    only compares the cached version with the row's version number and
+    deserializes again when another worker has written since; updates take the
+    database write lock, refresh a stale object in place and bump the version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}  # session_id -> Session, as of session.store_version
+        self._cache_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS recent_tracks (
+                uri TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS recent_tracks_expiry ON recent_tracks (expires_at);
+            CREATE TABLE IF NOT EXISTS shared_values (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+    def _connect(self):
+        # One autocommit connection per thread; transactions are opened explicitly
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def _cache_put(self, session):
+        with self._cache_lock:
+            self._cache[session.session_id] = session
+
+    def _cache_drop(self, session_id):
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+
+    def add(self, session):
+        conn = self._connect()
+        session.store_version = 1
+        conn.execute("INSERT OR REPLACE INTO sessions (session_id, version, created_at, data) VALUES (?, ?, ?, ?)",
+                     (session.session_id, session.store_version, session.created_at.timestamp(),
+                      json.dumps(session.to_dict())))
+        self._cache_put(session)
+
+    def get(self, session_id):
+        conn = self._connect()
+        row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            self._cache_drop(session_id)
+            return None
+        cached = self._cache.get(session_id)
+        if cached is not None and cached.store_version == row[0]:
+            return cached
+
+        row = conn.execute("SELECT version, data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            self._cache_drop(session_id)
+            return None
+        version, data = row
+        if cached is not None:
+            # Refresh in place so anyone holding the object sees the new state
+            cached.load_state(json.loads(data))
+            session = cached
+        else:
+            session = _session_class().from_dict(json.loads(data))
+        session.store_version = version
+        self._cache_put(session)
+        logger.debug(f"Loaded session {session_id} version {version} from the session store")
+        return session
+
+    def delete(self, session_id):
+        cursor = self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self._cache_drop(session_id)
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def updating(self, session):
+        """Serialize a read-modify-write of session across threads and worker processes.
+
+        The database write lock is held for the duration of the block, so keep
+        Spotify calls and other I/O outside it. Nested blocks join the outer one.
+        """
+        conn = self._connect()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield session
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            row = conn.execute("SELECT version, data FROM sessions WHERE session_id = ?",
+                               (session.session_id,)).fetchone()
+            if row is None:
+                # Deleted by another worker; don't bring it back
+                conn.execute("ROLLBACK")
+                yield session
+                self._cache_drop(session.session_id)
+                return
+            if row[0] != session.store_version:
+                session.load_state(json.loads(row[1]))
+            version = row[0] + 1
+            yield session
+            conn.execute("UPDATE sessions SET version = ?, data = ? WHERE session_id = ?",
+                         (version, json.dumps(session.to_dict()), session.session_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # The object may hold unsaved changes; make the next read reload it
+            session.store_version = None
+            raise
+        finally:
+            self._local.depth = 0
+        session.store_version = version
+        self._cache_put(session)
+
+    def expired_session_ids(self, created_before):
+        rows = self._connect().execute("SELECT session_id FROM sessions WHERE created_at < ?",
+                                       (created_before,)).fetchall()
+        return [row[0] for row in rows]
+
+    def session_ids(self):
+        return [row[0] for row in self._connect().execute("SELECT session_id FROM sessions").fetchall()]
+
+    def put_recent_track(self, track_uri, data, ttl):
+        self._connect().execute("INSERT OR REPLACE INTO recent_tracks (uri, expires_at, data) VALUES (?, ?, ?)",
+                                (track_uri, data['added_at'] + ttl, json.dumps(data)))
+
+    def get_recent_track(self, track_uri):
+        row = self._connect().execute("SELECT data FROM recent_tracks WHERE uri = ? AND expires_at > ?",
+                                      (track_uri, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_expired_recent_tracks(self):
+        cursor = self._connect().execute("DELETE FROM recent_tracks WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def recent_track_count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM recent_tracks WHERE expires_at > ?",
+                                       (time.time(),)).fetchone()[0]
+
+    def get_value(self, key, default=None):
+        row = self._connect().execute("SELECT value FROM shared_values WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_value(self, key, value):
+        self._connect().execute("INSERT OR REPLACE INTO shared_values (key, value) VALUES (?, ?)",
+                                (key, json.dumps(value)))
+
+_store = None
+
+def init_app(app):
+    """Open the session store selected by SESSION_STORE"""
+    global _store
+    backend = app.config.get('SESSION_STORE', MEMORY)
+    if backend == SQLITE:
+        path = app.config.get('SESSION_STORE_PATH') or os.path.join(app.instance_path, 'sessions.sqlite3')
+        _store = SqliteSessionStore(path)
+        logger.info(f"Using SQLite session store at {path}")
+    elif backend == MEMORY:
+        _store = InMemorySessionStore()
+        logger.info("Using in-memory session store")
+    else:
+        raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = InMemorySessionStore()
+    return _store
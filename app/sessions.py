@@ -1,14 +1,18 @@
 # sessions.py
 
-from flask import Blueprint, render_template, redirect, url_for, request, jsonify, session as flask_session, current_app
+from flask import Blueprint, Response, render_template, redirect, url_for, request, jsonify, session as flask_session, current_app
 from app.models import Session, create_session, get_session, delete_session
-from app.spotify_utils import get_token, get_spotify_oauth
+from app.spotify_utils import get_token, get_spotify_oauth, search_tracks, get_client
 from app.log_utils import format_debug_output
+from app.player_state import get_poller, get_player_state, refresh_player_state
+from app.events import get_channel, format_sse
+from app.playlist_writer import get_playlist_status
+from app.playlist_index import get_playlist_index
+from app.qr_codes import get_qr_cache
+from app.rate_limiter import spotify_priority, RateLimited, HOST, AUTOCOMPLETE
+from app.spotify_async import fan_out, call
 import spotipy
 from spotipy.exceptions import SpotifyException
-import qrcode
-from io import BytesIO
-import base64
 import json
 import logging
 from datetime import datetime
@@ -16,49 +20,111 @@ from datetime import datetime
 bp = Blueprint('sessions', __name__)
 logger = logging.getLogger(__name__)
 
+PLAYLIST_PAGE_SIZE = 50  # Maximum allowed by Spotify API
+
+def _find_indexed_playlist(sp, index, user_id, playlist_name):
+    """Return the indexed playlist ID if the user still has it under that name, else None"""
+    playlist_id = index.get(user_id, playlist_name) if index else None
+    if not playlist_id:
+        return None
+    try:
+        playlist = sp.playlist(playlist_id, fields='id,name')
+    except SpotifyException as e:
+        logger.warning(f"Indexed playlist {playlist_id} could not be fetched: {str(e)}")
+        if e.http_status == 404:
+            index.delete(user_id, playlist_name)
+        return None
+    if playlist['name'] != playlist_name:
+        logger.info(f"Indexed playlist {playlist_id} was renamed to '{playlist['name']}', dropping index entry")
+        index.delete(user_id, playlist_name)
+        return None
+    # Deleting a playlist only unfollows it; Spotify keeps serving it by ID.
+    # Called directly because playlist_is_following() breaks on newer spotipy releases.
+    try:
+        following = sp._get(f"playlists/{playlist_id}/followers/contains", ids=user_id)
+    except SpotifyException as e:
+        logger.warning(f"Could not check that {user_id} still follows playlist {playlist_id}: {str(e)}")
+        return None
+    if not following or not following[0]:
+        logger.info(f"Indexed playlist {playlist_id} was deleted by its owner, dropping index entry")
+        index.delete(user_id, playlist_name)
+        return None
+    return playlist_id
+
+def _scan_user_playlists(sp, user_id, playlist_name):
+    """Look for playlist_name among all of the user's playlists, fetching pages concurrently.
+
+    Returns (playlist ID or None, whether every page could be checked).
+    """
+    try:
+        first_page = sp.user_playlists(user_id, limit=PLAYLIST_PAGE_SIZE, offset=0)
+    except Exception as e:
+        logger.error(f"Error fetching playlists: {str(e)}")
+        return None, False
+
+    total_playlists = first_page['total']
+    logger.info(f"Total playlists reported by Spotify: {total_playlists}")
+
+    def find(page):
+        for playlist in page['items']:
+            if playlist and playlist['name'] == playlist_name:
+                return playlist
+        return None
+
+    match = find(first_page)
+    complete = True
+    offsets = list(range(PLAYLIST_PAGE_SIZE, total_playlists, PLAYLIST_PAGE_SIZE))
+    if not match and offsets:
+        # Once the total is known, the remaining pages are independent of each other
+        pages = fan_out(sp, *(call('user_playlists', user_id, limit=PLAYLIST_PAGE_SIZE, offset=offset)
+                              for offset in offsets), return_exceptions=True)
+        for offset, page in zip(offsets, pages):
+            if isinstance(page, Exception):
+                # The other pages are still worth searching
+                logger.error(f"Error fetching playlists at offset {offset}: {str(page)}")
+                complete = False
+                continue
+            match = find(page)
+            if match:
+                break
+
+    if match:
+        logger.info(f"Found existing playlist: {playlist_name} (ID: {match['id']}, Public: {match['public']})")
+        return match['id'], True
+    if complete:
+        logger.info(f"Checked all {total_playlists} playlists. No match found.")
+    return None, complete
+
 def create_session_playlist(sp):
     date_str = datetime.now().strftime("%Y-%m-%d")
     playlist_name = f"LazyDJ - {date_str}"
     user_id = sp.me()['id']
     logger.info(f"Attempting to create or find playlist: {playlist_name} for user: {user_id}")
 
-    offset = 0
-    limit = 50  # Maximum allowed by Spotify API
-    total_playlists = None
-    playlists_checked = 0
-
-    while True:
-        logger.info(f"Fetching playlists: offset={offset}, limit={limit}")
-        try:
-            playlists = sp.user_playlists(user_id, limit=limit, offset=offset)
-            logger.debug(f"API Response: Total: {playlists['total']}, Items: {len(playlists['items'])}")
-        except Exception as e:
-            logger.error(f"Error fetching playlists: {str(e)}")
-            break
-
-        if total_playlists is None:
-            total_playlists = playlists['total']
-            logger.info(f"Total playlists reported by Spotify: {total_playlists}")
-
-        for playlist in playlists['items']:
-            playlists_checked += 1
-            logger.debug(f"Checking playlist {playlists_checked}/{total_playlists}: {playlist['name']} (ID: {playlist['id']}, Public: {playlist['public']})")
-            if playlist['name'] == playlist_name:
-                logger.info(f"Found existing playlist: {playlist_name} (ID: {playlist['id']}, Public: {playlist['public']})")
-                return playlist['id'], playlist['name']
-
-        if len(playlists['items']) < limit or playlists_checked >= total_playlists:
-            logger.info(f"Checked all {playlists_checked} playlists. No match found.")
-            break
-
-        offset += limit
-        logger.debug(f"Moving to next page. New offset: {offset}")
+    # Common case: we created (or found) this playlist before and only need to confirm it still exists
+    index = get_playlist_index()
+    playlist_id = _find_indexed_playlist(sp, index, user_id, playlist_name)
+    if playlist_id:
+        logger.info(f"Found indexed playlist: {playlist_name} (ID: {playlist_id})")
+        return playlist_id, playlist_name
+
+    playlist_id, complete = _scan_user_playlists(sp, user_id, playlist_name)
+    if playlist_id:
+        if index:
+            index.put(user_id, playlist_name, playlist_id)
+        return playlist_id, playlist_name
+    if not complete:
+        # It may be on a page we couldn't fetch; creating one now could make a duplicate
+        logger.error(f"Could not check all playlists for {playlist_name}, not creating a new one")
+        return None, None
 
     # If we've checked all playlists and haven't found a match, create a new one
     logger.info(f"No existing playlist found. Creating new public playlist: {playlist_name}")
     try:
         new_playlist = sp.user_playlist_create(user_id, playlist_name, public=True)
         logger.info(f"Successfully created new public playlist: {playlist_name} (ID: {new_playlist['id']})")
+        if index:
+            index.put(user_id, new_playlist['name'], new_playlist['id'])
         return new_playlist['id'], new_playlist['name']
     except SpotifyException as e:
         logger.error(f"Spotify API error creating playlist: {str(e)}")
@@ -75,7 +141,7 @@ def create_new_session():
         return jsonify({"status": "error", "message": "Not authenticated"}), 401
 
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
+        sp = get_client(token_info)
         
         # First, try to find or create the playlist
         playlist_id, playlist_name = create_session_playlist(sp)
@@ -89,8 +155,7 @@ def create_new_session():
         logger.info(f"New session created with ID: {new_session.session_id}")
 
         # Associate the playlist with the session
-        new_session.playlist_id = playlist_id
-        new_session.playlist_name = playlist_name
+        new_session.set_playlist(playlist_id, playlist_name)
         logger.info(f"Session {new_session.session_id} associated with playlist: {playlist_name} (ID: {playlist_id})")
  
         redirect_url = url_for('sessions.session_view', 
@@ -117,19 +182,26 @@ def session_view(session_id):
     if not current_session:
         return render_template('session_not_found.html'), 404
 
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(request.url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffered = BytesIO()
-    img.save(buffered)
-    qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
-
     # Store the session ID and owner's token in the user's session
     flask_session['current_session_id'] = session_id
-    flask_session['token_info'] = current_session.owner_token
+    flask_session['token_info'] = current_session.get_owner_token()
+
+    return render_template('session.html', session_id=session_id)
+
+@bp.route('/session/<session_id>/qr.<any(png, svg):fmt>')
+def session_qr(session_id, fmt):
+    """QR code linking to the session page, rendered once and cached by the browser"""
+    if not get_session(session_id):
+        return jsonify({"error": "Session not found"}), 404
+
+    session_url = url_for('sessions.session_view', session_id=session_id, _external=True)
+    image = get_qr_cache().get(session_url, fmt, request.args.get('size', type=int))
 
-    return render_template('session.html', session_id=session_id, qr_code_base64=qr_code_base64)
+    response = Response(image.body, mimetype=image.mimetype)
+    response.set_etag(image.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['SESSION_EXPIRATION_TIME']
+    return response.make_conditional(request)
 
 @bp.route('/session/<session_id>/token')
 def get_session_token(session_id):
@@ -139,9 +211,10 @@ def get_session_token(session_id):
 
     # Store the session ID and owner's token in the user's session
     flask_session['current_session_id'] = session_id
-    flask_session['token_info'] = current_session.owner_token
+    owner_token = current_session.get_owner_token()
+    flask_session['token_info'] = owner_token
 
-    return jsonify({"token": current_session.owner_token})
+    return jsonify({"token": owner_token})
 
 @bp.route('/session/<session_id>/join', methods=['POST'])
 def join_session(session_id):
@@ -176,25 +249,13 @@ def session_search(session_id):
     if not current_session:
         return jsonify({"error": "Session not found"}), 404
 
-    token_info = json.loads(current_session.owner_token)
+    token_info = current_session.get_token_info()
     if not token_info:
         return jsonify({"error": "Session owner not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
     try:
-        results = sp.search(q=query, type='track', limit=10)
-        tracks = results['tracks']['items']
-
-        track_info = []
-        for track in tracks:
-            track_data = {
-                'name': track['name'],
-                'artists': ', '.join([artist['name'] for artist in track['artists']]),
-                'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                'uri': track['uri'],
-                'id': track['id']
-            }
-            track_info.append(track_data)
+        track_info = search_tracks(sp, query)
 
         return jsonify({"tracks": track_info})
     except SpotifyException as e:
@@ -222,8 +283,7 @@ def update_participant(session_id):
         return jsonify({"error": "Participant not found"}), 404
 
     # Update the participant name
-    current_session.participants[participant_id]['name'] = new_name
-    updated_participant = current_session.participants[participant_id]
+    updated_participant = current_session.rename_participant(participant_id, new_name)
     
     logger.info(f"Updated participant {participant_id} name to '{new_name}' in session {session_id}")
 
@@ -233,6 +293,7 @@ def update_participant(session_id):
     })
 
 @bp.route('/session/<session_id>/recommendations')
+@spotify_priority(AUTOCOMPLETE)
 def session_recommendations(session_id):
     """Get recommendations for a session (used for search autocomplete)"""
     query = request.args.get('query', '').strip()
@@ -243,26 +304,18 @@ def session_recommendations(session_id):
     if not query:
         return jsonify([])
 
-    token_info = json.loads(current_session.owner_token)
+    token_info = current_session.get_token_info()
     if not token_info:
         return jsonify({"error": "Session owner not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
+    sp = get_client(token_info)
     try:
-        results = sp.search(q=query, type='track', limit=10)
-        tracks = results['tracks']['items']
-
-        track_info = []
-        for track in tracks:
-            track_data = {
-                'name': track['name'],
-                'artists': ', '.join([artist['name'] for artist in track['artists']]),
-                'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                'uri': track['uri']
-            }
-            track_info.append(track_data)
+        track_info = search_tracks(sp, query)
 
         return jsonify(track_info)
+    except RateLimited:
+        # Suggestions are the first thing to go when Spotify calls are scarce
+        return jsonify([])
     except SpotifyException as e:
         logger.error(f"Spotify API error in session recommendations: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -272,10 +325,10 @@ def session_recommendations(session_id):
 
 @bp.route('/session/<session_id>/queue', methods=['POST'])
 def session_queue(session_id):
-    logger.info(f"Session queue request received for session: {session_id}")
+    logger.info("Session queue request received for session: %s", session_id)
     current_session = get_session(session_id)
     if not current_session:
-        logger.warning(f"Session not found: {session_id}")
+        logger.warning("Session not found: %s", session_id)
         return jsonify({"error": "Session not found"}), 404
 
     track_uri = request.form.get('track_uri')
@@ -283,37 +336,42 @@ def session_queue(session_id):
     artist_name = request.form.get('artist_name')
     participant_id = request.form.get('participant_id')  # New field for participant tracking
 
-    logger.info(f"Attempting to add track to session {session_id}: {track_name} by {artist_name} (URI: {track_uri}) from participant: {participant_id}")
-    logger.debug(f"Session participants: {current_session.participants.keys()}")
-    logger.debug(f"Received participant_id: '{participant_id}' (type: {type(participant_id)})")
+    logger.info("Attempting to add track to session %s: %s by %s (URI: %s) from participant: %s", session_id, track_name, artist_name, track_uri, participant_id)
+    logger.debug("Session participants: %s", current_session.participants.keys())
+    logger.debug("Received participant_id: '%s' (type: %s)", participant_id, type(participant_id))
 
     if not all([track_uri, track_name, artist_name]):
-        logger.warning(f"Missing track information for session {session_id}")
+        logger.warning("Missing track information for session %s", session_id)
         return jsonify({"error": "Missing track information"}), 400
 
-    # Check for cooldown (20 minute period)
-    cooldown_period = 1200  # 20 minutes in seconds
-    if current_session.is_track_on_cooldown(track_uri, cooldown_period):
-        logger.debug(f"Track on cooldown in session: {track_name} by {artist_name}")
+    # Check for cooldown (20 minute period) and claim the track, so a concurrent add of it is turned away
+    cooldown_period = current_app.config['TRACK_COOLDOWN_PERIOD']
+    if not current_session.reserve_track(track_uri, cooldown_period):
+        logger.debug("Track on cooldown in session: %s by %s", track_name, artist_name)
         return jsonify({"status": "error", "message": "This track was recently played. Please try again later."}), 200
 
     try:
-        token_info = json.loads(current_session.owner_token)
-        sp = spotipy.Spotify(auth=token_info['access_token'])
+        token_info = current_session.get_token_info()
+        sp = get_client(token_info)
         
         # Log initial state
-        initial_state = {
-            'session_id': session_id,
-            'playlist_id': current_session.playlist_id,
-            'playlist_name': current_session.playlist_name,
-            'current_queue': current_session.get_queue()
-        }
-        logger.debug(f"Initial state:\n{format_debug_output(initial_state)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            initial_state = {
+                'session_id': session_id,
+                'playlist_id': current_session.playlist_id,
+                'playlist_name': current_session.playlist_name,
+                'current_queue': current_session.get_queue()
+            }
+            logger.debug("Initial state:\n%s", format_debug_output(initial_state))
         
         # Add track to Spotify queue
-        logger.info(f"Adding track to Spotify queue: {track_name}")
-        sp.add_to_queue(track_uri)
-        logger.info(f"Successfully added to Spotify queue: {track_name}")
+        logger.info("Adding track to Spotify queue: %s", track_name)
+        try:
+            sp.add_to_queue(track_uri)
+        except Exception:
+            current_session.release_track(track_uri)
+            raise
+        logger.info("Successfully added to Spotify queue: %s", track_name)
         
         # Add track to session queue
         track = {
@@ -321,115 +379,170 @@ def session_queue(session_id):
             'name': track_name,
             'artists': artist_name
         }
-        logger.debug(f"Track before adding to queue: {track}")
-        current_session.add_to_queue(track, participant_id)
-        logger.debug(f"Track after adding to queue: {track}")
-        logger.info(f"Added track to session queue: {track_name}")
+        logger.debug("Track before adding to queue: %s", track)
+        # The playlist append is written behind in the background; only the queue add is waited on
+        playlist_status = current_session.add_to_queue(track, participant_id)
+        logger.debug("Track after adding to queue: %s", track)
+        logger.info("Added track to session queue: %s", track_name)
+        refresh_player_state(session_id)
         
-        # Add track to playlist if playlist exists
-        playlist_addition_success = False
-        if current_session.playlist_id:
-            logger.info(f"Attempting to add track to playlist: {current_session.playlist_id}")
-            try:
-                sp.user_playlist_add_tracks(sp.me()['id'], current_session.playlist_id, [track_uri])
-                logger.info(f"Successfully added track {track_name} to playlist {current_session.playlist_id}")
-                playlist_addition_success = True
-            except Exception as playlist_error:
-                logger.error(f"Error adding track to playlist: {str(playlist_error)}")
-        else:
-            logger.warning(f"No playlist associated with session {session_id}")
+        playlist_addition_success = playlist_status is not None
+        if not playlist_addition_success:
+            logger.warning("No playlist associated with session %s", session_id)
         
         # Log final state
-        final_state = {
-            'session_id': session_id,
-            'playlist_id': current_session.playlist_id,
-            'playlist_name': current_session.playlist_name,
-            'current_queue': current_session.get_queue(),
-            'added_to_playlist': playlist_addition_success
-        }
-        logger.debug(f"Final state:\n{format_debug_output(final_state)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            final_state = {
+                'session_id': session_id,
+                'playlist_id': current_session.playlist_id,
+                'playlist_name': current_session.playlist_name,
+                'current_queue': current_session.get_queue(),
+                'added_to_playlist': playlist_addition_success
+            }
+            logger.debug("Final state:\n%s", format_debug_output(final_state))
         
         message = "Track added to session queue"
         if playlist_addition_success:
             message += " and playlist"
         
-        logger.info(f"{message}: {track_name} in session {session_id}")
+        logger.info("%s: %s in session %s", message, track_name, session_id)
         return jsonify({
             "status": "success", 
             "message": message,
             "track": track,
             "added_to_playlist": playlist_addition_success,
+            "playlist_status": playlist_status,
             "playlist_name": current_session.playlist_name
         })
     except SpotifyException as e:
-        logger.error(f"Spotify API error adding track to session {session_id}: {str(e)}")
+        logger.error("Spotify API error adding track to session %s: %s", session_id, e)
         return jsonify({"error": str(e)}), 500
     except Exception as e:
-        logger.error(f"Error adding track to session {session_id}: {str(e)}", exc_info=True)
+        logger.error("Error adding track to session %s: %s", session_id, e, exc_info=True)
         return jsonify({"error": str(e)}), 500
     
+def _publish_player_state(session_id, snapshot):
+    """Poller callback: push queue/now-playing changes to the session's event stream"""
+    current_session = get_session(session_id)
+    if not current_session or snapshot['queue_info'] is None:
+        return
+    channel = get_channel(session_id)
+    previous = channel.last_data
+    payload = current_session.queue_payload(snapshot)
+    if previous is not None and previous.get('current_track') != payload['current_track']:
+        event_type = 'now_playing'
+    else:
+        event_type = 'queue'
+    channel.publish(event_type, payload, only_if_changed=True)
+
+def _poller_options(session_id):
+    return {
+        'interval': current_app.config['PLAYER_STATE_REFRESH_INTERVAL'],
+        'idle_timeout': current_app.config['PLAYER_STATE_IDLE_TIMEOUT'],
+        'on_update': lambda snapshot: _publish_player_state(session_id, snapshot)
+    }
+
+@bp.route('/session/<session_id>/playlist_status')
+def session_playlist_status(session_id):
+    """Delivery status of the session's background playlist writes"""
+    current_session = get_session(session_id)
+    if not current_session:
+        return jsonify({"error": "Session not found"}), 404
+
+    track_uri = request.args.get('track_uri')
+    status = get_playlist_status(session_id, track_uri)
+    if track_uri and status is None:
+        return jsonify({"error": "Track not queued for playlist"}), 404
+
+    return jsonify({
+        "playlist_id": current_session.playlist_id,
+        "playlist_name": current_session.playlist_name,
+        "status": status
+    })
+
 @bp.route('/session/<session_id>/current_queue')
 def session_current_queue(session_id):
     current_session = get_session(session_id)
     if not current_session:
         return jsonify({"error": "Session not found"}), 404
 
-    token_info = json.loads(current_session.owner_token)
+    token_info = current_session.get_token_info()
     if not token_info:
         return jsonify({"error": "Session owner not authenticated"}), 401
 
-    sp = spotipy.Spotify(auth=token_info['access_token'])
-    
-    try:
-        queue_info = sp._get('me/player/queue')
-        current_track = sp.currently_playing()
-
-        # Get current Spotify queue URIs for comparison
-        current_spotify_uris = [track['uri'] for track in queue_info['queue']] if queue_info else []
-        
-        # Get session's tracked queue
-        session_queue = current_session.get_queue()
-        
-        # Split session queue into tracks still in Spotify queue vs played tracks
-        still_queued_tracks = [track for track in session_queue if track['uri'] in current_spotify_uris]
-        played_tracks = [track for track in session_queue if track['uri'] not in current_spotify_uris]
-        
-        # Update session's queue to remove played tracks
-        current_session.queue = still_queued_tracks
-        
-        # User queue contains tracks added by session participants (have added_by info)
-        user_queue = [track for track in still_queued_tracks if track.get('added_by')]
-        
-        # Radio queue contains Spotify's algorithm tracks (no added_by info) plus remaining Spotify queue
-        radio_queue = []
-        if queue_info:
-            for track in queue_info['queue']:
-                # Check if this track was added by a participant
-                participant_track = next((t for t in still_queued_tracks if t['uri'] == track['uri'] and t.get('added_by')), None)
-                
-                # If not added by participant, it's a radio track
-                if not participant_track:
-                    formatted_track = {
-                        'name': track['name'],
-                        'artists': ', '.join([artist['name'] for artist in track['artists']]),
-                        'uri': track['uri']
-                    }
-                    radio_queue.append(formatted_track)
+    # Every guest is answered from the same background-refreshed snapshot
+    snapshot = get_player_state(session_id, token_info, **_poller_options(session_id))
+    if not snapshot:
+        logger.error("Timed out waiting for player state for session %s", session_id)
+        return jsonify({"error": "Player state not available yet"}), 503
+    if snapshot['error'] and snapshot['queue_info'] is None:
+        logger.error("Error fetching queue for session %s: %s", session_id, snapshot['error'])
+        return jsonify({"error": snapshot['error']}), 500
 
-        return jsonify({
-            'current_track': {
-                'name': current_track['item']['name'],
-                'artists': ', '.join([artist['name'] for artist in current_track['item']['artists']])
-            } if current_track and current_track['is_playing'] else None,
-            'user_queue': user_queue,
-            'radio_queue': radio_queue[:5],  # Limit to first 5 tracks
-            'participants': current_session.participants,
-            'participant_count': current_session.get_participant_count()
-        })
+    try:
+        return jsonify(current_session.queue_payload(snapshot))
     except Exception as e:
-        logger.error(f"Error fetching queue for session {session_id}: {str(e)}")
+        logger.error("Error fetching queue for session %s: %s", session_id, e)
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/session/<session_id>/events')
+def session_events(session_id):
+    """Server-Sent Events stream of queue, now-playing and participant updates"""
+    current_session = get_session(session_id)
+    if not current_session:
+        return jsonify({"error": "Session not found"}), 404
+
+    token_info = current_session.get_token_info()
+    if not token_info:
+        return jsonify({"error": "Session owner not authenticated"}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = None
+
+    channel = get_channel(session_id)
+    poller_options = _poller_options(session_id)
+    heartbeat_interval = current_app.config['SSE_HEARTBEAT_INTERVAL']
+    retry_ms = current_app.config['SSE_RETRY_MS']
+
+    def stream():
+        yield f"retry: {retry_ms}\n\n"
+
+        # Keeps the shared poller alive for as long as anyone is listening
+        poller = get_poller(session_id, token_info, **poller_options)
+
+        events, resumed = channel.events_since(last_event_id) if last_event_id is not None else ([], False)
+        if resumed:
+            logger.debug(f"Resuming event stream for session {session_id} after event {last_event_id}")
+            cursor = last_event_id
+        else:
+            # Fresh connection, or the backlog no longer covers the gap: send the full state
+            cursor = channel.last_id
+            snapshot = poller.get_snapshot()
+            live_session = get_session(session_id)
+            if live_session and snapshot and snapshot['queue_info'] is not None:
+                yield format_sse(json.dumps(live_session.queue_payload(snapshot)), 'queue', cursor)
+
+        while True:
+            for event_id, event_type, data in events:
+                yield format_sse(data, event_type, event_id)
+                cursor = event_id
+            if channel.closed:
+                break
+            if channel.wait(cursor, heartbeat_interval):
+                events, _ = channel.events_since(cursor)
+            else:
+                events = []
+                yield ": heartbeat\n\n"
+            get_poller(session_id, token_info, **poller_options)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @bp.route('/session/<session_id>/end', methods=['POST'])
 def end_session(session_id):
     current_session = get_session(session_id)
@@ -445,6 +558,7 @@ def end_session(session_id):
         return jsonify({"error": str(e)}), 500
     
 @bp.route('/create_session_playlist', methods=['POST'])
+@spotify_priority(HOST)
 def create_session_playlist_route():
     logger.info("Create session playlist request received")
     try:
@@ -457,8 +571,8 @@ def create_session_playlist_route():
         if not current_session:
             raise ValueError("Session not found")
 
-        token_info = json.loads(current_session.owner_token)
-        sp = spotipy.Spotify(auth=token_info['access_token'])
+        token_info = current_session.get_token_info()
+        sp = get_client(token_info)
 
         # Check if a playlist already exists for this session
         if current_session.playlist_id:
@@ -477,8 +591,7 @@ def create_session_playlist_route():
             raise ValueError("Failed to create playlist")
 
         # Update the session with the new playlist information
-        current_session.playlist_id = playlist_id
-        current_session.playlist_name = playlist_name
+        current_session.set_playlist(playlist_id, playlist_name)
 
         logger.info(f"Playlist created successfully: {playlist_name} (ID: {playlist_id})")
         return jsonify({
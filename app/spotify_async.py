@@ -0,0 +1,274 @@
+# spotify_async.py
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+import logging
+from spotipy.exceptions import SpotifyException
+from app.metrics import get_metrics, spotify_endpoint
+from app.rate_limiter import get_governor, current_priority, retry_after_seconds, RateLimited
+
+try:
+    import httpx
+except ImportError:  # optional: without httpx, fan_out() runs the calls on a thread pool instead
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = 'https://api.spotify.com/v1/'
+RETRY_STATUSES = (500, 502, 503, 504)
+DEFAULT_OPTIONS = {
+    'enabled': True,
+    'pool_size': 20,
+    'timeout': 5,
+    'retries': 3,
+    'backoff_factor': 0.3,
+}
+
+# One Spotify call for fan_out(), named after the spotipy method it stands for
+SpotifyCall = namedtuple('SpotifyCall', 'method args kwargs')
+
+def call(method, *args, **kwargs):
+    return SpotifyCall(method, args, kwargs)
+
+class AsyncSpotify:
+    """The Spotify Web API calls LazyDJ makes, as coroutines on a shared httpx pool.
+
+    Method names and arguments follow spotipy's, and failures raise the same
+    SpotifyException, so results and errors look the same either way.
+    """
+
+    def __init__(self, http, access_token, priority, prefix=API_PREFIX, retries=3, backoff_factor=0.3):
+        self._http = http
+        self._access_token = access_token
+        self._priority = priority
+        self.prefix = prefix
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+
+    async def _request(self, method, path, params=None, payload=None):
+        url = self.prefix + path
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        governor = get_governor()
+        for attempt in (1, 2):
+            if attempt == 2:
+                # Waits out the Retry-After like GovernedSpotify does, on a worker thread so the loop keeps going
+                await asyncio.to_thread(governor.acquire, self._access_token, self._priority)
+            try:
+                return await self._send(method, url, params, payload)
+            except SpotifyException as e:
+                if e.http_status != 429:
+                    raise
+                retry_after = retry_after_seconds(e)
+                governor.rate_limited(self._access_token, retry_after)
+                if attempt == 2 or governor.max_waits[self._priority] < retry_after:
+                    raise RateLimited(self._priority, retry_after, "Spotify returned 429") from e
+
+    async def _send(self, method, url, params, payload):
+        headers = {'Authorization': f'Bearer {self._access_token}'}
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            for attempt in range(self._retries + 1):
+                try:
+                    response = await self._http.request(method, url, params=params, json=payload, headers=headers)
+                except httpx.HTTPError as e:
+                    # Surfaces as the SpotifyException callers already handle
+                    logger.error(f"HTTP Error for {method} to {url}: {str(e)}")
+                    raise SpotifyException(408 if isinstance(e, httpx.TimeoutException) else 503, -1,
+                                           f"{url}:\n {str(e) or type(e).__name__}") from e
+                if response.status_code not in RETRY_STATUSES or attempt == self._retries:
+                    break
+                await asyncio.sleep(self._backoff_factor * 2 ** attempt)
+            status = 'ok' if response.is_success else str(response.status_code)
+            if not response.is_success:
+                raise self._error(response)
+            if not response.content:
+                return None
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        finally:
+            get_metrics().observe_spotify_call(spotify_endpoint(url), method, status, time.perf_counter() - start)
+
+    def _error(self, response):
+        try:
+            error = response.json().get('error', {})
+            msg, reason = error.get('message'), error.get('reason')
+        except (ValueError, AttributeError):
+            msg, reason = response.text or None, None
+        logger.error(f"HTTP Error for {response.request.method} to {response.request.url} "
+                     f"returned {response.status_code} due to {msg}")
+        return SpotifyException(response.status_code, -1, f"{response.request.url}:\n {msg}",
+                                reason=reason, headers=response.headers)
+
+    async def search(self, q, limit=10, offset=0, type='track', market=None):
+        return await self._request('GET', 'search', {'q': q, 'limit': limit, 'offset': offset,
+                                                     'type': type, 'market': market})
+
+    async def add_to_queue(self, uri, device_id=None):
+        return await self._request('POST', 'me/player/queue', {'uri': uri, 'device_id': device_id})
+
+    async def queue(self):
+        return await self._request('GET', 'me/player/queue')
+
+    async def currently_playing(self, market=None, additional_types=None):
+        return await self._request('GET', 'me/player/currently-playing',
+                                   {'market': market, 'additional_types': additional_types})
+
+    async def current_playback(self, market=None, additional_types=None):
+        return await self._request('GET', 'me/player', {'market': market, 'additional_types': additional_types})
+
+    async def volume(self, volume_percent, device_id=None):
+        return await self._request('PUT', 'me/player/volume', {'volume_percent': volume_percent,
+                                                               'device_id': device_id})
+
+    async def start_playback(self, device_id=None, context_uri=None, uris=None, offset=None, position_ms=None):
+        payload = {key: value for key, value in [('context_uri', context_uri), ('uris', uris),
+                                                 ('offset', offset), ('position_ms', position_ms)]
+                   if value is not None}
+        return await self._request('PUT', 'me/player/play', {'device_id': device_id}, payload)
+
+    async def next_track(self, device_id=None):
+        return await self._request('POST', 'me/player/next', {'device_id': device_id})
+
+    async def playlist_add_items(self, playlist_id, items, position=None):
+        payload = {'uris': items} if position is None else {'uris': items, 'position': position}
+        return await self._request('POST', f'playlists/{_spotify_id(playlist_id)}/tracks', payload=payload)
+
+    async def user_playlists(self, user, limit=50, offset=0):
+        return await self._request('GET', f'users/{user}/playlists', {'limit': limit, 'offset': offset})
+
+    async def track(self, track_id, market=None):
+        return await self._request('GET', f'tracks/{_spotify_id(track_id)}', {'market': market})
+
+def _spotify_id(uri):
+    # 'spotify:track:<id>' or a bare ID
+    return uri.rsplit(':', 1)[-1]
+
+# Calls spotipy 2.19 has no public method for
+SYNC_FALLBACKS = {
+    'queue': lambda sp: sp._get('me/player/queue'),
+}
+
+_options = dict(DEFAULT_OPTIONS)
+_loop = None
+_http = None
+_executor = None
+_lock = threading.Lock()
+
+def _event_loop():
+    """The background event loop and its HTTP pool, started on first use"""
+    global _loop, _http
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='spotify-async', daemon=True).start()
+        if _http is None:
+            limits = httpx.Limits(max_connections=_options['pool_size'],
+                                  max_keepalive_connections=_options['pool_size'])
+            _http = httpx.AsyncClient(timeout=_options['timeout'],
+                                      transport=httpx.AsyncHTTPTransport(limits=limits, retries=_options['retries']))
+        return _loop, _http
+
+def _run(sp, c):
+    fallback = SYNC_FALLBACKS.get(c.method)
+    return fallback(sp) if fallback else getattr(sp, c.method)(*c.args, **c.kwargs)
+
+def _fan_out_async(sp, calls):
+    loop, http = _event_loop()
+    priority = current_priority()
+    # Paced here, where the caller's priority applies, before anything goes out
+    for _ in calls:
+        get_governor().acquire(sp._auth, priority)
+    client = AsyncSpotify(http, sp._auth, priority, prefix=sp.prefix,
+                          retries=_options['retries'], backoff_factor=_options['backoff_factor'])
+
+    async def run():
+        return await asyncio.gather(*(getattr(client, c.method)(*c.args, **c.kwargs) for c in calls),
+                                    return_exceptions=True)
+
+    # Each call makes at most retries + 1 attempts, plus one after a 429's Retry-After
+    timeout = _options['timeout'] * (_options['retries'] + 2) + get_governor().max_waits[priority]
+    future = asyncio.run_coroutine_threadsafe(run(), loop)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        error = SpotifyException(408, -1, f"{len(calls)} concurrent Spotify calls timed out after {timeout:.0f}s")
+        return [error] * len(calls)
+
+def _fan_out_threads(sp, calls):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_options['pool_size'], thread_name_prefix='spotify-fan-out')
+    # Each call runs in a copy of this context so it keeps the caller's priority class
+    futures = [_executor.submit(contextvars.copy_context().run, _run, sp, c) for c in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+def async_enabled():
+    """Whether fan_out() uses the asyncio client rather than the thread pool"""
+    return _options['enabled'] and httpx is not None
+
+def fan_out(sp, *calls, return_exceptions=False):
+    """Make independent Spotify calls at the same time; returns their results in order.
+
+    Each argument is a call('method', *args, **kwargs) naming a spotipy
+    method, e.g. fan_out(sp, call('queue'), call('currently_playing')), for
+    the pooled client sp (whose access token and API base are used).
+    The caller waits for one round trip instead of one per call. If any call
+    fails, its exception is raised once all of them have finished; with
+    return_exceptions=True it takes that call's place in the results instead.
+    """
+    if len(calls) == 1:
+        try:
+            return [_run(sp, calls[0])]
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return [e]
+    results = _fan_out_async(sp, calls) if async_enabled() else _fan_out_threads(sp, calls)
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
+
+def _gevent_patched():
+    if 'gevent.monkey' not in sys.modules:
+        return False
+    return sys.modules['gevent.monkey'].is_module_patched('threading')
+
+def init_app(app):
+    """Size the async HTTP pool like the spotipy one; SPOTIFY_ASYNC=false keeps fan-out on threads"""
+    global _http
+    enabled = app.config['SPOTIFY_ASYNC']
+    if enabled and httpx is None:
+        logger.info("httpx is not installed, concurrent Spotify calls will use a thread pool")
+    elif enabled and _gevent_patched():
+        # Under gevent the pool's threads are greenlets, which overlap the calls just as well
+        logger.info("Running under gevent, concurrent Spotify calls will use greenlets")
+        enabled = False
+    with _lock:
+        _options.update({
+            'enabled': enabled,
+            'pool_size': app.config['SPOTIFY_POOL_SIZE'],
+            'timeout': app.config['SPOTIFY_REQUEST_TIMEOUT'],
+            'retries': app.config['SPOTIFY_RETRIES'],
+            'backoff_factor': app.config['SPOTIFY_BACKOFF_FACTOR'],
+        })
+        if _http is not None:
+            asyncio.run_coroutine_threadsafe(_http.aclose(), _loop)
+            _http = None
@@ -1,9 +1,18 @@
 from spotipy.oauth2 import SpotifyOAuth
 from flask import current_app, session
-import time
 import spotipy
 import json
 import logging
+import hashlib
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.cache import TTLCache
+from app.track_cache import get_track_cache
+from app.rate_limiter import RateLimited
+from app.playback_cache import PlaybackCachingSpotify
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +24,21 @@ def get_spotify_oauth():
         scope=current_app.config['SPOTIFY_SCOPE']
     )
 
+def token_key(token_info):
+    """Stable, non-secret key for a token owner (survives access token refreshes).
+
+    Derived from the refresh token the owner logged in with. Spotify may hand
+    out a new refresh token on refresh, so the token manager carries the
+    original key along in refreshed tokens as 'owner_key'.
+    """
+    if token_info.get('owner_key'):
+        return token_info['owner_key']
+    secret = token_info.get('refresh_token') or token_info.get('access_token', '')
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
 def get_token():
     token_info = session.get('token_info')
-    logger.debug(f"Retrieved token_info from session: {token_info}")
+    logger.debug("Retrieved token_info from session: %s", token_info)
 
     if not token_info:
         logger.warning("No token_info found in session")
@@ -35,57 +56,166 @@ def get_token():
         logger.error(f"Unexpected token_info type: {type(token_info)}")
         return None
 
-    now = int(time.time())
-    is_token_expired = token_info.get('expires_at', 0) - now < 60
-
-    if is_token_expired:
-        logger.info("Token is expired, refreshing...")
-        sp_oauth = get_spotify_oauth()
-        try:
-            token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
-            session['token_info'] = json.dumps(token_info)
-            logger.info("Token refreshed and stored in session")
-        except spotipy.oauth2.SpotifyOauthError as e:
-            logger.error(f"Error refreshing token: {e}")
-            if 'invalid_grant' in str(e):
-                session.pop('token_info', None)
-                return None
-        except Exception as e:
-            logger.error(f"Error refreshing token: {e}")
-            return None
+    # The token manager refreshes owner tokens in the background (and at most
+    # once at a time), so this usually just swaps in its fresher copy
+    from app.token_manager import get_token_manager
+    current = get_token_manager().get_token(token_info)
+    if current is None:
+        logger.warning("Token expired and could not be refreshed")
+        session.pop('token_info', None)
+        return None
+    if current['access_token'] != token_info['access_token']:
+        session['token_info'] = json.dumps(current)
+        logger.info("Stored refreshed token in session")
+    token_info = current
 
     logger.debug("Token info is valid and up to date")
     return token_info
     
+# Pooled Spotify clients. Every client shares one requests.Session, so
+# keep-alive connections to api.spotify.com are reused across requests.
+DEFAULT_CLIENT_OPTIONS = {
+    'pool_size': 20,
+    'timeout': 5,
+    'retries': 3,
+    'backoff_factor': 0.3,
+}
+MAX_POOLED_CLIENTS = 128
+
+_client_options = dict(DEFAULT_CLIENT_OPTIONS)
+_http_session = None
+_clients = OrderedDict()  # token key -> spotipy.Spotify, least recently used first
+_clients_lock = threading.Lock()
+
+def init_app(app):
+    """Configure the shared HTTP pool used by every Spotify client"""
+    global _http_session
+    with _clients_lock:
+        _client_options.update({
+            'pool_size': app.config['SPOTIFY_POOL_SIZE'],
+            'timeout': app.config['SPOTIFY_REQUEST_TIMEOUT'],
+            'retries': app.config['SPOTIFY_RETRIES'],
+            'backoff_factor': app.config['SPOTIFY_BACKOFF_FACTOR'],
+        })
+        _http_session = None
+        _clients.clear()
+
+def _build_http_session():
+    retry = Retry(
+        total=_client_options['retries'],
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=_client_options['retries'],
+        backoff_factor=_client_options['backoff_factor'],
+        # 429s are left to the rate governor, which honors Retry-After without blocking other callers;
+        # urllib3 would otherwise retry any 429 that carries a Retry-After header
+        status_forcelist=[code for code in spotipy.Spotify.default_retry_codes if code != 429],
+        respect_retry_after_header=False)
+    adapter = HTTPAdapter(
+        pool_connections=_client_options['pool_size'],
+        pool_maxsize=_client_options['pool_size'],
+        max_retries=retry)
+    http_session = requests.Session()
+    http_session.mount('https://', adapter)
+    http_session.mount('http://', adapter)
+    return http_session
+
+def get_client(token_info):
+    """Return the pooled Spotify client for a token owner.
+
+    Clients are keyed by token owner rather than access token, so a refreshed
+    token is swapped into the existing client instead of building a new one.
+    A caller holding an older token never swaps it back over a newer one.
+    """
+    global _http_session
+    key = token_key(token_info)
+    access_token = token_info['access_token']
+    expires_at = token_info.get('expires_at', 0)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if _http_session is None:
+                _http_session = _build_http_session()
+            client = PlaybackCachingSpotify(
+                auth=access_token,
+                requests_session=_http_session,
+                requests_timeout=_client_options['timeout'])
+            client.token_expires_at = expires_at
+            client.owner_key = key
+            _clients[key] = client
+            if len(_clients) > MAX_POOLED_CLIENTS:
+                _clients.popitem(last=False)
+        else:
+            _clients.move_to_end(key)
+            if client._auth != access_token and expires_at >= client.token_expires_at:
+                client._auth = access_token
+                client.token_expires_at = expires_at
+        return client
+
 def get_spotify_client():
     token_info = get_token()
     if not token_info:
         return None
-    return spotipy.Spotify(auth=token_info['access_token'])
+    return get_client(token_info)
 
 def format_track_info(track):
     return f"{track['name']} by {', '.join([artist['name'] for artist in track['artists']])}"
 
-def search_tracks(query, limit=10):
-    sp = get_spotify_client()
-    if not sp:
-        return []
-
-    results = sp.search(q=query, type='track', limit=limit)
-    tracks = results['tracks']['items']
-
-    track_info = []
-    for track in tracks:
-        track_data = {
-            'name': track['name'],
-            'artists': ', '.join([artist['name'] for artist in track['artists']]),
-            'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
-            'uri': track['uri'],
-            'id': track['id']
-        }
-        track_info.append(track_data)
-
-    return track_info
+def format_search_track(track):
+    return {
+        'name': track['name'],
+        'artists': ', '.join([artist['name'] for artist in track['artists']]),
+        'album_art': track['album']['images'][0]['url'] if track['album']['images'] else None,
+        'uri': track['uri'],
+        'id': track['id']
+    }
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache():
+    """Process-wide search cache, sized from the app config on first use"""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = TTLCache(
+                    maxsize=current_app.config['SEARCH_CACHE_SIZE'],
+                    ttl=current_app.config['SEARCH_CACHE_TTL']
+                )
+    return _search_cache
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+def search_tracks(sp, query, limit=10, market=None):
+    """Search Spotify for tracks, shared by every search and autocomplete endpoint.
+
+    Results are cached per normalized query and market, and identical searches
+    that arrive while one is already in flight wait for it instead of calling
+    Spotify again. If the call is rate limited, an expired cached result is
+    served instead when there is one. The returned list is shared, so treat
+    it as read-only.
+    """
+    market = market or current_app.config.get('SPOTIFY_MARKET')
+    key = (normalize_query(query), market, limit)
+
+    def load():
+        logger.debug("Search cache miss for '%s' (market: %s)", key[0], market)
+        results = sp.search(q=query, type='track', limit=limit, market=market)
+        tracks = results['tracks']['items']
+        get_track_cache().remember(tracks)
+        return [format_search_track(track) for track in tracks]
+
+    try:
+        return get_search_cache().get_or_load(key, load)
+    except RateLimited:
+        stale = get_search_cache().get_stale(key)
+        if stale is None:
+            raise
+        logger.info("Serving stale search results for '%s' while rate limited", key[0])
+        return stale
 
 def add_track_to_queue(track_uri):
     sp = get_spotify_client()
@@ -159,8 +159,7 @@ function initializeSession(sessionId) {
         })
         .then((participantData) => {
             console.log('Participant registration result:', participantData);
-            fetchAndUpdateQueue(sessionId);
-            setInterval(() => fetchAndUpdateQueue(sessionId), 5000);
+            subscribeToSessionEvents(sessionId);
             loadInitialSearch(sessionId);
             // Don't show generic success notification - participant registration handles its own notifications
         })
@@ -170,9 +169,76 @@ function initializeSession(sessionId) {
         });
 }
 
+// Push updates over Server-Sent Events, falling back to polling if the stream is unavailable
+const QUEUE_POLL_INTERVAL = 5000;
+const MAX_STREAM_FAILURES = 3;
+let queuePollTimer = null;
+
+function subscribeToSessionEvents(sessionId) {
+    if (!window.EventSource) {
+        console.log('EventSource not supported, polling for queue updates');
+        startQueuePolling(sessionId);
+        return;
+    }
+
+    let consecutiveFailures = 0;
+    const source = new EventSource(`/session/${sessionId}/events`);
+    const handleUpdate = (event) => {
+        consecutiveFailures = 0;
+        applyQueueUpdate(JSON.parse(event.data));
+    };
+
+    source.onopen = () => {
+        // Only failures in a row count; heartbeats are comments and never reach handleUpdate
+        consecutiveFailures = 0;
+        console.log('Session event stream connected');
+        Queue.setLiveUpdates(true);
+        stopQueuePolling();
+    };
+    ['queue', 'now_playing', 'participants'].forEach(type => source.addEventListener(type, handleUpdate));
+    source.addEventListener('end', () => {
+        console.log('Session ended, closing event stream');
+        source.close();
+        Queue.setLiveUpdates(false);
+    });
+    source.onerror = () => {
+        consecutiveFailures += 1;
+        Queue.setLiveUpdates(false);
+        // EventSource reconnects on its own (resuming from Last-Event-ID); give up after repeated failures
+        if (source.readyState === EventSource.CLOSED || consecutiveFailures >= MAX_STREAM_FAILURES) {
+            console.warn('Session event stream unavailable, falling back to polling');
+            source.close();
+            startQueuePolling(sessionId);
+        }
+    };
+}
+
+function startQueuePolling(sessionId = null) {
+    if (queuePollTimer) return;
+    fetchAndUpdateQueue(sessionId);
+    queuePollTimer = setInterval(() => fetchAndUpdateQueue(sessionId), QUEUE_POLL_INTERVAL);
+}
+
+function stopQueuePolling() {
+    if (queuePollTimer) {
+        clearInterval(queuePollTimer);
+        queuePollTimer = null;
+    }
+}
+
+function applyQueueUpdate(data) {
+    if (data) {
+        UI.updateQueueDisplay(data);
+        if (data.current_track) {
+            UI.updateNowPlayingBar(data.current_track);
+        }
+    } else {
+        console.error('Received undefined queue data');
+    }
+}
+
 function initializeMainView() {
-    fetchAndUpdateQueue();
-    setInterval(fetchAndUpdateQueue, 5000);
+    startQueuePolling();
     loadInitialSearch();
 }
 
@@ -206,16 +272,7 @@ function fetchAndUpdateQueue(sessionId = null) {
 
     fetch(url, { headers })
         .then(response => response.json())
-        .then(data => {
-            if (data) {
-                UI.updateQueueDisplay(data);
-                if (data.current_track) {
-                    UI.updateNowPlayingBar(data.current_track);
-                }
-            } else {
-                console.error('Received undefined data from fetchQueue');
-            }
-        })
+        .then(applyQueueUpdate)
         .catch(error => console.error('Error fetching queue:', error));
 }
 
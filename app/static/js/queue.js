@@ -9,6 +9,11 @@ let addToQueueTimeout = null;
 let lastRequestTime = 0;
 let currentRequest = null;
 const DEBOUNCE_DELAY = 300; // 300ms debounce time
+let liveUpdates = false; // true while the session event stream is pushing queue updates
+
+export function setLiveUpdates(enabled) {
+    liveUpdates = enabled;
+}
 
 export function addTrackToQueue(track_uri, trackName, artistName, sessionId = '', sessionToken = null) {
     console.log(`Attempting to add track to queue: ${trackName} by ${artistName}`);
@@ -76,7 +81,10 @@ export function addTrackToQueue(track_uri, trackName, artistName, sessionId = ''
                     message += ` "${data.playlist_name}"`;
                 }
                 showNotification(message, 'success');
-                fetchQueue(sessionId, sessionToken);
+                // The event stream pushes the updated queue on its own
+                if (!liveUpdates) {
+                    fetchQueue(sessionId, sessionToken);
+                }
             } else if (data.status === 'error') {
                 showNotification(data.message || 'Failed to add track to queue', 'error');
             }
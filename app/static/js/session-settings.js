@@ -76,8 +76,7 @@ function closeSessionSettingsModal() {
 }
 
 function handleShareSession() {
-    const currentUrl = window.location.href;
-    generateQRCode('sessionQRCode', currentUrl);
+    showSessionQRCode('sessionQRCode');
     document.getElementById('sessionLinkContainer').style.display = 'flex';
     document.getElementById('playlistLinkContainer').style.display = 'none';
     document.querySelector('#sessionLinkContainer .qr-code-label').textContent = 'Scan to share session';
@@ -137,6 +136,22 @@ function handleSharePlaylist() {
     document.querySelector('#playlistLinkContainer .qr-code-label').textContent = 'Scan to share playlist';
 }
 
+function showSessionQRCode(elementId) {
+    // Rendered and cached by the server; the browser keeps it for the life of the session
+    const element = document.getElementById(elementId);
+    if (element.querySelector('img')) {
+        return;
+    }
+    const img = document.createElement('img');
+    img.src = element.dataset.qrSrc;
+    img.alt = 'Session QR code';
+    img.className = 'qr-code-image';
+    img.onerror = () => {
+        element.innerHTML = '<p style="text-align: center; color: #1DB954;">QR code unavailable</p>';
+    };
+    element.appendChild(img);
+}
+
 function generateQRCode(elementId, data) {
     const element = document.getElementById(elementId);
     element.innerHTML = ''; // Clear previous QR code
@@ -0,0 +1,184 @@
+# token_manager.py
+
+from spotipy.cache_handler import MemoryCacheHandler
+from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+from flask import current_app
+import threading
+import time
+import logging
+from app.spotify_utils import token_key, get_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_MARGIN = 300  # refresh this many seconds before expires_at
+DEFAULT_CHECK_INTERVAL = 30  # seconds between background expiry checks
+DEFAULT_IDLE_TIMEOUT = 24 * 60 * 60  # stop refreshing owners unused for this long
+EXPIRY_LEEWAY = 60  # tokens this close to expiry are refreshed in the request path
+
+class _Refresh:
+    """A refresh in progress that other callers for the same owner wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.token_info = None
+
+class TokenManager:
+    """Parsed owner tokens, kept fresh by one background thread.
+
+    Tokens are refreshed a few minutes before they expire, so requests don't pay
+    for the refresh. Concurrent refreshes of the same owner collapse into one
+    call, and the new token is swapped into the owner's pooled Spotify client.
+    """
+
+    def __init__(self, oauth_factory, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 check_interval=DEFAULT_CHECK_INTERVAL, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.oauth_factory = oauth_factory
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self._tokens = {}  # token key -> token_info
+        self._last_used = {}  # token key -> time of last lookup
+        self._inflight = {}  # token key -> _Refresh
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._oauth = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def add_listener(self, listener):
+        """Call listener(key, token_info) after every successful refresh"""
+        self._listeners.append(listener)
+
+    def track(self, token_info):
+        """Remember an owner's token, keeping whichever copy expires last; returns the current one"""
+        key = token_key(token_info)
+        with self._lock:
+            current = self._tokens.get(key)
+            if current is None or token_info.get('expires_at', 0) > current.get('expires_at', 0):
+                self._tokens[key] = current = token_info
+            self._last_used[key] = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+                self._thread.start()
+        return current
+
+    def get_token(self, token_info):
+        """Return the freshest token for token_info's owner, refreshing it now if it is about to expire.
+
+        Returns None if the refresh is rejected (the owner revoked access), or
+        if it failed and the token we have has already expired.
+        """
+        current = self.track(token_info)
+        if current.get('expires_at', 0) - time.time() >= EXPIRY_LEEWAY:
+            return current
+        refreshed = self.refresh(token_key(current))
+        if refreshed is not None:
+            return refreshed
+        with self._lock:
+            current = self._tokens.get(token_key(token_info))
+        return current if current and current.get('expires_at', 0) > time.time() else None
+
+    def refresh(self, key):
+        """Refresh an owner's token once, however many callers ask at the same time"""
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Refresh()
+            token_info = self._tokens.get(key)
+
+        if not leader:
+            flight.event.wait()
+            return flight.token_info
+
+        try:
+            if token_info is None:
+                return None
+            if self._oauth is None:
+                self._oauth = self.oauth_factory()
+            refreshed = self._oauth.refresh_access_token(token_info['refresh_token'])
+            # Same owner even if Spotify rotated the refresh token
+            refreshed['owner_key'] = key
+            with self._lock:
+                self._tokens[key] = refreshed
+            logger.info(f"Refreshed token for owner {key}, valid until {refreshed.get('expires_at')}")
+            self._publish(key, refreshed)
+            flight.token_info = refreshed
+            return refreshed
+        except SpotifyOauthError as e:
+            logger.error(f"Error refreshing token for owner {key}: {e}")
+            if 'invalid_grant' in str(e):
+                self.forget(key)
+            return None
+        except Exception as e:
+            logger.error(f"Error refreshing token for owner {key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def forget(self, key):
+        with self._lock:
+            self._tokens.pop(key, None)
+            self._last_used.pop(key, None)
+
+    def _publish(self, key, token_info):
+        get_client(token_info)  # swaps the new access token into the pooled client
+        for listener in self._listeners:
+            try:
+                listener(key, token_info)
+            except Exception as e:
+                logger.error(f"Error in token refresh listener for owner {key}: {e}", exc_info=True)
+
+    def refresh_due(self):
+        """Refresh every recently used token that expires within the refresh margin"""
+        now = time.time()
+        with self._lock:
+            idle = [key for key, used in self._last_used.items() if now - used > self.idle_timeout]
+            for key in idle:
+                del self._tokens[key]
+                del self._last_used[key]
+            due = [key for key, token_info in self._tokens.items()
+                   if token_info.get('expires_at', 0) - now < self.refresh_margin]
+        if idle:
+            logger.info(f"Stopped refreshing {len(idle)} idle owner token(s)")
+        for key in due:
+            self.refresh(key)
+
+    def _run(self):
+        while not self._stopped.wait(self.check_interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logger.error(f"Error in background token refresh: {e}", exc_info=True)
+
+    def stop(self):
+        self._stopped.set()
+
+_manager = None
+
+def init_app(app):
+    """Create the token manager with the app's OAuth settings, usable outside a request"""
+    global _manager
+    settings = {
+        'client_id': app.config['SPOTIPY_CLIENT_ID'],
+        'client_secret': app.config['SPOTIPY_CLIENT_SECRET'],
+        'redirect_uri': app.config['SPOTIPY_REDIRECT_URI'],
+        'scope': app.config['SPOTIFY_SCOPE'],
+        # Owner tokens live in the manager; don't write them to a shared .cache file
+        'cache_handler': MemoryCacheHandler(),
+    }
+    if _manager:
+        _manager.stop()
+    _manager = TokenManager(
+        lambda: SpotifyOAuth(**settings),
+        refresh_margin=app.config['TOKEN_REFRESH_MARGIN'],
+        check_interval=app.config['TOKEN_REFRESH_CHECK_INTERVAL'],
+        idle_timeout=app.config['SESSION_EXPIRATION_TIME'])
+
+def get_token_manager():
+    global _manager
+    if _manager is None:
+        init_app(current_app)
+    return _manager
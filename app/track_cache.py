@@ -0,0 +1,104 @@
+# track_cache.py
+
+import threading
+import logging
+from app.cache import TTLCache
+from app.rate_limiter import spotify_priority, REFRESH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 5000
+DEFAULT_CACHE_TTL = 24 * 60 * 60  # track names and artwork hardly ever change
+MAX_TRACKS_PER_REQUEST = 50  # Spotify's limit for GET /tracks
+
+def track_metadata(track):
+    """The bits of a full Spotify track object LazyDJ displays"""
+    album = track.get('album') or {}
+    images = album.get('images') or []
+    return {
+        'uri': track['uri'],
+        'id': track.get('id'),
+        'name': track['name'],
+        'artists': ', '.join([artist['name'] for artist in track.get('artists', [])]),
+        'album_art': images[0]['url'] if images else None
+    }
+
+def _track_id(uri):
+    return uri.rsplit(':', 1)[-1]
+
+class TrackMetadataCache:
+    """Process-wide track metadata by URI, with LRU and TTL limits.
+
+    Filled for free from search results and player-state snapshots, which
+    already carry full track objects; anything missing is fetched with
+    batched GET /tracks calls of up to 50 IDs.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def remember(self, tracks):
+        """Cache full Spotify track objects seen elsewhere (episodes and local files are skipped)"""
+        for track in tracks:
+            if track and track.get('type', 'track') == 'track' and track.get('uri'):
+                self._cache.set(track['uri'], track_metadata(track))
+
+    def get(self, uri):
+        return self._cache.get(uri)
+
+    def get_many(self, sp, uris):
+        """Metadata for every URI that exists, fetching cache misses in batches"""
+        found = {}
+        missing = []
+        for uri in dict.fromkeys(uris):
+            metadata = self._cache.get(uri)
+            if metadata is None:
+                missing.append(uri)
+            else:
+                found[uri] = metadata
+
+        for start in range(0, len(missing), MAX_TRACKS_PER_REQUEST):
+            batch = missing[start:start + MAX_TRACKS_PER_REQUEST]
+            logger.debug(f"Fetching metadata for {len(batch)} uncached track(s)")
+            results = sp.tracks([_track_id(uri) for uri in batch])
+            for track in results['tracks']:
+                if track:
+                    metadata = track_metadata(track)
+                    self._cache.set(metadata['uri'], metadata)
+                    found[metadata['uri']] = metadata
+        return found
+
+    def get_one(self, sp, uri):
+        return self.get_many(sp, [uri]).get(uri)
+
+    def prewarm(self, sp, uris):
+        """Fetch any uncached URIs on a background thread; returns immediately"""
+        missing = [uri for uri in uris if self._cache.get(uri) is None]
+        if not missing:
+            return False
+
+        @spotify_priority(REFRESH)
+        def load():
+            try:
+                self.get_many(sp, missing)
+                logger.info(f"Pre-warmed metadata for {len(missing)} track(s)")
+            except Exception as e:
+                logger.warning(f"Error pre-warming track metadata: {str(e)}")
+
+        threading.Thread(target=load, name='track-prewarm', daemon=True).start()
+        return True
+
+    def stats(self):
+        return self._cache.stats()
+
+_track_cache = None
+
+def init_app(app):
+    global _track_cache
+    _track_cache = TrackMetadataCache(maxsize=app.config['TRACK_CACHE_SIZE'], ttl=app.config['TRACK_CACHE_TTL'])
+
+def get_track_cache():
+    global _track_cache
+    if _track_cache is None:
+        _track_cache = TrackMetadataCache()
+    return _track_cache
@@ -0,0 +1,158 @@
+# transitions.py
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 2
+MAX_TRACKED_JOBS = 200
+SUPERSEDE_WAIT = 5  # seconds a new job waits for the one it replaced to stop
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+class TransitionJob:
+    """A volume transition (fade, preset switch) running on the fade engine"""
+
+    def __init__(self, kind, device_key, previous=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.device_key = device_key
+        self.previous = previous
+        self.status = QUEUED
+        self.message = None
+        self.error = None
+        self.superseded_by = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self, superseded_by=None):
+        self.superseded_by = superseded_by
+        self._cancel.set()
+
+    def sleep(self, seconds):
+        """Sleep between steps; returns False if the job was cancelled meanwhile"""
+        return not self._cancel.wait(seconds)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'status': self.status,
+            'message': self.message,
+            'error': self.error,
+            'superseded_by': self.superseded_by,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+class TransitionEngine:
+    """Runs volume ramps on a small dedicated thread pool, at most one per device.
+
+    Submitting a new transition for a device cancels the one already running
+    there; the new job starts once the old one has stopped touching the volume.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fade')
+        self._jobs = OrderedDict()  # job_id -> job, oldest first
+        self._active = {}  # device key -> job
+        self._lock = threading.Lock()
+
+    def submit(self, kind, device_key, fn):
+        """Schedule fn(job) for device_key and return the job; fn returns a status message"""
+        with self._lock:
+            previous = self._active.get(device_key)
+            job = TransitionJob(kind, device_key, previous)
+            if previous and not previous.done:
+                logger.info(f"{kind} job {job.job_id} supersedes {previous.kind} job {previous.job_id}")
+                previous.cancel(superseded_by=job.job_id)
+            self._active[device_key] = job
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+        # Run in a copy of the caller's context so the job keeps its Spotify priority class
+        self._executor.submit(contextvars.copy_context().run, self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job and not job.done:
+            job.cancel()
+        return job
+
+    def cancel_device(self, device_key, superseded_by=None):
+        """Stop whatever is running on device_key, for a command that doesn't go through the engine;
+        returns the cancelled job, if any"""
+        with self._lock:
+            job = self._active.get(device_key)
+        if job and not job.done:
+            job.cancel(superseded_by=superseded_by)
+            return job
+        return None
+
+    def _run(self, job, fn):
+        try:
+            if job.previous:
+                job.previous.wait(SUPERSEDE_WAIT)
+                job.previous = None
+            if job.cancelled:
+                job.status = CANCELLED
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.message = fn(job)
+            job.status = CANCELLED if job.cancelled else COMPLETED
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.job_id} failed: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.device_key) is job:
+                    del self._active[job.device_key]
+            job._done.set()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+_engine = None
+
+def init_app(app):
+    global _engine
+    _engine = TransitionEngine(max_workers=app.config['FADE_MAX_WORKERS'])
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = TransitionEngine()
+    return _engine
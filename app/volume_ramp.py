@@ -0,0 +1,171 @@
+# volume_ramp.py
+
+import math
+import threading
+import time
+import logging
+from spotipy.exceptions import SpotifyException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURVE = 'linear'
+DEFAULT_MIN_INTERVAL = 0.2  # seconds between volume calls, however fast Spotify answers
+DEFAULT_MIN_STEP = 1  # volume points a call has to move
+DEFAULT_RTT = 0.15  # seconds, assumed for a device until a ramp has measured it
+RTT_SMOOTHING = 0.3  # weight of the newest round trip in the running estimate
+EXPONENTIAL_FLOOR = 1  # volume the exponential curve treats as silence
+
+def _linear(start, end, progress):
+    return start + (end - start) * progress
+
+def _equal_power(start, end, progress):
+    # Quarter sine: the fading side follows cos, the rising side sin, so loudness holds up
+    if end < start:
+        return end + (start - end) * math.cos(progress * math.pi / 2)
+    return start + (end - start) * math.sin(progress * math.pi / 2)
+
+def _exponential(start, end, progress):
+    # A straight line in decibels between the two volumes, ending exactly on end
+    if progress >= 1:
+        return end
+    low, high = math.log(max(start, EXPONENTIAL_FLOOR)), math.log(max(end, EXPONENTIAL_FLOOR))
+    return math.exp(low + (high - low) * progress)
+
+# Volume along a ramp from start to end, at progress 0..1; all of them monotonic
+CURVES = {
+    'linear': _linear,
+    'equal_power': _equal_power,
+    'exponential': _exponential,
+}
+
+def curve_volume(curve, start, end, progress):
+    return CURVES[curve](start, end, min(1.0, max(0.0, progress)))
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return True
+
+class VolumeRamp:
+    """Moves a device's volume from start to end over duration seconds along a curve.
+
+    Targets are scheduled against a monotonic clock, not a fixed number of
+    steps. Each call aims half a measured round trip ahead, where it will
+    land, and only one call is ever in flight: points the curve passed while
+    waiting on Spotify are skipped, so the ramp ends on time with as few
+    calls as the curve, min_step and min_interval allow.
+
+    set_volume(volume) makes the call; sleep(seconds) waits between calls and
+    returns False to cancel (TransitionJob.sleep fits). The clock and sleep
+    can be swapped for simulated ones.
+    """
+
+    def __init__(self, set_volume, start, end, duration, curve=DEFAULT_CURVE, min_interval=DEFAULT_MIN_INTERVAL,
+                 min_step=DEFAULT_MIN_STEP, rtt=DEFAULT_RTT, clock=time.monotonic, sleep=_sleep):
+        if curve not in CURVES:
+            raise ValueError(f"Unknown fade curve {curve!r}")
+        self._set_volume = set_volume
+        self.start = round(start)
+        self.end = round(end)
+        self.duration = max(0.0, duration)
+        self.curve = curve
+        self.min_interval = min_interval
+        self.min_step = max(1, min_step)
+        self.rtt = rtt
+        self._clock = clock
+        self._sleep = sleep
+        self.volume = self.start  # last volume sent (the device is taken to be at start)
+        self.calls = 0
+        self.elapsed = None
+
+    def _target(self, progress):
+        return round(curve_volume(self.curve, self.start, self.end, progress))
+
+    def _progress(self, began, at):
+        if at >= began + self.duration - 1e-6:
+            return 1.0
+        return (at - began) / self.duration
+
+    def _next_change(self, progress):
+        """Earliest progress at which the target has moved min_step from the last volume sent"""
+        def moved(p):
+            return abs(self._target(p) - self.volume) >= self.min_step
+        if not moved(1.0):
+            return 1.0
+        low, high = progress, 1.0
+        for _ in range(20):
+            middle = (low + high) / 2
+            if moved(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+
+    def _send(self, volume):
+        sent = self._clock()
+        try:
+            self._set_volume(volume)
+        except SpotifyException as e:
+            logger.warning(f"Error during fade at volume {volume}: {str(e)}")
+        finally:
+            self.rtt = (1 - RTT_SMOOTHING) * self.rtt + RTT_SMOOTHING * (self._clock() - sent)
+            self.calls += 1
+        self.volume = volume
+        return sent
+
+    def run(self):
+        """Ramp until the end volume is set; returns False if cancelled first"""
+        began = self._clock()
+        last_sent = None
+        while True:
+            now = self._clock()
+            final_send = began + self.duration - self.rtt / 2
+            # Aim for the moment the call will take effect, half a round trip from now
+            progress = self._progress(began, now + self.rtt / 2)
+            target = self._target(progress)
+            if progress < 1 and now + self.rtt > final_send:
+                # A call now would still be in flight when the last one has to go
+                wake = final_send
+            else:
+                if target != self.volume and (abs(target - self.volume) >= self.min_step or progress >= 1):
+                    last_sent = self._send(target)
+                if progress >= 1 and self.volume == self.end:
+                    self.elapsed = self._clock() - began
+                    return True
+                wake = began + self._next_change(progress) * self.duration - self.rtt / 2
+                if last_sent is not None:
+                    wake = max(wake, last_sent + self.min_interval)
+                # The last call goes out in time to land at the end, min_interval or not
+                wake = min(wake, final_send)
+            if not self._sleep(max(0.0, wake - self._clock())):
+                self.elapsed = self._clock() - began
+                return False
+
+# Measured round trips per device key, so each ramp starts from the last one's estimate
+_rtt = {}
+_rtt_lock = threading.Lock()
+_options = {'curve': DEFAULT_CURVE, 'min_interval': DEFAULT_MIN_INTERVAL, 'min_step': DEFAULT_MIN_STEP}
+
+def ramp_volume(job, set_volume, start, end, duration, curve=None):
+    """Run a VolumeRamp for a fade engine job with the configured defaults; False if it was cancelled"""
+    with _rtt_lock:
+        rtt = _rtt.get(job.device_key, DEFAULT_RTT)
+    ramp = VolumeRamp(set_volume, start, end, duration, curve=curve or _options['curve'],
+                      min_interval=_options['min_interval'], min_step=_options['min_step'],
+                      rtt=rtt, sleep=job.sleep)
+    finished = ramp.run()
+    with _rtt_lock:
+        _rtt[job.device_key] = ramp.rtt
+    logger.info(f"{ramp.curve} ramp {ramp.start}->{ramp.end} over {ramp.duration}s took "
+                f"{ramp.elapsed:.2f}s and {ramp.calls} calls (rtt {ramp.rtt * 1000:.0f} ms)")
+    return finished
+
+def init_app(app):
+    curve = app.config['FADE_CURVE']
+    if curve not in CURVES:
+        logger.warning(f"Unknown FADE_CURVE {curve!r}, using {DEFAULT_CURVE}")
+        curve = DEFAULT_CURVE
+    _options.update({
+        'curve': curve,
+        'min_interval': app.config['FADE_MIN_INTERVAL'],
+        'min_step': app.config['FADE_MIN_STEP'],
+    })
@@ -13,6 +13,25 @@ class Config:
     SPOTIPY_CLIENT_SECRET = os.getenv('SPOTIPY_CLIENT_SECRET')
     SPOTIPY_REDIRECT_URI = os.getenv('SPOTIPY_REDIRECT_URI')
 
+    # Owner tokens are refreshed in the background this long before they expire
+    TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', 300))  # seconds
+    TOKEN_REFRESH_CHECK_INTERVAL = int(os.getenv('TOKEN_REFRESH_CHECK_INTERVAL', 30))  # seconds
+
+    # Shared HTTP connection pool for Spotify API clients
+    SPOTIFY_POOL_SIZE = int(os.getenv('SPOTIFY_POOL_SIZE', 20))  # keep-alive connections
+    SPOTIFY_REQUEST_TIMEOUT = float(os.getenv('SPOTIFY_REQUEST_TIMEOUT', 5))  # seconds
+    SPOTIFY_RETRIES = int(os.getenv('SPOTIFY_RETRIES', 3))
+    SPOTIFY_BACKOFF_FACTOR = float(os.getenv('SPOTIFY_BACKOFF_FACTOR', 0.3))
+    # Independent Spotify calls run concurrently on an asyncio loop (needs httpx; otherwise a thread pool)
+    SPOTIFY_ASYNC = os.getenv('SPOTIFY_ASYNC', 'true').lower() in ('true', '1', 't')
+
+    # SQLite index of session playlists by owner and name (defaults to the instance folder)
+    PLAYLIST_INDEX_PATH = os.getenv('PLAYLIST_INDEX_PATH')
+
+    # Where sessions are kept: 'memory' (single process) or 'sqlite' (shared by worker processes)
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+    SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH')  # defaults to the instance folder
+
     # Admin settings
     ADMIN_KEYWORD = os.getenv('ADMIN_KEYWORD')
 
@@ -20,20 +39,76 @@ class Config:
     PORT = int(os.getenv('PORT', 5000))
     TIP_QR_CODE_PATH = '/static/tip-qr.png'
 
+    # Production server (serve.py)
+    SERVER_CONCURRENCY = int(os.getenv('SERVER_CONCURRENCY', 1000))  # requests handled at once
+    SERVER_DRAIN_TIMEOUT = float(os.getenv('SERVER_DRAIN_TIMEOUT', 30))  # seconds to finish in-flight requests on shutdown
+
     # Spotify API scope
     SPOTIFY_SCOPE = 'user-read-private user-read-email playlist-modify-public playlist-modify-private user-read-playback-state user-modify-playback-state user-read-currently-playing'
     
     # Debug mode (set to False in production)
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
 
+    # Serve CSS and JS source files instead of the bundles from scripts/build_assets.py
+    ASSETS_DEV = os.getenv('ASSETS_DEV', str(DEBUG)).lower() in ('true', '1', 't')
+
+    # Search cache shared by all search and autocomplete endpoints
+    SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 1000))  # distinct queries kept
+    SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 300))  # seconds
+    SPOTIFY_MARKET = os.getenv('SPOTIFY_MARKET')  # optional ISO country code for search results
+
+    # Track metadata (names, artists, artwork) cached by URI
+    TRACK_CACHE_SIZE = int(os.getenv('TRACK_CACHE_SIZE', 5000))
+    TRACK_CACHE_TTL = int(os.getenv('TRACK_CACHE_TTL', 24 * 60 * 60))  # seconds
+
+    # Playback state per token owner, shared by routes and pollers (0 turns it off)
+    PLAYBACK_STATE_TTL = float(os.getenv('PLAYBACK_STATE_TTL', 1))  # seconds
+    PLAYBACK_STATE_CACHE_SIZE = int(os.getenv('PLAYBACK_STATE_CACHE_SIZE', 1000))
+
+    # Spotify call budget per access token; under pressure autocomplete and polling are shed first
+    SPOTIFY_RATE_LIMIT = float(os.getenv('SPOTIFY_RATE_LIMIT', 10))  # calls per second
+    SPOTIFY_RATE_BURST = int(os.getenv('SPOTIFY_RATE_BURST', 30))
+
+    # Rendered session QR codes kept in memory
+    QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', 256))
+
     # Cooldown period for tracks (in seconds)
     TRACK_COOLDOWN_PERIOD = 1200  # 20 minutes
 
+    # Prometheus metrics at /metrics; when set, scrapers must send 'Authorization: Bearer <token>'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
     # Logging configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json' (one JSON object per line)
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records waiting to be written; more are dropped
+
+    # Player state snapshot (shared by every guest polling a session)
+    PLAYER_STATE_REFRESH_INTERVAL = float(os.getenv('PLAYER_STATE_REFRESH_INTERVAL', 3))  # seconds
+    PLAYER_STATE_IDLE_TIMEOUT = int(os.getenv('PLAYER_STATE_IDLE_TIMEOUT', 60))  # stop polling after this long without readers
+
+    # Server-Sent Events stream for session updates
+    SSE_HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+    SSE_RETRY_MS = 3000  # reconnect delay suggested to EventSource clients
+
+    # Event mode configuration (preset songs, wedding playlist), reloaded when the file changes
+    EVENT_CONFIG_PATH = os.getenv('EVENT_CONFIG_PATH')  # defaults to event_preset_songs.json in the project root
+    EVENT_CONFIG_CHECK_INTERVAL = float(os.getenv('EVENT_CONFIG_CHECK_INTERVAL', 2))  # seconds between mtime checks
+    EVENT_CONFIG_WATCH = os.getenv('EVENT_CONFIG_WATCH', 'False').lower() in ('true', '1', 't')  # reload in the background
+
+    # Event mode fades run on their own small thread pool
+    FADE_MAX_WORKERS = int(os.getenv('FADE_MAX_WORKERS', 2))
+    FADE_CURVE = os.getenv('FADE_CURVE', 'linear')  # linear, equal_power or exponential
+    FADE_MIN_INTERVAL = float(os.getenv('FADE_MIN_INTERVAL', 0.2))  # seconds between volume calls
+    FADE_MIN_STEP = int(os.getenv('FADE_MIN_STEP', 1))  # volume points a call has to move
+
+    # An armed event pins its device and refreshes playback state in the background
+    EVENT_REFRESH_INTERVAL = float(os.getenv('EVENT_REFRESH_INTERVAL', 2))  # seconds
+    EVENT_ARM_TTL = int(os.getenv('EVENT_ARM_TTL', 12 * 60 * 60))  # stop refreshing after this long
 
     # Session expiration time (in seconds)
     SESSION_EXPIRATION_TIME = 24 * 60 * 60  # 24 hours in seconds
+    CLEANUP_INTERVAL = int(os.getenv('CLEANUP_INTERVAL', 300))  # seconds between expired session/track sweeps
 
     PREFERRED_URL_SCHEME = 'https'
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tap-to-sound latency of an event-mode preset, unarmed vs armed.
+
+Runs the app against a local fake Spotify API (scripts/fake_spotify.py) that
+takes --latency seconds per call, and taps a preset --taps times. A tap's
+latency is the time from the request reaching the app to the fake API acting
+on the start_playback call. Unarmed, each tap first asks Spotify for the
+current playback and does the quick fade-out; after POST /api/arm-event the
+tap is a single start_playback on the pinned device. Also counts the Spotify
+calls each tap makes before the song changes. Uses Flask's test client. Run
+from the repository root:
+
+    python scripts/bench_event_tap.py --taps 10 --latency 0.08
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from fake_spotify import load_app, start_fake_spotify
+
+PRESET = 'spotify:track:' + '0' * 21 + '7'
+
+def tap(client, server):
+    """One preset tap; returns (seconds until start_playback landed, Spotify calls made before it)"""
+    seen = len(server.calls)
+    start = time.perf_counter()
+    client.get(f'/api/play-preset/{PRESET}')
+    while True:
+        for landed, method, path in server.calls[seen:]:
+            if method == 'PUT' and path == 'me/player/play' and landed > start:
+                calls = sum(1 for when, _, _ in server.calls[seen:] if start < when <= landed)
+                return landed - start, calls
+        time.sleep(0.001)
+
+def run(client, server, taps):
+    latencies, calls = [], []
+    for _ in range(taps):
+        seconds, count = tap(client, server)
+        latencies.append(seconds)
+        calls.append(count)
+        time.sleep(0.3)  # let the transition (or volume restore) finish
+    return latencies, calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--taps', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.08, help="fake Spotify response time, seconds")
+    args = parser.parse_args()
+
+    server, _, prefix = start_fake_spotify(limit=10 ** 6, latency=args.latency)
+    app = load_app()
+    from app import rate_limiter
+    from app.spotify_utils import get_client
+    rate_limiter.get_governor().rate = rate_limiter.get_governor().burst = 10 ** 6
+
+    token_info = {'access_token': 'bench-access', 'refresh_token': 'bench-refresh',
+                  'expires_at': time.time() + 3600}
+    with app.app_context():
+        get_client(token_info).prefix = prefix
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['token_info'] = json.dumps(token_info)
+
+    print(f"{args.taps} preset taps, {args.latency * 1000:.0f} ms per Spotify call")
+    print(f"{'mode':<10}{'p50 ms':>9}{'max ms':>9}{'calls':>7}")
+    for mode in ('unarmed', 'armed'):
+        if mode == 'armed':
+            client.post('/api/arm-event', json={})
+        latencies, calls = run(client, server, args.taps)
+        print(f"{mode:<10}{statistics.median(latencies) * 1000:>9.0f}{max(latencies) * 1000:>9.0f}"
+              f"{statistics.median(calls):>7.0f}")
+    print("armed tap latency as the app measured it:", client.get('/api/arm-event').get_json()['tap_latency'])
+    client.post('/api/disarm-event')
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
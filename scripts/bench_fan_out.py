@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Composite Spotify reads, one call after another vs fanned out on the asyncio client or a thread pool.
+
+Runs against the local fake API (scripts/fake_spotify.py) with --latency
+seconds per call, and times the two composite reads LazyDJ makes: the
+player-state refresh (queue plus currently playing) and the scan of a
+500-playlist library (the nine pages after the first). Run from the repository root:
+
+    python scripts/bench_fan_out.py --latency 0.1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from fake_spotify import start_fake_spotify, PLAYLIST_COUNT
+from app import rate_limiter, spotify_async
+from app.rate_limiter import GovernedSpotify
+from app.spotify_async import fan_out, call
+
+PAGE_SIZE = 50
+
+def configure(enabled):
+    spotify_async.init_app(SimpleNamespace(config={
+        'SPOTIFY_ASYNC': enabled, 'SPOTIFY_POOL_SIZE': 20, 'SPOTIFY_REQUEST_TIMEOUT': 5,
+        'SPOTIFY_RETRIES': 3, 'SPOTIFY_BACKOFF_FACTOR': 0.3}))
+
+def player_state_sequential(sp):
+    return sp._get('me/player/queue'), sp.currently_playing()
+
+def player_state_fan_out(sp):
+    return fan_out(sp, call('queue'), call('currently_playing'))
+
+def offsets():
+    return range(PAGE_SIZE, PLAYLIST_COUNT, PAGE_SIZE)
+
+def scan_sequential(sp):
+    return [sp.user_playlists('fake_user', limit=PAGE_SIZE, offset=offset) for offset in offsets()]
+
+def scan_fan_out(sp):
+    return fan_out(sp, *(call('user_playlists', 'fake_user', limit=PAGE_SIZE, offset=offset) for offset in offsets()))
+
+def timed(fn, sp, repeat):
+    fn(sp)  # warm the connection pool
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(sp)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help="fake Spotify response time, seconds")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    server, _, prefix = start_fake_spotify(limit=10 ** 6, latency=args.latency)
+    rate_limiter.get_governor().rate = rate_limiter.get_governor().burst = 10 ** 6
+    sp = GovernedSpotify(auth='bench-token')
+    sp.prefix = prefix
+
+    print(f"{'composite read':<24}{'sequential':>12}{'threads':>10}{'asyncio':>10}   (median ms)")
+    for name, sequential, fanned in [('player state (2 calls)', player_state_sequential, player_state_fan_out),
+                                     ('playlist scan (9 pages)', scan_sequential, scan_fan_out)]:
+        results = [timed(sequential, sp, args.repeat)]
+        for enabled in (False, True):
+            configure(enabled)
+            results.append(timed(fanned, sp, args.repeat))
+        print(f"{name:<24}" + ''.join(f"{ms:>{width}.0f}" for ms, width in zip(results, (12, 10, 10))))
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Mixed-priority Spotify load against the fake API, with and without the rate governor.
+
+Starts scripts/fake_spotify.py in-process, allowing --limit calls per second
+per token, then for --duration seconds runs one host thread tapping play,
+--guests threads adding to the queue, a now-playing poller and --typists
+threads firing search-as-you-type calls, all on one access token. The
+"before" run uses a plain instrumented client whose HTTP pool retries 429s
+itself, the "after" run the governed client. Run from the repository root:
+
+    python scripts/bench_governor.py --limit 20 --typists 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotipy.exceptions import SpotifyException
+from fake_spotify import start_fake_spotify
+from app.metrics import InstrumentedSpotify
+from app import rate_limiter
+from app.rate_limiter import GovernedSpotify, RateLimited, spotify_priority, HOST, QUEUE, REFRESH, AUTOCOMPLETE
+
+def http_session(retry_429):
+    codes = [code for code in (429, 500, 502, 503, 504) if retry_429 or code != 429]
+    retry = Retry(total=3, status=3, backoff_factor=0.3, status_forcelist=codes, respect_retry_after_header=retry_429,
+                  allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']))
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry))
+    return session
+
+def run(client, args):
+    results = {name: {'ok': 0, 'shed': 0, 'failed': 0, 'latencies': []} for name in rate_limiter.PRIORITY_NAMES.values()}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker(priority, call, pause):
+        name = rate_limiter.PRIORITY_NAMES[priority]
+        with spotify_priority(priority):
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    call()
+                    outcome = 'ok'
+                except RateLimited:
+                    outcome = 'shed'
+                except SpotifyException:
+                    outcome = 'failed'
+                elapsed = time.perf_counter() - start
+                with lock:
+                    results[name][outcome] += 1
+                    if outcome == 'ok':
+                        results[name]['latencies'].append(elapsed)
+                time.sleep(pause)
+
+    track = 'spotify:track:0000000000000000000001'
+    workers = [(HOST, lambda: client.start_playback(uris=[track]), 0.5),
+               (REFRESH, lambda: (client._get('me/player/queue'), client.currently_playing()), 1.0)]
+    workers += [(QUEUE, lambda: client.add_to_queue(track), 1.0)] * args.guests
+    workers += [(AUTOCOMPLETE, lambda: client.search(q='song', type='track', limit=10), 0.05)] * args.typists
+    threads = [threading.Thread(target=worker, args=spec) for spec in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def report(title, results, rejected):
+    print(f"\n{title} (fake API answered 429 to {rejected} calls)")
+    print(f"{'priority':<14}{'ok':>6}{'shed':>6}{'failed':>8}{'p50 ms':>9}{'max ms':>9}")
+    for name, entry in results.items():
+        latencies = sorted(entry['latencies'])
+        p50 = f"{latencies[len(latencies) // 2] * 1000:.0f}" if latencies else '-'
+        worst = f"{latencies[-1] * 1000:.0f}" if latencies else '-'
+        print(f"{name:<14}{entry['ok']:>6}{entry['shed']:>6}{entry['failed']:>8}{p50:>9}{worst:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per run")
+    parser.add_argument('--limit', type=int, default=20, help="calls per second the fake API allows")
+    parser.add_argument('--retry-after', type=float, default=2.0)
+    parser.add_argument('--latency', type=float, default=0.03, help="fake API response time, seconds")
+    parser.add_argument('--guests', type=int, default=4)
+    parser.add_argument('--typists', type=int, default=4)
+    args = parser.parse_args()
+
+    for title, cls, retry_429 in [('before: no governor, 429s retried by the HTTP pool', InstrumentedSpotify, True),
+                                  ('after: governed client', GovernedSpotify, False)]:
+        server, rate_limit, prefix = start_fake_spotify(limit=args.limit, retry_after=args.retry_after,
+                                                        latency=args.latency)
+        # Sized so a full burst plus a second of refill stays within the fake's one-second window
+        rate_limiter.init_app(SimpleNamespace(config={'SPOTIFY_RATE_LIMIT': args.limit * 0.7,
+                                                      'SPOTIFY_RATE_BURST': round(args.limit * 0.3)}))
+        client = cls(auth='bench-token', requests_session=http_session(retry_429), requests_timeout=10)
+        client.prefix = prefix
+        results = run(client, args)
+        server.shutdown()
+        report(title, results, rate_limit.rejected)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: caller-side cost of logging with a direct file handler vs the queued pipeline.
+
+Simulates a slow log disk by sleeping --disk-ms in every emit, then times
+the log calls one add-to-queue request makes (four INFO, six DEBUG), with
+DEBUG disabled as in production. Run from the repository root:
+
+    python scripts/bench_logging.py --disk-ms 2
+"""
+
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import time
+from logging.handlers import QueueListener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.log_utils import LogQueueHandler, format_debug_output
+
+class SlowHandler(logging.Handler):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def emit(self, record):
+        self.format(record)
+        time.sleep(self.delay)
+
+def request_logs(logger, track, queue_state, lazy):
+    """The log calls of one add-to-queue request, old style or new style"""
+    if lazy:
+        logger.info("Attempting to add track to session %s: %s by %s", 'abcd1234', track['name'], track['artists'])
+        logger.debug("Track before adding to queue: %s", track)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Initial state:\n%s", format_debug_output(queue_state))
+        logger.info("Adding track to Spotify queue: %s", track['name'])
+        logger.info("Added track to queue: %s (URI: %s)", track['name'], track['uri'])
+        for _ in range(3):
+            logger.debug("Current session participants: %s", ['user_1', 'user_2'])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Final state:\n%s", format_debug_output(queue_state))
+        logger.info("Track added to session queue: %s in session %s", track['name'], 'abcd1234')
+    else:
+        logger.info(f"Attempting to add track to session abcd1234: {track['name']} by {track['artists']}")
+        logger.debug(f"Track before adding to queue: {track}")
+        logger.debug(f"Initial state:\n{format_debug_output(queue_state)}")
+        logger.info(f"Adding track to Spotify queue: {track['name']}")
+        logger.info(f"Added track to queue: {track['name']} (URI: {track['uri']})")
+        for _ in range(3):
+            logger.debug(f"Current session participants: {['user_1', 'user_2']}")
+        logger.debug(f"Final state:\n{format_debug_output(queue_state)}")
+        logger.info(f"Track added to session queue: {track['name']} in session abcd1234")
+
+def run(logger, n, lazy):
+    track = {'uri': 'spotify:track:1', 'name': 'Song', 'artists': 'Artist'}
+    queue_state = {'user_queue': [dict(track, name=f'Song {i}') for i in range(50)],
+                   'radio_queue': [dict(track, name=f'Radio {i}') for i in range(50)]}
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        request_logs(logger, track, queue_state, lazy)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--disk-ms', type=float, default=2.0, help="simulated write latency per record")
+    args = parser.parse_args()
+    delay = args.disk_ms / 1000
+
+    direct = logging.getLogger('bench.direct')
+    direct.propagate = False
+    direct.setLevel(logging.INFO)
+    direct.addHandler(SlowHandler(delay))
+
+    queued = logging.getLogger('bench.queued')
+    queued.propagate = False
+    queued.setLevel(logging.INFO)
+    handler = LogQueueHandler(queue.Queue(maxsize=100000))
+    queued.addHandler(handler)
+    listener = QueueListener(handler.queue, SlowHandler(delay))
+    listener.start()
+
+    print(f"{'pipeline':<36}{'mean ms':>10}{'p99 ms':>10}")
+    for name, logger, lazy in [('direct handler, f-strings (before)', direct, False),
+                               ('queued handler, lazy (after)', queued, True)]:
+        mean, p99 = run(logger, args.requests, lazy)
+        print(f"{name:<36}{mean:>10.3f}{p99:>10.3f}")
+    listener.stop()
+    print(f"dropped records: {handler.dropped}")
+
+if __name__ == '__main__':
+    main()
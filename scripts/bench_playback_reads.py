@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Spotify playback-state reads for one owner, with and without the shared playback cache.
+
+Runs the app against a local fake Spotify API (scripts/fake_spotify.py) for
+--duration seconds per run. Guests poll the owner's /current_queue and
+their session's /session/<id>/current_queue, which are separate pollers.
+--controllers event-mode screens each post a skip or a fade-out every
+--tap-interval seconds, and every one of those looks up the current
+playback first. Counts the me/player and me/player/currently-playing calls
+Spotify sees with PLAYBACK_STATE_TTL=0 (no cache) and with --ttl. Uses
+Flask's test client. Run from the repository root:
+
+    python scripts/bench_playback_reads.py --duration 10 --controllers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from fake_spotify import load_app, start_fake_spotify
+
+READS = ('me/player', 'me/player/currently-playing')
+
+def run(app, server, token_info, ttl, args):
+    from app import playback_cache
+    from app.models import create_session
+    from app.player_state import stop_player_state
+    from app.spotify_utils import token_key
+    playback_cache.init_app(SimpleNamespace(config={'PLAYBACK_STATE_TTL': ttl, 'PLAYBACK_STATE_CACHE_SIZE': 100}))
+    with app.app_context():
+        session_id = create_session(json.dumps(token_info)).session_id
+
+    first_call = len(server.calls)
+    deadline = time.monotonic() + args.duration
+
+    def client():
+        test_client = app.test_client()
+        with test_client.session_transaction() as flask_session:
+            flask_session['token_info'] = json.dumps(token_info)
+        return test_client
+
+    def guest(path):
+        test_client = client()
+        while time.monotonic() < deadline:
+            test_client.get(path)
+            time.sleep(0.5)
+
+    def controller(i):
+        test_client = client()
+        while time.monotonic() < deadline:
+            test_client.post('/api/skip-song' if i % 2 == 0 else '/api/fade-out', json={})
+            time.sleep(args.tap_interval)
+
+    threads = [threading.Thread(target=guest, args=('/current_queue',)),
+               threading.Thread(target=guest, args=(f'/session/{session_id}/current_queue',))]
+    threads += [threading.Thread(target=controller, args=(i,)) for i in range(args.controllers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    calls = server.calls[first_call:]
+    stop_player_state(f"user:{token_key(token_info)}")
+    stop_player_state(session_id)
+    time.sleep(4.5)  # let the last fade finish
+    return {path: sum(1 for _, method, called in calls if method == 'GET' and called == path) for path in READS}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per run")
+    parser.add_argument('--controllers', type=int, default=4)
+    parser.add_argument('--tap-interval', type=float, default=1.0, help="seconds between a controller's taps")
+    parser.add_argument('--latency', type=float, default=0.05, help="fake Spotify response time, seconds")
+    parser.add_argument('--ttl', type=float, default=1.0)
+    args = parser.parse_args()
+
+    server, _, prefix = start_fake_spotify(limit=10 ** 6, latency=args.latency)
+    app = load_app(PLAYER_STATE_REFRESH_INTERVAL=1)
+    from app import rate_limiter
+    from app.spotify_utils import get_client
+    rate_limiter.get_governor().rate = rate_limiter.get_governor().burst = 10 ** 6
+    token_info = {'access_token': 'bench-access', 'refresh_token': 'bench-refresh',
+                  'expires_at': time.time() + 3600}
+    with app.app_context():
+        get_client(token_info).prefix = prefix
+
+    print(f"{args.duration}s, 2 pollers and {args.controllers} event controllers on one owner")
+    print(f"{'cache':<14}{'me/player':>11}{'currently-playing':>19}{'total':>7}")
+    for name, ttl in [('off', 0), (f'ttl {args.ttl}s', args.ttl)]:
+        counts = run(app, server, token_info, ttl, args)
+        print(f"{name:<14}{counts['me/player']:>11}{counts['me/player/currently-playing']:>19}"
+              f"{sum(counts.values()):>7}")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
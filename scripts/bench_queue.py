@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: session queue reconciliation with the old list scans vs IndexedQueue.
+
+Reconciles a session queue of N tracks against a Spotify queue holding half of
+them (the rest have played), splits the user and radio queues, and removes
+tracks one by one. Run from the repository root:
+
+    python scripts/bench_queue.py --sizes 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.indexed_queue import IndexedQueue
+
+def make_tracks(n):
+    session_tracks = [{'uri': f'spotify:track:{i}', 'name': f'Track {i}', 'added_by': 'user_1',
+                       'added_at': 0} for i in range(n)]
+    # Every other session track is still queued, plus as many radio tracks
+    spotify_queue = [{'uri': f'spotify:track:{i}', 'name': f'Track {i}', 'artists': [{'name': 'A'}]}
+                     for i in range(0, n, 2)]
+    spotify_queue += [{'uri': f'spotify:track:radio{i}', 'name': f'Radio {i}', 'artists': [{'name': 'B'}]}
+                      for i in range(n // 2)]
+    return session_tracks, spotify_queue
+
+def reconcile_list(queue, spotify_queue, fetched_at=1):
+    """The previous implementation: list membership and a next() scan per Spotify track"""
+    current_spotify_uris = [track['uri'] for track in spotify_queue]
+    still_queued_tracks = [track for track in queue
+                           if track['uri'] in current_spotify_uris
+                           or track.get('added_at', 0) >= fetched_at]
+    radio_queue = []
+    for track in spotify_queue:
+        participant_track = next((t for t in still_queued_tracks
+                                  if t['uri'] == track['uri'] and t.get('added_by')), None)
+        if not participant_track:
+            radio_queue.append(track['uri'])
+    return still_queued_tracks, radio_queue
+
+def reconcile_indexed(queue, spotify_queue, fetched_at=1):
+    """What Session.queue_payload does now"""
+    current_spotify_uris = {track['uri'] for track in spotify_queue}
+    queue.retain(lambda track: track['uri'] in current_spotify_uris
+                 or track.get('added_at', 0) >= fetched_at)
+    still_queued_tracks = queue.to_list()
+    participant_uris = {track['uri'] for track in still_queued_tracks if track.get('added_by')}
+    radio_queue = [track['uri'] for track in spotify_queue if track['uri'] not in participant_uris]
+    return still_queued_tracks, radio_queue
+
+def remove_all_list(queue, uris):
+    for uri in uris:
+        queue = [t for t in queue if t['uri'] != uri]
+    return queue
+
+def remove_all_indexed(queue, uris):
+    for uri in uris:
+        queue.remove(uri)
+    return queue
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'tracks':>8}  {'operation':<16}{'list ms':>12}{'indexed ms':>12}{'speedup':>10}")
+    for n in args.sizes:
+        session_tracks, spotify_queue = make_tracks(n)
+        old = reconcile_list(list(session_tracks), spotify_queue)
+        new = reconcile_indexed(IndexedQueue(session_tracks), spotify_queue)
+        assert old == new, "implementations disagree"
+
+        list_ms = timed(lambda: reconcile_list(list(session_tracks), spotify_queue), args.repeat)
+        indexed_ms = timed(lambda: reconcile_indexed(IndexedQueue(session_tracks), spotify_queue), args.repeat)
+        print(f"{n:>8}  {'reconcile':<16}{list_ms:>12.1f}{indexed_ms:>12.1f}{list_ms / indexed_ms:>9.0f}x")
+
+        # Remove a tenth of the queue, one URI at a time
+        uris = [track['uri'] for track in session_tracks[::10]]
+        list_ms = timed(lambda: remove_all_list(list(session_tracks), uris), args.repeat)
+        indexed_ms = timed(lambda: remove_all_indexed(IndexedQueue(session_tracks), uris), args.repeat)
+        print(f"{n:>8}  {'remove n/10':<16}{list_ms:>12.1f}{indexed_ms:>12.1f}{list_ms / indexed_ms:>9.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Compare the Werkzeug dev server with the gevent production server under slow upstream calls.
+
+Serves a small Flask app whose route waits --latency seconds, standing in for
+a Spotify round trip, with each server in turn. It then fires --requests
+requests at it from --concurrency concurrent clients and reports throughput
+and latency percentiles, plus the server's peak memory and OS thread count.
+
+    python scripts/bench_server.py --concurrency 50 200 500 --latency 0.2
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HOST = '127.0.0.1'
+
+def run_server(kind, port, latency, pool_size):
+    if kind == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+    from flask import Flask, jsonify
+
+    app = Flask(__name__)
+
+    @app.route('/spotify')
+    def spotify_bound():
+        time.sleep(latency)  # blocking wait, like spotipy's HTTPS call
+        return jsonify({'ok': True})
+
+    if kind == 'gevent':
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+        WSGIServer((HOST, port), app, spawn=Pool(pool_size), log=None).serve_forever()
+    else:
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        # What `python app.py` runs: app.run() is threaded by default
+        app.run(host=HOST, port=port, threaded=True)
+
+def run_client(port, concurrency, total):
+    from gevent import monkey
+    monkey.patch_all()
+    import http.client
+    from gevent.pool import Pool
+
+    latencies = []
+    errors = 0
+
+    def one(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=60)
+            conn.request('GET', '/spotify')
+            conn.getresponse().read()
+            conn.close()
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    Pool(concurrency).map(one, range(total))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+    print(json.dumps({
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(pct(0.50), 1),
+        'p99_ms': round(pct(0.99), 1),
+        'errors': errors
+    }))
+
+def process_usage(pid):
+    """(RSS in MB, OS threads) of a process, read from /proc (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f)
+        return int(fields['VmHWM'].split()[0]) // 1024, int(fields['Threads'])
+    except (OSError, KeyError):
+        return None, None
+
+def wait_for_port(port, timeout=15):
+    import socket
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', nargs='+', default=['werkzeug', 'gevent'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[50, 200, 500])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.2, help='simulated Spotify round trip in seconds')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--role', choices=['server', 'client'], help=argparse.SUPPRESS)
+    parser.add_argument('--kind', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == 'server':
+        run_server(args.kind, args.port, args.latency, max(args.concurrency))
+        return
+    if args.role == 'client':
+        run_client(args.port, args.concurrency[0], args.requests)
+        return
+
+    script = os.path.abspath(__file__)
+    print(f"{'server':<10}{'clients':>9}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'peak MB':>9}{'threads':>9}")
+    for kind in args.servers:
+        server = subprocess.Popen([sys.executable, script, '--role', 'server', '--kind', kind,
+                                   '--port', str(args.port), '--latency', str(args.latency),
+                                   '--concurrency', str(max(args.concurrency))],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(args.port)
+            for concurrency in args.concurrency:
+                client = subprocess.Popen([sys.executable, script, '--role', 'client', '--port', str(args.port),
+                                           '--concurrency', str(concurrency), '--requests', str(args.requests)],
+                                          stdout=subprocess.PIPE, text=True)
+                threads = None
+                while client.poll() is None:
+                    _, sampled = process_usage(server.pid)
+                    threads = max(threads or 0, sampled or 0) or None
+                    time.sleep(0.05)
+                result = json.loads(client.stdout.read())
+                rss, _ = process_usage(server.pid)
+                print(f"{kind:<10}{concurrency:>9}{result['requests_per_sec']:>10}{result['p50_ms']:>10}"
+                      f"{result['p99_ms']:>10}{result['errors']:>8}{rss or '-':>9}{threads or '-':>9}")
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Concurrency check: queue adds across sessions with a process-wide lock vs per-session locks.
+
+Creates --sessions sessions, each owned by a different account on a local
+fake Spotify API (scripts/fake_spotify.py) that takes --latency seconds per
+call, then posts --adds distinct tracks to every session from one thread per
+add. The "before" run wraps the Spotify queue call in a single lock, as the
+old queue_lock did; the "after" run is the code as it stands, where only a
+session's own in-memory state is locked. Finally --racers threads add the
+same track to one session at once, and exactly one of them must succeed.
+Uses Flask's test client. Run from the repository root:
+
+    python scripts/bench_session_adds.py --sessions 8 --adds 4 --latency 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(ROOT))
+
+import spotipy
+from fake_spotify import load_app, start_fake_spotify
+
+def make_sessions(app, n, prefix):
+    from app.models import create_session
+    from app.spotify_utils import get_client
+    sessions = []
+    with app.app_context():
+        for i in range(n):
+            token_info = {'access_token': f'access-{i}', 'refresh_token': f'refresh-{i}',
+                          'expires_at': time.time() + 3600}
+            session = create_session(json.dumps(token_info))
+            get_client(token_info).prefix = prefix
+            sessions.append(session.session_id)
+    return sessions
+
+def post_adds(app, adds):
+    """POST every (session_id, track_uri) from its own thread; returns (seconds, successes)"""
+    successes = []
+    barrier = threading.Barrier(len(adds))
+
+    def add(session_id, track_uri):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post(f'/session/{session_id}/queue',
+                               data={'track_uri': track_uri, 'track_name': 'Song', 'artist_name': 'Artist'})
+        if response.get_json().get('status') == 'success':
+            successes.append(track_uri)
+
+    threads = [threading.Thread(target=add, args=pair) for pair in adds]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(successes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--adds', type=int, default=4, help="concurrent adds per session")
+    parser.add_argument('--latency', type=float, default=0.1, help="fake Spotify response time, seconds")
+    parser.add_argument('--racers', type=int, default=16)
+    args = parser.parse_args()
+
+    server, _, prefix = start_fake_spotify(limit=10 ** 6, latency=args.latency)
+    app = load_app()
+    from app import rate_limiter
+    rate_limiter.get_governor().rate = rate_limiter.get_governor().burst = 10 ** 6
+
+    original = spotipy.Spotify.add_to_queue
+    queue_lock = threading.Lock()
+
+    def serialized_add_to_queue(self, *args, **kwargs):
+        with queue_lock:
+            return original(self, *args, **kwargs)
+
+    total = args.sessions * args.adds
+    print(f"{total} adds across {args.sessions} sessions, {args.latency * 1000:.0f} ms per Spotify call")
+    print(f"{'locking':<28}{'seconds':>10}{'adds/s':>10}{'ok':>6}")
+    for name, add_to_queue in [('process-wide lock (before)', serialized_add_to_queue),
+                               ('per-session lock (after)', original)]:
+        spotipy.Spotify.add_to_queue = add_to_queue
+        sessions = make_sessions(app, args.sessions, prefix)
+        adds = [(session_id, f'spotify:track:{i:022d}') for session_id in sessions for i in range(args.adds)]
+        seconds, ok = post_adds(app, adds)
+        print(f"{name:<28}{seconds:>10.2f}{total / seconds:>10.1f}{ok:>6}")
+    spotipy.Spotify.add_to_queue = original
+
+    session_id = make_sessions(app, 1, prefix)[0]
+    _, ok = post_adds(app, [(session_id, 'spotify:track:' + 'x' * 22)] * args.racers)
+    print(f"{args.racers} concurrent adds of one track to one session: {ok} accepted")
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
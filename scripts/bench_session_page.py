@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: session page render time with the old inline QR code vs the cached QR endpoint.
+
+The old session view rendered a QR code with PIL and base64-inlined it into
+every page load. The page now links to /session/<id>/qr.svg, which renders
+once per session and is then served from memory (or not at all, when the
+browser revalidates with its ETag). Uses Flask's test client, so no network
+or Spotify calls are involved. Run from the repository root:
+
+    python scripts/bench_session_page.py --requests 200
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, ROOT)
+
+from fake_spotify import load_app
+
+def add_legacy_view(app):
+    """The session view as it was: a fresh PIL render and base64 inline on every request"""
+    import qrcode
+    from flask import render_template, request, session as flask_session
+    from app.models import get_session
+
+    def legacy_session_view(session_id):
+        current_session = get_session(session_id)
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(request.url)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+        buffered = BytesIO()
+        img.save(buffered)
+        qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
+        flask_session['current_session_id'] = session_id
+        flask_session['token_info'] = current_session.get_owner_token()
+        return render_template('session.html', session_id=session_id, qr_code_base64=qr_code_base64)
+
+    app.add_url_rule('/legacy/<session_id>', view_func=legacy_session_view)
+
+def timed_requests(client, path, n, headers=None):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code in (200, 304), (path, response.status_code)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app = load_app()
+    add_legacy_view(app)
+    from app.models import create_session
+    token = json.dumps({'access_token': 'bench', 'refresh_token': 'bench', 'expires_at': int(time.time()) + 86400})
+    session_id = create_session(token).session_id
+    client = app.test_client()
+
+    qr_path = f'/session/{session_id}/qr.svg'
+    start = time.perf_counter()
+    response = client.get(qr_path)
+    cold_ms = (time.perf_counter() - start) * 1000
+    etag = response.headers['ETag']
+
+    rows = [
+        ('page, inline QR (before)', timed_requests(client, f'/legacy/{session_id}', args.requests)),
+        ('page, QR endpoint (after)', timed_requests(client, f'/{session_id}', args.requests)),
+        ('qr.svg, cached', timed_requests(client, qr_path, args.requests)),
+        ('qr.svg, 304', timed_requests(client, qr_path, args.requests, {'If-None-Match': etag})),
+        ('qr.png, cached', timed_requests(client, f'/session/{session_id}/qr.png', args.requests)),
+    ]
+
+    print(f"{'request':<28}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, (mean, p50, p99) in rows:
+        print(f"{name:<28}{mean:>10.2f}{p50:>10.2f}{p99:>10.2f}")
+    print(f"qr.svg first render: {cold_ms:.2f} ms")
+
+if __name__ == '__main__':
+    main()
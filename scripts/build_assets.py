@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Bundle, minify, fingerprint and precompress LazyDJ's CSS and JavaScript.
+
+Writes app/static/dist/ and its manifest.json, which the app picks up at
+startup unless ASSETS_DEV is set. Brotli files are written too when the
+brotli package is installed. Run from the repository root after changing
+anything under app/static/styles or app/static/js:
+
+    python scripts/build_assets.py
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.asset_pipeline import build_assets
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static', default=os.path.join(ROOT, 'app', 'static'), help="static folder to build from")
+    parser.add_argument('--no-minify', action='store_true', help="bundle only, for debugging a build")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    build_assets(args.static, minify=not args.no_minify)
+
+if __name__ == '__main__':
+    main()
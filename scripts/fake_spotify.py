@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""A local stand-in for the Spotify Web API that answers 429 when pushed too hard.
+
+Serves canned responses for the endpoints LazyDJ calls. Each access token
+may make --limit calls per --window seconds; past that it gets a 429 with
+a Retry-After of --retry-after seconds, and calls made while that is in
+force are refused too, like Spotify does. Point a client at it by setting
+its prefix to http://127.0.0.1:<port>/v1/.
+
+    python scripts/fake_spotify.py --port 8899 --limit 20 --window 1 --latency 0.05
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+HOST = '127.0.0.1'
+PLAYLIST_COUNT = 500
+
+def _track(i):
+    return {
+        'uri': f'spotify:track:{i:022d}',
+        'id': f'{i:022d}',
+        'name': f'Song {i}',
+        'artists': [{'name': f'Artist {i}'}],
+        'album': {'name': f'Album {i}', 'images': [{'url': f'https://example.com/{i}.jpg'}]},
+        'duration_ms': 180000,
+    }
+
+# GET responses by path (below /v1/); player commands answer 204
+RESPONSES = {
+    'search': {'tracks': {'items': [_track(i) for i in range(10)]}},
+    'me': {'id': 'fake_user', 'display_name': 'Fake User'},
+    'me/player': {'is_playing': True, 'item': _track(0),
+                  'device': {'id': 'fake_device', 'name': 'Fake Speaker', 'is_active': True, 'volume_percent': 80}},
+    'me/player/devices': {'devices': [{'id': 'fake_device', 'name': 'Fake Speaker', 'is_active': True,
+                                       'is_restricted': False, 'volume_percent': 80}]},
+    'me/player/currently-playing': {'is_playing': True, 'item': _track(0)},
+    'me/player/queue': {'currently_playing': _track(0), 'queue': [_track(i) for i in range(1, 11)]},
+    'me/playlists': {'items': [], 'total': 0, 'next': None},
+    'tracks': {'tracks': [_track(i) for i in range(50)]},
+}
+
+class RateLimit:
+    """limit calls per window seconds per token, then Retry-After seconds of 429s"""
+
+    def __init__(self, limit, window, retry_after):
+        self.limit = limit
+        self.window = window
+        self.retry_after = retry_after
+        self._calls = {}  # token -> deque of call times
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def check(self, token):
+        """None if the call may go ahead, otherwise the Retry-After to send"""
+        now = time.monotonic()
+        with self._lock:
+            blocked_until = self._blocked_until.get(token, 0)
+            if now < blocked_until:
+                self.rejected += 1
+                return blocked_until - now
+            calls = self._calls.setdefault(token, deque())
+            while calls and calls[0] <= now - self.window:
+                calls.popleft()
+            if len(calls) >= self.limit:
+                self._blocked_until[token] = now + self.retry_after
+                self.rejected += 1
+                return self.retry_after
+            calls.append(now)
+            self.served += 1
+            return None
+
+def make_handler(rate_limit, latency):
+    class FakeSpotifyHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body=None, headers=None):
+            data = json.dumps(body).encode() if body is not None else b''
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if data:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            token = self.headers.get('Authorization', '')
+            retry_after = rate_limit.check(token)
+            if retry_after is not None:
+                # Spotify sends whole seconds
+                self._send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                           {'Retry-After': str(max(1, round(retry_after)))})
+                return
+            time.sleep(latency)
+            path = urlparse(self.path).path.split('/v1/', 1)[-1].strip('/')
+            self.server.record(self.command, path)
+            if self.command != 'GET' and path.startswith(('playlists', 'users')):
+                self._send(201, {'snapshot_id': 'fake'})
+            elif self.command != 'GET':
+                self._send(204)
+            elif path in RESPONSES:
+                self._send(200, RESPONSES[path])
+            elif path.startswith('users/') and path.endswith('/playlists'):
+                # A library of PLAYLIST_COUNT playlists, none of them LazyDJ's
+                self._send(200, {'items': [{'id': f'{i:022d}', 'name': f'Playlist {i}', 'public': True}
+                                           for i in range(10)], 'total': PLAYLIST_COUNT, 'next': None})
+            elif path.startswith('playlists/') and path.endswith('/followers/contains'):
+                self._send(200, [True])
+            elif path.startswith('playlists/') and path.endswith('/tracks'):
+                self._send(200, {'items': [], 'next': None})
+            elif path.startswith(('playlists/', 'tracks/')):
+                self._send(200, _track(0))
+            else:
+                self._send(404, {'error': {'status': 404, 'message': f'No fake for {path}'}})
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    return FakeSpotifyHandler
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default of 5 drops bursts of new connections, costing a 1s SYN retry
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []  # (time.perf_counter(), method, path) of every answered call
+        self._calls_lock = threading.Lock()
+
+    def record(self, method, path):
+        with self._calls_lock:
+            self.calls.append((time.perf_counter(), method, path))
+
+def start_fake_spotify(port=0, limit=20, window=1.0, retry_after=1.0, latency=0.0):
+    """Serve on a background thread; returns (server, rate_limit, prefix)"""
+    rate_limit = RateLimit(limit, window, retry_after)
+    server = FakeSpotifyServer((HOST, port), make_handler(rate_limit, latency))
+    threading.Thread(target=server.serve_forever, name='fake-spotify', daemon=True).start()
+    return server, rate_limit, f'http://{HOST}:{server.server_address[1]}/v1/'
+
+def load_app(log_level=logging.ERROR, **config):
+    """create_app() from the repository's app.py, set up for a benchmark; config overrides app.config"""
+    # app.py shares its name with the app package, so load it by path (as serve.py does)
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    spec = importlib.util.spec_from_file_location('lazydj_app', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # Flask finds the app's root path through sys.modules
+    spec.loader.exec_module(module)
+    app = module.create_app()
+    app.config.update({'SECRET_KEY': 'bench', **config})
+    logging.getLogger('app').setLevel(log_level)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--limit', type=int, default=20, help="calls allowed per window per token")
+    parser.add_argument('--window', type=float, default=1.0, help="seconds")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="seconds to refuse calls after a 429")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every answered call")
+    args = parser.parse_args()
+    server, rate_limit, prefix = start_fake_spotify(args.port, args.limit, args.window,
+                                                    args.retry_after, args.latency)
+    print(f"Fake Spotify API at {prefix} ({args.limit} calls per {args.window}s per token)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"served {rate_limit.served}, rejected {rate_limit.rejected} with 429")
+
+if __name__ == '__main__':
+    main()
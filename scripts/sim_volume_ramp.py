@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Volume ramps against a simulated Spotify device, on a simulated clock.
+
+Each volume call takes --latency seconds (with --jitter either way), and
+the device applies it halfway through. For every curve and a fade-out and
+fade-in, prints how many calls the ramp made, when the final volume took
+effect relative to the requested duration, and the volume the device
+actually had along the way, next to the old fixed-step loop (sleep
+interval + volume call per step). Exits non-zero if a ramp misses its end
+volume, or finishes more than one round trip late. Run from the repository
+root:
+
+    python scripts/sim_volume_ramp.py --duration 4 --latency 0.15
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.volume_ramp import VolumeRamp, CURVES, curve_volume
+
+class SimulatedDevice:
+    """A clock plus a device whose volume changes latency / 2 into each call"""
+
+    def __init__(self, latency, jitter, seed=1):
+        self.now = 0.0
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.changes = []  # (time the volume took effect, volume)
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        return True
+
+    def set_volume(self, volume):
+        rtt = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        self.changes.append((self.now + rtt / 2, volume))
+        self.now += rtt
+
+    def volume_at(self, when, initial):
+        volume = initial
+        for at, value in self.changes:
+            if at > when:
+                break
+            volume = value
+        return volume
+
+def old_fade(device, start, end, duration, steps):
+    """The fixed-step loop the routes used: volume call, then a fixed sleep"""
+    interval = duration / steps
+    volume_step = (end - start) // steps if end > start else -((start - end) // steps)
+    for step in range(steps + 1):
+        volume = start + step * volume_step
+        volume = max(end, volume) if end < start else min(end, volume)
+        device.set_volume(volume)
+        if step < steps:
+            device.sleep(interval)
+    if device.changes[-1][1] != end:
+        device.set_volume(end)
+
+def worst_error(device, curve, start, end, duration, began):
+    """Largest gap between the device's volume and the curve, sampled every 50 ms"""
+    worst = 0
+    for i in range(int(duration / 0.05) + 1):
+        at = began + i * 0.05
+        expected = curve_volume(curve, start, end, (at - began) / duration)
+        worst = max(worst, abs(device.volume_at(at, start) - expected))
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=4.0)
+    parser.add_argument('--latency', type=float, default=0.15, help="round trip of a volume call, seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="seconds either way")
+    parser.add_argument('--min-interval', type=float, default=0.2)
+    parser.add_argument('--min-step', type=int, default=1)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{args.duration}s ramps, {args.latency * 1000:.0f} ms (+/- {args.jitter * 1000:.0f}) per volume call")
+    print(f"{'ramp':<28}{'calls':>6}{'ends at':>10}{'late ms':>9}{'max error':>11}")
+    for start, end in [(100, 0), (0, 100)]:
+        device = SimulatedDevice(args.latency, args.jitter)
+        old_fade(device, start, end, args.duration, 20)
+        landed = device.changes[-1][0]
+        print(f"{f'fixed steps {start}->{end}':<28}{len(device.changes):>6}{landed:>10.2f}"
+              f"{(landed - args.duration) * 1000:>9.0f}{worst_error(device, 'linear', start, end, args.duration, 0):>11.1f}")
+        for curve in CURVES:
+            device = SimulatedDevice(args.latency, args.jitter)
+            ramp = VolumeRamp(device.set_volume, start, end, args.duration, curve=curve,
+                              min_interval=args.min_interval, min_step=args.min_step,
+                              rtt=args.latency, clock=device.clock, sleep=device.sleep)
+            finished = ramp.run()
+            landed = device.changes[-1][0] if device.changes else 0.0
+            late = landed - args.duration
+            error = worst_error(device, curve, start, end, args.duration, 0)
+            print(f"{f'{curve} {start}->{end}':<28}{ramp.calls:>6}{landed:>10.2f}{late * 1000:>9.0f}{error:>11.1f}")
+            if not finished or device.changes[-1][1] != end or late > args.latency + args.jitter:
+                print(f"  FAILED: finished={finished}, final volume {device.changes[-1][1]}")
+                failures += 1
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
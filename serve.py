@@ -0,0 +1,62 @@
+# serve.py - production entry point: gevent WSGI server with cooperative I/O
+#
+# Nearly every request waits on Spotify, and fades sleep for seconds. Under
+# gevent those waits yield to other requests instead of holding an OS thread,
+# so one process can keep hundreds of slow requests and event streams open.
+
+from gevent import monkey
+monkey.patch_all()  # must run before anything imports socket, ssl or threading
+
+import argparse
+import importlib.util
+import os
+import signal
+import sys
+
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+def load_create_app():
+    # app.py shares its name with the app package, so load it by path
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    spec = importlib.util.spec_from_file_location('lazydj_app', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # Flask finds the app's root path through sys.modules
+    spec.loader.exec_module(module)
+    return module.create_app
+
+def main():
+    parser = argparse.ArgumentParser(description='Run LazyDJ on the gevent production server.')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+    parser.add_argument('--port', type=int, help='Port to listen on (default: PORT from config)')
+    parser.add_argument('--concurrency', type=int, help='Requests handled at once (default: SERVER_CONCURRENCY)')
+    parser.add_argument('--drain-timeout', type=float, help='Seconds to finish in-flight requests on shutdown')
+    args = parser.parse_args()
+
+    app = load_create_app()()
+    port = args.port or app.config['PORT']
+    concurrency = args.concurrency or app.config['SERVER_CONCURRENCY']
+    drain_timeout = args.drain_timeout if args.drain_timeout is not None else app.config['SERVER_DRAIN_TIMEOUT']
+
+    # Requests beyond the pool size wait in the listen backlog instead of piling up
+    server = WSGIServer((args.host, port), app, spawn=Pool(concurrency))
+
+    def shutdown():
+        from app.events import close_all_channels
+        from app.transitions import get_engine
+        app.logger.info(f"Shutting down: draining in-flight requests for up to {drain_timeout}s")
+        # Event streams never finish on their own; closing them lets clients reconnect elsewhere
+        close_all_channels()
+        server.stop(timeout=drain_timeout)
+        get_engine().shutdown(wait=False)
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        gevent.signal_handler(sig, lambda: gevent.spawn(shutdown))
+
+    app.logger.info(f"Serving LazyDJ on {args.host}:{port} with gevent (concurrency {concurrency})")
+    server.serve_forever()
+    app.logger.info("LazyDJ stopped")
+
+if __name__ == '__main__':
+    main()